@@ -1,46 +1,222 @@
+import csv
+import gzip
+import io
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+import click
 from flask import (
     Flask, render_template, request, jsonify, session,
-    redirect, url_for, flash, g
+    redirect, url_for, flash, g, Response, stream_template, stream_with_context
 )
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used when it is missing
+    brotli = None
+
+import archive
+import catalog_io
+import checkout_queue
 import database
+import events
+import forecast
+import headoffice
+import instrumentation
+import ledger
+import pricing
+import reports
+import serialize
+from cache import LRUCache
 
 app = Flask(__name__)
 app.secret_key = "supermarket-dev-key"
 
-TAX_RATE = 0.05
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+TYPEAHEAD_LIMIT = 10
+SYNC_MAX_SALES = 200
+SNAPSHOT_FIELDS = ("id", "name", "barcode", "category_id", "price", "stock")
+CHANGES_LIMIT = 1000
+CHANGES_MAX_LIMIT = 5000
+RECEIPT_CACHE_SIZE = 1024
+RECEIPT_CACHE_TTL = 3600.0
+# Part of every receipt ETag: bump when receipt.html changes so browsers
+# stop reusing their copies.
+RECEIPT_VERSION = 2
+RECEIPT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+FRAGMENT_CACHE_SIZE = 256
+FRAGMENT_CACHE_TTL = 300.0
+# Responses smaller than this go out as they are.
+COMPRESS_MIN_SIZE = 1024
+# Past 3 the catalogue payloads shrink little and cost twice the CPU.
+COMPRESS_LEVEL = 3
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "text/html", "text/csv",
+    "text/plain", "text/css", "application/javascript", "text/javascript",
+}
+
+PRODUCT_JSON_FIELDS = ("id", "name", "barcode", "category_id", "category_name", "price",
+                       "cost_price", "stock", "low_stock_threshold")
+SEARCH_JSON_FIELDS = ("id", "name", "barcode", "price", "stock", "category_name")
+TYPEAHEAD_JSON_FIELDS = ("id", "name", "barcode")
+CATEGORY_JSON_FIELDS = ("id", "name", "tax_rate")
+SALE_JSON_FIELDS = ("id", "total", "payment_method", "created_at", "item_count")
+SUPPLIER_JSON_FIELDS = ("id", "name", "phone", "email", "address")
+SUPPLIER_PRODUCT_JSON_FIELDS = ("id", "name", "price", "supply_price")
+LOW_STOCK_JSON_FIELDS = ("id", "name", "stock", "low_stock_threshold")
+PROMOTION_JSON_FIELDS = ("id", "name", "kind", "product_id", "product_name", "category_id",
+                         "category_name", "percent", "quantity", "price", "starts_at",
+                         "ends_at")
+MOVEMENT_JSON_FIELDS = ("id", "delta", "reason", "ref_id", "created_at")
+PURCHASE_ORDER_JSON_FIELDS = ("id", "supplier_id", "supplier_name", "status", "reference",
+                              "created_at")
+PURCHASE_ORDER_LINE_JSON_FIELDS = ("product_id", "product_name", "barcode", "unit_cost",
+                                   "ordered", "received")
+GOODS_RECEIPT_JSON_FIELDS = ("id", "line_count", "units", "created_at")
+
+_receipt_pages = LRUCache(RECEIPT_CACHE_SIZE, RECEIPT_CACHE_TTL)
+_fragments = LRUCache(FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_TTL)
 
 
-@app.teardown_appcontext
-def close_db(exception):
-    db = g.pop("db", None)
-    if db is not None:
-        db.close()
+@app.before_request
+def start_query_timing():
+    instrumentation.begin_request()
 
 
 @app.before_request
-def ensure_cart():
-    if "cart" not in session:
-        session["cart"] = []
+def select_store():
+    """
+    Route the request to one store's database: the X-Store-ID header, else
+    ?store= (remembered for the session), else the first configured store.
+    The store is set for every request so none inherits a previous one.
+    """
+    if not database.STORES:
+        database.set_store(None)
+        return None
+    store_id = request.headers.get("X-Store-ID") or request.args.get("store")
+    if store_id is None:
+        store_id = session.get("store_id") or database.store_ids()[0]
+    try:
+        database.set_store(store_id)
+    except ValueError as e:
+        session.pop("store_id", None)
+        database.set_store(database.store_ids()[0])
+        return jsonify({"success": False, "error": str(e)}), 404
+    if "store" in request.args:
+        session["store_id"] = store_id
+    return None
+
+
+@app.context_processor
+def inject_store():
+    return {"stores": list(database.STORES), "current_store": database.current_store()}
+
+
+@app.after_request
+def add_server_timing(response):
+    summary = instrumentation.end_request(request.method, request.endpoint,
+                                          response.status_code)
+    if summary is not None:
+        response.headers["Server-Timing"] = instrumentation.server_timing(summary)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Brotli (when installed) or gzip for text bodies the client accepts.
+    Streams are left alone: they are flushed piecemeal on purpose.
+    """
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(data, quality=COMPRESS_LEVEL))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(data, COMPRESS_LEVEL, mtime=0))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+    # The encoded bytes differ from the identity ones.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.teardown_appcontext
+def close_db(exception):
+    database.release_connections(g.pop("dbs", {}))
 
 
 # ── Helper ──────────────────────────────────────────────────────────
 
-def cart_response():
-    cart = session.get("cart", [])
-    subtotal = sum(item["subtotal"] for item in cart)
-    tax = round(subtotal * TAX_RATE, 2)
+def current_cart_id():
+    """Return this session's cart ID, creating a server-side cart if needed."""
+    store_id = database.current_store()
+    key = "cart_id" if store_id is None else f"cart_id:{store_id}"
+    cart_id = session.get(key)
+    if cart_id is None or database.get_cart(cart_id) is None:
+        cart_id = database.create_cart()
+        session[key] = cart_id
+    return cart_id
+
+
+def cart_response(cart_id):
+    """The cart as pricing.py charges it at checkout, with discounts and tax."""
+    lines, totals = database.price_cart(cart_id)
     return {
         "success": True,
-        "cart": cart,
-        "totals": {
-            "item_count": sum(item["quantity"] for item in cart),
-            "subtotal": round(subtotal, 2),
-            "tax": tax,
-            "total": round(subtotal + tax, 2),
-        },
+        "cart": [
+            {"product_id": line["product_id"], "name": line["product_name"],
+             "price": line["unit_price"], "quantity": line["quantity"],
+             "subtotal": line["subtotal"], "discount": line["discount"],
+             "promotion": line["promotion"]}
+            for line in lines
+        ],
+        "totals": dict(totals, item_count=sum(line["quantity"] for line in lines)),
     }
 
 
+def page_args(default=PAGE_SIZE):
+    """Read the cursor and a clamped limit from the query string."""
+    limit = request.args.get("limit", default, type=int)
+    return request.args.get("cursor") or None, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def json_response(value, status=200):
+    """jsonify for large payloads: compact, unsorted, orjson when installed."""
+    return Response(serialize.dumps(value), status, mimetype="application/json")
+
+
+def cached_fragment(template, version, load, **context):
+    """
+    A partial template rendered once per data version. load() returns the
+    rows it needs and only runs on a miss; context (hashable values) is
+    part of the key. Writes move the version, so stale copies are never
+    read again and age out of the LRU.
+    """
+    key = (database.current_path(), template, version, tuple(sorted(context.items())))
+    html = _fragments.get(key)
+    if html is None:
+        html = Markup(render_template(template, **dict(context, **load())))
+        _fragments.set(key, html)
+    return html
+
+
 # ── Page Routes ─────────────────────────────────────────────────────
 
 @app.route("/")
@@ -51,69 +227,109 @@ def index():
 @app.route("/dashboard")
 def dashboard():
     stats = database.get_dashboard_stats()
-    low_stock = database.get_low_stock_products()
+    low_stock_card = cached_fragment(
+        "_low_stock.html", database.data_version("low_stock"),
+        lambda: {"low_stock": database.get_low_stock_products()})
     recent_sales = database.get_recent_sales(10)
     return render_template("dashboard.html", stats=stats,
-                           low_stock=low_stock, recent_sales=recent_sales)
+                           low_stock_card=low_stock_card, recent_sales=recent_sales)
 
 
 @app.route("/inventory")
 def inventory():
     q = request.args.get("q", "")
     category_id = request.args.get("category", None, type=int)
-    if q or category_id:
-        products = database.search_products(q, category_id)
-    else:
-        products = database.get_all_products()
-    categories = database.get_all_categories()
-    return render_template("inventory.html", products=products,
-                           categories=categories, q=q,
-                           selected_category=category_id)
+    sort = request.args.get("sort", "name")
+    if sort not in database.PRODUCT_SORTS:
+        sort = "name"
+    cursor, limit = page_args()
+    try:
+        if q:
+            # Ranked search results page by offset, carried in the cursor.
+            offset = int(database.decode_cursor(cursor)[0]) if cursor else 0
+            products = database.search_products(q, category_id, limit=limit + 1,
+                                                offset=offset)
+            next_cursor = (database.encode_cursor([offset + limit])
+                           if len(products) > limit else None)
+            products = products[:limit]
+        else:
+            products, next_cursor = database.list_products(
+                sort, cursor, limit, category_id=category_id)
+    except ValueError:
+        return redirect(url_for("inventory", q=q or None, category=category_id,
+                                sort=sort))
+    version = database.data_version("categories")
+    load = lambda: {"categories": database.get_all_categories()}  # noqa: E731
+    return render_template(
+        "inventory.html", products=products, q=q,
+        selected_category=category_id, sort=sort, next_cursor=next_cursor,
+        category_filter_options=cached_fragment("_category_options.html", version, load,
+                                                selected=category_id),
+        category_options=cached_fragment("_category_options.html", version, load,
+                                         selected=None),
+        category_list=cached_fragment("_category_list.html", version, load),
+    )
 
 
 @app.route("/sales")
 def sales():
-    cart = session.get("cart", [])
-    subtotal = sum(item["subtotal"] for item in cart)
-    tax = round(subtotal * TAX_RATE, 2)
-    totals = {
-        "item_count": sum(item["quantity"] for item in cart),
-        "subtotal": round(subtotal, 2),
-        "tax": tax,
-        "total": round(subtotal + tax, 2),
-    }
+    cart = cart_response(current_cart_id())
     recent = database.get_recent_sales(20)
-    return render_template("sales.html", cart=cart, totals=totals,
-                           recent_sales=recent)
+    return render_template("sales.html", cart=cart["cart"], totals=cart["totals"],
+                           recent_sales=recent, tax_rate=pricing.TAX_RATE)
 
 
 @app.route("/suppliers")
 @app.route("/suppliers/<int:supplier_id>")
 def suppliers(supplier_id=None):
-    all_suppliers = database.get_all_suppliers()
+    cursor, limit = page_args()
     selected = None
     linked_products = []
     if supplier_id:
         selected = database.get_supplier_by_id(supplier_id)
         if selected:
             linked_products = database.get_supplier_products(supplier_id)
-    products = database.get_all_products()
-    return render_template("suppliers.html", suppliers=all_suppliers,
-                           selected=selected, linked_products=linked_products,
-                           products=products)
+
+    def load():
+        try:
+            page, next_cursor = database.list_suppliers(cursor, limit)
+            return {"suppliers": page, "next_cursor": next_cursor}
+        except ValueError:
+            page, next_cursor = database.list_suppliers(None, limit)
+            return {"suppliers": page, "next_cursor": next_cursor, "cursor": None}
+
+    supplier_list = cached_fragment(
+        "_supplier_list.html", database.data_version("suppliers"), load,
+        selected_id=selected["id"] if selected else None, cursor=cursor, limit=limit)
+    return render_template("suppliers.html", supplier_list=supplier_list,
+                           selected=selected, linked_products=linked_products)
 
 
 @app.route("/receipt/<int:sale_id>")
 def receipt(sale_id):
-    sale, items = database.get_sale_details(sale_id)
-    if not sale:
-        flash("Sale not found.", "danger")
-        return redirect(url_for("sales"))
-    subtotal = sum(item["subtotal"] for item in items)
-    tax = round(subtotal * TAX_RATE, 2)
-    total = round(subtotal + tax, 2)
-    return render_template("receipt.html", sale=sale, items=items,
-                           subtotal=subtotal, tax=tax, total=total)
+    """
+    Receipts never change, so a browser holding the ETag gets a 304 once
+    the sale is known to exist (a cached page or one primary-key probe),
+    and other repeat fetches reuse the rendered page.
+    """
+    etag = f"receipt-{RECEIPT_VERSION}-{database.current_store() or ''}-{sale_id}"
+    key = (database.current_path(), sale_id)
+    page = _receipt_pages.get(key)
+    if (request.if_none_match.contains_weak(etag)
+            and (page is not None or database.sale_exists(sale_id))):
+        response = Response(status=304)
+    else:
+        if page is None:
+            stored = database.get_receipt(sale_id)
+            if stored is None:
+                flash("Sale not found.", "danger")
+                return redirect(url_for("sales"))
+            page = render_template("receipt.html", receipt=stored)
+            _receipt_pages.set(key, page)
+        response = Response(page, mimetype="text/html")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = RECEIPT_CACHE_CONTROL
+    return response
 
 
 # ── Product API ─────────────────────────────────────────────────────
@@ -121,13 +337,38 @@ def receipt(sale_id):
 @app.route("/api/products/search")
 def api_search_products():
     q = request.args.get("q", "")
-    results = database.search_products(keyword=q)
-    return jsonify([
-        {"id": p["id"], "name": p["name"], "barcode": p["barcode"],
-         "price": p["price"], "stock": p["stock"],
-         "category_name": p["category_name"]}
-        for p in results
-    ])
+    limit = request.args.get("limit", SEARCH_PAGE_SIZE, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    results = database.search_products(
+        keyword=q, limit=max(1, min(limit, SEARCH_MAX_PAGE_SIZE)),
+        offset=max(0, offset),
+    )
+    return json_response(serialize.records(results, SEARCH_JSON_FIELDS))
+
+
+@app.route("/api/products/typeahead")
+def api_typeahead_products():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify([])
+    results = database.search_products(keyword=q, limit=TYPEAHEAD_LIMIT)
+    return json_response(serialize.records(results, TYPEAHEAD_JSON_FIELDS))
+
+
+@app.route("/api/products")
+def api_list_products():
+    cursor, limit = page_args()
+    try:
+        products, next_cursor = database.list_products(
+            sort=request.args.get("sort", "name"),
+            cursor=cursor, limit=limit,
+            category_id=request.args.get("category", None, type=int),
+            descending=request.args.get("order") == "desc",
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return json_response({"items": serialize.records(products, PRODUCT_JSON_FIELDS),
+                          "next_cursor": next_cursor})
 
 
 @app.route("/api/products", methods=["POST"])
@@ -148,17 +389,99 @@ def api_add_product():
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+@app.route("/api/products/import", methods=["POST"])
+def api_import_products():
+    upload = request.files.get("file")
+    if upload is not None:
+        fmt = request.form.get("format") or catalog_io.format_for(upload.filename)
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8", newline="")
+    else:
+        fmt = request.args.get("format", "csv")
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        summary = catalog_io.import_catalog(stream, fmt)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, **summary})
+
+
+@app.route("/api/products/export")
+def api_export_products():
+    fmt = request.args.get("format", "csv")
+    if fmt not in catalog_io.FORMATS:
+        return jsonify({"success": False, "error": f"Unknown format '{fmt}'"}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(catalog_io.export_catalog(fmt)), mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"},
+    )
+
+
+@app.route("/api/catalog/snapshot")
+def api_catalog_snapshot():
+    """
+    Whole catalogue for offline tills, as field names plus row arrays.
+    Follow up with /api/catalog/changes?since=<version>.
+    """
+    # Read first: anything changed while the rows are read is sent again.
+    version = database.catalog_version()
+    body = {
+        "version": version,
+        "fields": SNAPSHOT_FIELDS,
+        "rows": serialize.arrays(database.iter_products(), SNAPSHOT_FIELDS),
+        "categories": serialize.records(database.get_all_categories(), ("id", "name")),
+    }
+    response = json_response(body)
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/api/catalog/changes")
+def api_catalog_changes():
+    """Products and categories changed since a version, for local catalogues."""
+    since = request.args.get("since", 0, type=int)
+    limit = min(max(request.args.get("limit", CHANGES_LIMIT, type=int), 1), CHANGES_MAX_LIMIT)
+    changes = database.get_catalog_changes(since, limit)
+    return json_response({
+        "version": changes["version"],
+        "more": changes["more"],
+        "fields": SNAPSHOT_FIELDS,
+        "rows": serialize.arrays(changes["products"], SNAPSHOT_FIELDS),
+        "deleted": changes["deleted_products"],
+        "categories": serialize.records(changes["categories"], ("id", "name")),
+        "deleted_categories": changes["deleted_categories"],
+    })
+
+
 @app.route("/api/products/<int:product_id>")
 def api_get_product(product_id):
     p = database.get_product_by_id(product_id)
     if not p:
         return jsonify({"success": False, "error": "Not found"}), 404
-    return jsonify({
-        "id": p["id"], "name": p["name"], "barcode": p["barcode"],
-        "category_id": p["category_id"], "category_name": p["category_name"],
-        "price": p["price"], "cost_price": p["cost_price"],
-        "stock": p["stock"], "low_stock_threshold": p["low_stock_threshold"],
-    })
+    return json_response(serialize.record(p, PRODUCT_JSON_FIELDS))
+
+
+@app.route("/api/products/<int:product_id>/movements")
+def api_product_movements(product_id):
+    """The product's stock ledger, newest first."""
+    cursor, limit = page_args()
+    try:
+        movements, next_cursor = database.list_stock_movements(product_id, cursor, limit)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return json_response({"items": serialize.records(movements, MOVEMENT_JSON_FIELDS),
+                          "next_cursor": next_cursor})
+
+
+@app.route("/api/products/<int:product_id>/stock-at")
+def api_product_stock_at(product_id):
+    """Stock at ?at=YYYY-MM-DD[ HH:MM[:SS]] (a bare date: close of that day)."""
+    at = request.args.get("at")
+    try:
+        stock = ledger.stock_at(product_id, at)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"product_id": product_id, "at": ledger.moment(at), "stock": stock})
 
 
 @app.route("/api/products/<int:product_id>", methods=["PUT"])
@@ -180,6 +503,19 @@ def api_update_product(product_id):
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+@app.route("/api/products/bulk", methods=["PATCH"])
+def api_bulk_update_products():
+    data = request.get_json() or {}
+    updates = data.get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"success": False, "error": "'updates' must be a non-empty list"}), 400
+    try:
+        summary = database.bulk_update_products(updates)
+        return jsonify({"success": True, **summary})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
 @app.route("/api/products/<int:product_id>", methods=["DELETE"])
 def api_delete_product(product_id):
     try:
@@ -193,8 +529,8 @@ def api_delete_product(product_id):
 
 @app.route("/api/categories")
 def api_get_categories():
-    cats = database.get_all_categories()
-    return jsonify([{"id": c["id"], "name": c["name"]} for c in cats])
+    return json_response(serialize.records(database.get_all_categories(),
+                                           CATEGORY_JSON_FIELDS))
 
 
 @app.route("/api/categories", methods=["POST"])
@@ -207,6 +543,16 @@ def api_add_category():
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+@app.route("/api/categories/<int:category_id>/tax-rate", methods=["PUT"])
+def api_set_category_tax_rate(category_id):
+    data = request.get_json() or {}
+    try:
+        database.set_category_tax_rate(category_id, data.get("tax_rate"))
+        return jsonify({"success": True})
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
 @app.route("/api/categories/<int:category_id>", methods=["DELETE"])
 def api_delete_category(category_id):
     try:
@@ -220,73 +566,65 @@ def api_delete_category(category_id):
 
 @app.route("/api/cart")
 def api_get_cart():
-    return jsonify(cart_response())
+    return jsonify(cart_response(current_cart_id()))
 
 
 @app.route("/api/cart/add", methods=["POST"])
 def api_cart_add():
     data = request.get_json()
     product_id = data.get("product_id")
-    quantity = int(data.get("quantity", 1))
+    try:
+        quantity = int(data.get("quantity", 1))
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity <= 0:
+        return jsonify({"success": False,
+                        "error": "Quantity must be a positive whole number"}), 400
 
     product = database.get_product_by_id(product_id)
     if not product:
         return jsonify({"success": False, "error": "Product not found"}), 404
 
-    cart = session.get("cart", [])
-
-    for item in cart:
-        if item["product_id"] == product_id:
-            new_qty = item["quantity"] + quantity
-            if new_qty > product["stock"]:
-                return jsonify({"success": False,
-                                "error": f"Only {product['stock']} available"}), 400
-            item["quantity"] = new_qty
-            item["subtotal"] = round(product["price"] * new_qty, 2)
-            session["cart"] = cart
-            session.modified = True
-            return jsonify(cart_response())
-
-    if quantity > product["stock"]:
+    cart_id = current_cart_id()
+    existing = database.get_cart_item(cart_id, product["id"])
+    new_qty = quantity + (existing["quantity"] if existing else 0)
+    if new_qty > product["stock"]:
         return jsonify({"success": False,
                         "error": f"Only {product['stock']} available"}), 400
 
-    cart.append({
-        "product_id": product["id"],
-        "name": product["name"],
-        "price": product["price"],
-        "quantity": quantity,
-        "subtotal": round(product["price"] * quantity, 2),
-    })
-    session["cart"] = cart
-    session.modified = True
-    return jsonify(cart_response())
+    database.set_cart_item(cart_id, product, new_qty)
+    return jsonify(cart_response(cart_id))
 
 
 @app.route("/api/cart/remove", methods=["POST"])
 def api_cart_remove():
     data = request.get_json()
-    idx = int(data.get("index", -1))
-    cart = session.get("cart", [])
-    if 0 <= idx < len(cart):
-        cart.pop(idx)
-        session["cart"] = cart
-        session.modified = True
-    return jsonify(cart_response())
+    cart_id = current_cart_id()
+    product_id = data.get("product_id")
+    if product_id is None and "index" in data:
+        # Pages rendered before the server-side cart still send a position.
+        items = database.get_cart_items(cart_id)
+        idx = int(data["index"])
+        if 0 <= idx < len(items):
+            product_id = items[idx]["product_id"]
+    if product_id is not None:
+        database.remove_cart_item(cart_id, int(product_id))
+    return jsonify(cart_response(cart_id))
 
 
 @app.route("/api/cart/clear", methods=["POST"])
 def api_cart_clear():
-    session["cart"] = []
-    session.modified = True
-    return jsonify(cart_response())
+    cart_id = current_cart_id()
+    database.clear_cart(cart_id)
+    return jsonify(cart_response(cart_id))
 
 
 # ── Checkout API ────────────────────────────────────────────────────
 
 @app.route("/api/checkout", methods=["POST"])
 def api_checkout():
-    cart = session.get("cart", [])
+    cart_id = current_cart_id()
+    cart = database.get_cart_items(cart_id)
     if not cart:
         return jsonify({"success": False, "error": "Cart is empty"}), 400
 
@@ -297,16 +635,386 @@ def api_checkout():
              for item in cart]
 
     try:
-        sale_id = database.create_sale(items, payment_method)
-        session["cart"] = []
-        session.modified = True
+        # Written by the group-commit writer, which also empties the cart.
+        sale_id = checkout_queue.checkout(items, payment_method, cart_id=cart_id)
         return jsonify({"success": True, "sale_id": sale_id})
     except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 400
+    except checkout_queue.CheckoutBusy as e:
+        return jsonify({"success": False, "error": str(e)}), 503, {"Retry-After": "1"}
+
+
+# ── Promotions API ──────────────────────────────────────────────────
+
+@app.route("/api/promotions")
+def api_list_promotions():
+    active = request.args.get("active", "0") not in ("0", "false", "")
+    return json_response(serialize.records(database.get_promotions(active),
+                                           PROMOTION_JSON_FIELDS))
+
+
+@app.route("/api/pricing/rules")
+def api_pricing_rules():
+    """
+    The compiled promotions and tax rates, so an offline till prices its
+    cart as checkout will. The ETag moves with every promotion or tax edit.
+    """
+    rules = database.pricing_rules()
+    response = json_response(pricing.export_rules(rules))
+    response.set_etag(f"pricing-{database.current_store() or ''}-{rules.version}")
+    return response.make_conditional(request)
+
+
+@app.route("/api/promotions", methods=["POST"])
+def api_add_promotion():
+    data = request.get_json() or {}
+    try:
+        promotion_id = database.add_promotion(
+            data.get("name"), data.get("kind"),
+            product_id=data.get("product_id"), category_id=data.get("category_id"),
+            percent=data.get("percent"), quantity=data.get("quantity"),
+            price=data.get("price"), starts_at=data.get("starts_at"),
+            ends_at=data.get("ends_at"),
+        )
+        return jsonify({"success": True, "id": promotion_id})
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/promotions/<int:promotion_id>", methods=["DELETE"])
+def api_delete_promotion(promotion_id):
+    database.delete_promotion(promotion_id)
+    return jsonify({"success": True})
+
+
+# ── Sales API ───────────────────────────────────────────────────────
+
+def offline_sale_order(sale):
+    """Validate one journaled till sale into a database.create_sales order."""
+    if not isinstance(sale, dict):
+        raise ValueError("Sale must be an object")
+    client_ref = sale.get("client_ref")
+    if not isinstance(client_ref, str) or not 0 < len(client_ref) <= 64:
+        raise ValueError("client_ref is required (at most 64 characters)")
+    items = sale.get("items")
+    if not isinstance(items, list) or not items:
+        raise ValueError("Sale has no items")
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Each item needs product_id and quantity")
+        try:
+            product_id, quantity = int(item["product_id"]), int(item["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Each item needs product_id and quantity")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        parsed.append({"product_id": product_id, "quantity": quantity})
+
+    created_at = None
+    if sale.get("created_at"):
+        moment = datetime.fromisoformat(str(sale["created_at"]))
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        now = datetime.utcnow()
+        if moment > now + timedelta(minutes=5):
+            raise ValueError("created_at is in the future")
+        # Older sales would miss the promotions they were rung up with and
+        # land in days already rolled up, or archived.
+        if moment < now - timedelta(days=pricing.LATE_SYNC_DAYS):
+            raise ValueError(f"created_at is more than {pricing.LATE_SYNC_DAYS} days ago")
+        created_at = moment.strftime("%Y-%m-%d %H:%M:%S")
+    return {"items": parsed, "payment_method": str(sale.get("payment_method") or "Cash"),
+            "client_ref": client_ref, "created_at": created_at}
+
+
+@app.route("/api/sales/batch", methods=["POST"])
+def api_sales_batch():
+    """
+    Record sales journaled by tills while offline. Every sale carries a
+    till-generated client_ref, so replaying a batch never records a sale
+    twice. Results are per sale: created, duplicate, conflict (e.g.
+    insufficient stock) or invalid; current price and stock are returned
+    for every product the batch touched.
+    """
+    data = request.get_json(silent=True) or {}
+    sales = data.get("sales")
+    if not isinstance(sales, list) or not sales:
+        return jsonify({"success": False, "error": "No sales to sync"}), 400
+    if len(sales) > SYNC_MAX_SALES:
+        return jsonify({"success": False,
+                        "error": f"At most {SYNC_MAX_SALES} sales per batch"}), 400
+
+    results, orders, positions = [None] * len(sales), [], []
+    for i, sale in enumerate(sales):
+        ref = sale.get("client_ref") if isinstance(sale, dict) else None
+        try:
+            orders.append(offline_sale_order(sale))
+            positions.append(i)
+        except ValueError as e:
+            results[i] = {"client_ref": ref, "status": "invalid", "error": str(e)}
+
+    recorded = database.find_sales_by_client_ref({o["client_ref"] for o in orders})
+    pending = []
+    for i, order in zip(positions, orders):
+        if order["client_ref"] in recorded:
+            results[i] = {"client_ref": order["client_ref"], "status": "duplicate",
+                          "sale_id": recorded[order["client_ref"]]}
+        else:
+            pending.append((i, order))
+
+    outcomes = database.create_sales([order for _, order in pending]) if pending else []
+    for (i, order), outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            results[i] = {"client_ref": order["client_ref"], "status": "conflict",
+                          "error": str(outcome)}
+        else:
+            results[i] = {"client_ref": order["client_ref"], "status": "created",
+                          "sale_id": outcome}
+
+    touched = {item["product_id"] for order in orders for item in order["items"]}
+    return jsonify({
+        "success": True,
+        "results": results,
+        "products": [{"id": p["id"], "price": p["price"], "stock": p["stock"]}
+                     for p in database.get_stock_levels(touched)],
+    })
+
+
+@app.route("/api/sales")
+def api_list_sales():
+    cursor, limit = page_args(default=20)
+    try:
+        sales_page, next_cursor = database.list_sales(cursor, limit)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return json_response({"items": serialize.records(sales_page, SALE_JSON_FIELDS),
+                          "next_cursor": next_cursor})
+
+
+@app.route("/api/sales/<int:sale_id>/returns", methods=["POST"])
+def api_return_items(sale_id):
+    """Restock goods brought back: {"items": [{"product_id", "quantity"}, ...]}."""
+    data = request.get_json() or {}
+    try:
+        result = database.return_items(sale_id, data.get("items") or [])
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "sale_id": sale_id, "units": result["units"]})
+
+
+# ── Receipts API ────────────────────────────────────────────────────
+
+class _ChunkWriter:
+    """Write-only file object collecting what zipfile writes, for streaming."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def zip_receipts(receipts):
+    """Yield a ZIP of one receipt page per sale, a receipt at a time."""
+    out = _ChunkWriter()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for stored in receipts:
+            bundle.writestr(f"receipt-{stored['sale_id']}.html",
+                            render_template("receipt.html", receipt=stored))
+            yield out.take()
+    yield out.take()
+
+
+@app.route("/api/receipts/export")
+def api_receipts_export():
+    """Receipts for a date range, as one printable HTML document or a ZIP."""
+    fmt = request.args.get("format", "html")
+    if fmt not in ("html", "zip"):
+        return jsonify({"success": False, "error": f"Unknown format '{fmt}'"}), 400
+    try:
+        start, end = report_range()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    receipts = database.iter_receipts(start.strftime("%Y-%m-%d %H:%M:%S"),
+                                      end.strftime("%Y-%m-%d %H:%M:%S"))
+    if fmt == "html":
+        body = stream_template("receipts_export.html", receipts=receipts,
+                               start=start, end=end)
+        mimetype = "text/html"
+    else:
+        body = stream_with_context(zip_receipts(receipts))
+        mimetype = "application/zip"
+    filename = f"receipts-{start:%Y%m%d}-{end:%Y%m%d}.{fmt}"
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+# ── Reports API ─────────────────────────────────────────────────────
+
+def report_range():
+    start, end = reports.default_range()
+    if request.args.get("start"):
+        start = reports.parse_bound(request.args["start"])
+    if request.args.get("end"):
+        end = reports.parse_bound(request.args["end"], end=True)
+    return start, end
+
+
+def report_response(rows, name):
+    """Return report rows as JSON, or as CSV when ?format=csv."""
+    rows = [dict(r) for r in rows]
+    if request.args.get("format") != "csv":
+        return json_response(rows)
+    buffer = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return Response(buffer.getvalue(), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={name}.csv"})
+
+
+@app.route("/api/reports/sales")
+def api_report_sales():
+    try:
+        start, end = report_range()
+        rows = reports.sales_report(
+            start, end,
+            group_by=request.args.get("group_by", "product"),
+            order_by=request.args.get("order_by", "revenue"),
+            limit=request.args.get("limit", None, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return report_response(rows, "sales-report")
+
+
+@app.route("/api/reports/top-sellers")
+def api_report_top_sellers():
+    try:
+        start, end = report_range()
+        rows = reports.top_sellers(start, end, by=request.args.get("by", "units"),
+                                   limit=request.args.get("limit", 10, type=int))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return report_response(rows, "top-sellers")
+
+
+@app.route("/api/reports/summary")
+def api_report_summary():
+    try:
+        start, end = report_range()
+        totals = reports.summary(start, end)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return report_response([totals], "sales-summary")
+
+
+@app.route("/api/reports/stock-valuation")
+def api_report_stock_valuation():
+    """Stock at cost at ?at= (default now), by category; month-end: the last day."""
+    try:
+        result = ledger.valuation(request.args.get("at"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if request.args.get("format") == "csv":
+        return report_response(result["categories"], "stock-valuation")
+    return json_response(result)
+
+
+@app.route("/api/reports/stock-reconciliation")
+def api_report_stock_reconciliation():
+    """Products whose stock disagrees with the ledger (?full=1: whole ledger)."""
+    full = request.args.get("full", "0") not in ("0", "false", "")
+    return report_response(ledger.reconcile(full=full), "stock-reconciliation")
+
+
+@app.route("/api/reorder")
+def api_reorder():
+    """Reorder suggestions from sales velocity, with draft POs per supplier."""
+    try:
+        result = forecast.reorder_suggestions(
+            lead_time=request.args.get("lead_time", forecast.LEAD_TIME_DAYS, type=int),
+            cover=request.args.get("cover", forecast.COVER_DAYS, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+    if request.args.get("format") == "csv":
+        return report_response(result["products"], "reorder")
+    return jsonify(result)
+
+
+# ── Head Office API ─────────────────────────────────────────────────
+
+@app.route("/api/stores")
+def api_stores():
+    return jsonify([{"id": store_id, "current": store_id == database.current_store()}
+                    for store_id in database.STORES])
+
+
+@app.route("/api/headoffice/dashboard")
+def api_headoffice_dashboard():
+    """Dashboard counters for every store and the chain."""
+    return jsonify(headoffice.dashboard())
+
+
+@app.route("/api/headoffice/low-stock")
+def api_headoffice_low_stock():
+    limit = request.args.get("limit", None, type=int)
+    return jsonify(headoffice.low_stock(limit))
+
+
+@app.route("/api/headoffice/reports/sales")
+def api_headoffice_report_sales():
+    try:
+        start, end = report_range()
+        result = headoffice.sales_report(
+            start, end,
+            group_by=request.args.get("group_by", "product"),
+            order_by=request.args.get("order_by", "revenue"),
+            limit=request.args.get("limit", None, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if request.args.get("format") == "csv":
+        return report_response(result["rows"], "chain-sales-report")
+    return jsonify(result)
+
+
+@app.route("/api/headoffice/reports/summary")
+def api_headoffice_report_summary():
+    try:
+        start, end = report_range()
+        result = headoffice.summary(start, end)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify(result)
 
 
 # ── Supplier API ────────────────────────────────────────────────────
 
+@app.route("/api/suppliers")
+def api_list_suppliers():
+    cursor, limit = page_args()
+    try:
+        page, next_cursor = database.list_suppliers(cursor, limit)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return json_response({"items": serialize.records(page, SUPPLIER_JSON_FIELDS),
+                          "next_cursor": next_cursor})
+
+
 @app.route("/api/suppliers", methods=["POST"])
 def api_add_supplier():
     data = request.get_json()
@@ -345,11 +1053,7 @@ def api_delete_supplier(supplier_id):
 @app.route("/api/suppliers/<int:supplier_id>/products")
 def api_supplier_products(supplier_id):
     products = database.get_supplier_products(supplier_id)
-    return jsonify([
-        {"id": p["id"], "name": p["name"], "price": p["price"],
-         "supply_price": p["supply_price"]}
-        for p in products
-    ])
+    return json_response(serialize.records(products, SUPPLIER_PRODUCT_JSON_FIELDS))
 
 
 @app.route("/api/suppliers/<int:supplier_id>/products", methods=["POST"])
@@ -375,7 +1079,244 @@ def api_unlink_supplier_product(supplier_id, product_id):
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+# ── Purchase Orders API ─────────────────────────────────────────────
+
+@app.route("/api/purchase-orders")
+def api_list_purchase_orders():
+    cursor, limit = page_args()
+    try:
+        orders, next_cursor = database.list_purchase_orders(
+            status=request.args.get("status") or None,
+            supplier_id=request.args.get("supplier", None, type=int),
+            cursor=cursor, limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return json_response({
+        "items": [dict(serialize.record(o, PURCHASE_ORDER_JSON_FIELDS),
+                       line_count=o["line_count"], ordered=o["ordered"] or 0,
+                       received=o["received"] or 0)
+                  for o in orders],
+        "next_cursor": next_cursor,
+    })
+
+
+@app.route("/api/purchase-orders", methods=["POST"])
+def api_create_purchase_order():
+    data = request.get_json() or {}
+    try:
+        order_id = database.create_purchase_order(
+            int(data["supplier_id"]),
+            [{"product_id": int(line["product_id"]),
+              "quantity": line.get("quantity", 1),
+              "unit_cost": (float(line["unit_cost"])
+                            if line.get("unit_cost") is not None else None)}
+             for line in data.get("lines") or []],
+            reference=data.get("reference"),
+        )
+        return jsonify({"success": True, "id": order_id})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/purchase-orders/<int:order_id>")
+def api_get_purchase_order(order_id):
+    order, lines, receipts = database.get_purchase_order(order_id)
+    if order is None:
+        return jsonify({"success": False, "error": "Not found"}), 404
+    return json_response(dict(
+        serialize.record(order, PURCHASE_ORDER_JSON_FIELDS),
+        lines=serialize.records(lines, PURCHASE_ORDER_LINE_JSON_FIELDS),
+        receipts=serialize.records(receipts, GOODS_RECEIPT_JSON_FIELDS),
+    ))
+
+
+@app.route("/api/purchase-orders/<int:order_id>/receive", methods=["POST"])
+def api_receive_goods(order_id):
+    """Book a delivery: {"lines": [{"barcode" or "product_id", "quantity"}, ...]}."""
+    data = request.get_json() or {}
+    try:
+        receipt = database.receive_goods(order_id, data.get("lines") or [])
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, **receipt})
+
+
+@app.route("/api/purchase-orders/<int:order_id>/cancel", methods=["POST"])
+def api_cancel_purchase_order(order_id):
+    try:
+        database.cancel_purchase_order(order_id)
+        return jsonify({"success": True})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+# ── Live Updates ────────────────────────────────────────────────────
+
+@app.route("/api/events")
+def api_events():
+    """Server-sent stream of sale, stock, product and category changes."""
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    return Response(
+        events.stream(last_id, channel=database.current_store()), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/dashboard")
+def api_dashboard():
+    """Dashboard counters and low-stock list, for patching the page in place."""
+    return json_response({
+        "stats": database.get_dashboard_stats(),
+        "low_stock": serialize.records(database.get_low_stock_products(),
+                                       LOW_STOCK_JSON_FIELDS),
+    })
+
+
+# ── Metrics ─────────────────────────────────────────────────────────
+
+@app.route("/metrics")
+def metrics():
+    pool = database.pool_stats()
+    gauges = [
+        ("supermarket_db_pool_checkouts_total", "Connections checked out.", "counter",
+         [({}, pool["checkouts"])]),
+        ("supermarket_db_pool_waits_total", "Checkouts that waited for a connection.",
+         "counter", [({}, pool["waits"])]),
+        ("supermarket_db_pool_timeouts_total", "Checkouts that timed out.", "counter",
+         [({}, pool["timeouts"])]),
+        ("supermarket_db_pool_connections", "Pooled connections by state.", "gauge",
+         [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])]),
+        ("supermarket_db_pool_hit_rate", "Checkouts served by an idle connection.",
+         "gauge", [({}, pool["hit_rate"])]),
+    ]
+    caches = dict(database.cache_stats(), receipt_pages=_receipt_pages.stats(),
+                  fragments=_fragments.stats())
+    for counter in ("hits", "misses", "evictions", "expirations"):
+        gauges.append((f"supermarket_cache_{counter}_total", f"Cache {counter}.", "counter",
+                       [({"cache": name}, s[counter]) for name, s in caches.items()]))
+    gauges.append(("supermarket_cache_entries", "Entries held per cache.", "gauge",
+                   [({"cache": name}, s["size"]) for name, s in caches.items()]))
+    checkouts = checkout_queue.queue_stats()
+    buckets, seen = [], 0
+    for size, count in checkouts["batch_sizes"].items():
+        seen += count
+        buckets.append(("_bucket", {"le": size}, seen))
+    buckets.append(("_bucket", {"le": "+Inf"}, checkouts["batches"]))
+    gauges += [
+        ("supermarket_checkout_queue_depth", "Checkouts waiting for the writer.", "gauge",
+         [({}, checkouts["depth"])]),
+        ("supermarket_checkout_total", "Queued checkouts by outcome.", "counter",
+         [({"outcome": outcome}, checkouts[outcome])
+          for outcome in ("committed", "rejected", "failed", "busy", "cancelled")]),
+        ("supermarket_checkout_batch_size", "Sales per group-commit transaction.",
+         "histogram", buckets + [("_sum", {}, checkouts["committed"] + checkouts["rejected"]),
+                                 ("_count", {}, checkouts["batches"])]),
+        ("supermarket_checkout_batch_seconds_total", "Time spent writing batches.",
+         "counter", [({}, round(checkouts["batch_seconds"], 6))]),
+        ("supermarket_checkout_wait_seconds_total",
+         "Time from submission to commit, summed over checkouts.", "counter",
+         [({}, round(checkouts["wait_seconds"], 6))]),
+    ]
+    compiled = pricing.stats()
+    gauges += [
+        ("supermarket_pricing_compiles_total", "Pricing rule recompilations.", "counter",
+         [({}, compiled["compiles"])]),
+        ("supermarket_pricing_rules", "Promotions held compiled, all stores.", "gauge",
+         [({}, compiled["rules"])]),
+    ]
+    live = events.stats()
+    gauges += [
+        ("supermarket_events_subscribers", "Open server-sent event streams.", "gauge",
+         [({}, live["subscribers"])]),
+        ("supermarket_events_published_total", "Change events broadcast.", "counter",
+         [({}, live["published"])]),
+    ]
+    return Response(instrumentation.render_metrics(gauges),
+                    mimetype="text/plain; version=0.0.4")
+
+
+# ── CLI Commands ────────────────────────────────────────────────────
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute dashboard counters and daily sales from raw rows."""
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            database.rebuild_dashboard_stats()
+    print("Dashboard stats rebuilt.")
+
+
+@app.cli.command("rebuild-reports")
+def rebuild_reports_command():
+    """Recompute the hourly and daily sales rollups from sale_items."""
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            reports.rebuild_rollups()
+    print("Sales rollups rebuilt.")
+
+
+@app.cli.command("archive-sales")
+@click.option("--keep-months", default=archive.KEEP_MONTHS, show_default=True,
+              help="Whole months of sales to keep live, the current one included.")
+@click.option("--vacuum", is_flag=True, help="Compact the live database afterwards.")
+def archive_sales_command(keep_months, vacuum):
+    """Move older sales into monthly archive databases."""
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            moved = archive.archive_sales(keep_months, vacuum=vacuum)
+        for month, count in moved.items():
+            print(f"{store_id or 'default'} {month}: {count} sales archived")
+    print("Sales archived.")
+
+
+@app.cli.command("snapshot-stock")
+@click.option("--keep-days", default=ledger.SNAPSHOT_KEEP_DAYS, show_default=True,
+              help="Days of snapshots to keep; older ones but each month's last are pruned.")
+def snapshot_stock_command(keep_days):
+    """Fold the stock ledger into a new snapshot."""
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            snapshot = ledger.take_snapshot()
+            pruned = ledger.prune_snapshots(keep_days)
+        print(f"{store_id or 'default'}: snapshot {snapshot['id']}, {snapshot['skus']} SKUs, "
+              f"{snapshot['units']} units, value {snapshot['value']:.2f}; {pruned} pruned")
+
+
+@app.cli.command("reconcile-stock")
+@click.option("--full", is_flag=True, help="Check against the whole ledger, not the last snapshot.")
+@click.option("--repair", is_flag=True, help="Append movements making the ledger match.")
+def reconcile_stock_command(full, repair):
+    """Check products.stock against the stock ledger."""
+    failed = False
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            mismatches = ledger.reconcile(full=full, repair=repair)
+        for m in mismatches:
+            print(f"{store_id or 'default'} product {m['product_id']} ({m['name'] or 'deleted'}): "
+                  f"stock {m['stock']}, ledger {m['ledger_stock']}")
+        print(f"{store_id or 'default'}: {len(mismatches)} mismatches"
+              + (", repaired" if repair and mismatches else ""))
+        failed = failed or (mismatches and not repair)
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command("init-stores")
+def init_stores_command():
+    """Create or migrate the database of every configured store."""
+    database.init_stores()
+    print(f"Initialised {len(database.store_ids())} store database(s).")
+
+
 if __name__ == "__main__":
-    database.init_db()
-    database.seed_sample_data()
+    for store_id in database.store_ids():
+        with database.use_store(store_id):
+            database.init_db()
+            database.seed_sample_data()
     app.run(debug=True, port=5000)
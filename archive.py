@@ -0,0 +1,188 @@
+"""Archival of closed months of sales into per-month databases.
+
+Sales older than KEEP_MONTHS whole months are moved, with their items and
+receipts, to <store>-archive/sales-YYYY-MM.db next to the store's database,
+in batches of BATCH_SIZE sales per transaction so tills are never held up
+for long.
+The live database keeps the dashboard counters and the hourly/daily
+rollups, which are not touched by deleting sales, and one sale_archives row
+per month with its sale ID range, count and revenue. get_sale_details and
+get_receipt fall back to the archive whose ID range covers a sale.
+
+Commits across attached databases are not atomic in WAL mode, so each
+batch is first copied (INSERT OR IGNORE) and committed to the archive, and
+only then deleted from the live tables; a run interrupted between the two
+is simply repeated by the next one.
+"""
+import os
+from datetime import date
+
+import database
+
+KEEP_MONTHS = 12
+BATCH_SIZE = 5000
+
+ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS archive.sales (
+        id INTEGER PRIMARY KEY,
+        total REAL NOT NULL,
+        payment_method TEXT,
+        created_at TEXT,
+        client_ref TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archive.sale_items (
+        id INTEGER PRIMARY KEY,
+        sale_id INTEGER NOT NULL,
+        product_id INTEGER,
+        product_name TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        subtotal REAL NOT NULL,
+        unit_cost REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archive.receipts (
+        sale_id INTEGER PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        total REAL NOT NULL,
+        body TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_sale_items_sale_id ON sale_items(sale_id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_sales_created_at ON sales(created_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_receipts_created_at ON receipts(created_at)",
+)
+
+SALE_COLUMNS = "id, total, payment_method, created_at, client_ref"
+ITEM_COLUMNS = ("id, sale_id, product_id, product_name, quantity, unit_price, "
+                "subtotal, unit_cost")
+RECEIPT_COLUMNS = "sale_id, created_at, total, body"
+
+
+def cutoff(keep_months=KEEP_MONTHS, today=None):
+    """First day of the oldest month kept live, as 'YYYY-MM-DD'."""
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1 (the current month stays live)")
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - (keep_months - 1)
+    return date(months // 12, months % 12 + 1, 1).isoformat()
+
+
+def pending_months(before):
+    """Months ('YYYY-MM') with live sales created before `before`."""
+    conn = database.get_connection()
+    return [row[0] for row in conn.execute("""
+        SELECT DISTINCT strftime('%Y-%m', created_at) FROM sales
+        WHERE created_at < ? ORDER BY 1
+    """, (before,))]
+
+
+def archive_month(month, batch_size=BATCH_SIZE):
+    """Move one month's live sales into its archive. Returns sales moved."""
+    conn = database.get_connection()
+    directory = database.archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = f"sales-{month}.db"
+    start = f"{month}-01"
+    end = conn.execute("SELECT DATE(?, '+1 month')", (start,)).fetchone()[0]
+
+    conn.execute("ATTACH DATABASE ? AS archive", (os.path.join(directory, filename),))
+    try:
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+        moved = 0
+        while True:
+            conn.execute("BEGIN")
+            try:
+                conn.execute("DELETE FROM temp.archive_batch")
+                conn.execute("""
+                    INSERT INTO temp.archive_batch (id)
+                    SELECT id FROM main.sales
+                    WHERE created_at >= ? AND created_at < ?
+                    ORDER BY created_at LIMIT ?
+                """, (start, end, batch_size))
+                batch = conn.execute("""
+                    SELECT COUNT(*) AS n, MIN(s.id) AS first_id, MAX(s.id) AS last_id,
+                           COALESCE(SUM(s.total), 0) AS revenue
+                    FROM temp.archive_batch b JOIN main.sales s ON s.id = b.id
+                """).fetchone()
+                if batch["n"] == 0:
+                    conn.rollback()
+                    break
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO archive.sales ({SALE_COLUMNS})
+                    SELECT {SALE_COLUMNS} FROM main.sales
+                    WHERE id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO archive.sale_items ({ITEM_COLUMNS})
+                    SELECT {ITEM_COLUMNS} FROM main.sale_items
+                    WHERE sale_id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO archive.receipts ({RECEIPT_COLUMNS})
+                    SELECT {RECEIPT_COLUMNS} FROM main.receipts
+                    WHERE sale_id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""
+                    DELETE FROM main.receipts
+                    WHERE sale_id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.execute("""
+                    DELETE FROM main.sale_items
+                    WHERE sale_id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.execute("""
+                    DELETE FROM main.sales WHERE id IN (SELECT id FROM temp.archive_batch)
+                """)
+                conn.execute("""
+                    INSERT INTO sale_archives
+                        (month, path, first_sale_id, last_sale_id, sales_count, revenue)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(month) DO UPDATE SET
+                        first_sale_id = MIN(first_sale_id, excluded.first_sale_id),
+                        last_sale_id = MAX(last_sale_id, excluded.last_sale_id),
+                        sales_count = sales_count + excluded.sales_count,
+                        revenue = revenue + excluded.revenue,
+                        archived_at = CURRENT_TIMESTAMP
+                """, (month, filename, batch["first_id"], batch["last_id"],
+                      batch["n"], batch["revenue"]))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            moved += batch["n"]
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
+
+
+def archive_sales(keep_months=KEEP_MONTHS, batch_size=BATCH_SIZE, vacuum=False):
+    """
+    Archive every month before the last `keep_months` (the current month
+    included). Returns {month: sales moved}. With vacuum, the live database
+    file is compacted afterwards, which needs a moment of exclusive access.
+    """
+    moved = {}
+    for month in pending_months(cutoff(keep_months)):
+        moved[month] = archive_month(month, batch_size)
+    if vacuum and moved:
+        database.get_connection().execute("VACUUM")
+    return moved
+
+
+def list_archives():
+    conn = database.get_connection()
+    return conn.execute("SELECT * FROM sale_archives ORDER BY month").fetchall()
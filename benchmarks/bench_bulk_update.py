@@ -0,0 +1,61 @@
+"""Compare per-product update_product calls with bulk_update_products.
+
+Usage: python benchmarks/bench_bulk_update.py [--updates N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def setup_database(path, count):
+    database.DB_PATH = path
+    database.init_db()
+    database.upsert_products([
+        {"name": f"Product {i}", "barcode": f"B{i:07d}", "category": f"Category {i % 20}",
+         "price": 1.0 + i % 50, "stock": 100}
+        for i in range(count)
+    ])
+    conn = database.get_connection()
+    return [row["id"] for row in conn.execute("SELECT id FROM products ORDER BY id")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ids = setup_database(os.path.join(tmp, "bench.db"), args.updates)
+
+        started = time.perf_counter()
+        for i, product_id in enumerate(ids):
+            database.update_product(product_id, price=2.0 + i % 7, stock=50 + i % 10)
+        per_item = time.perf_counter() - started
+
+        updates = [{"id": product_id, "price": 3.0 + i % 7, "stock": 60 + i % 10}
+                   for i, product_id in enumerate(ids)]
+        started = time.perf_counter()
+        database.bulk_update_products(updates)
+        bulk = time.perf_counter() - started
+
+        relative = [{"id": product_id, "stock": {"add": 5}} for product_id in ids]
+        started = time.perf_counter()
+        database.bulk_update_products(relative)
+        bulk_relative = time.perf_counter() - started
+
+        database.release_connection()
+
+    print(f"{len(ids)} updates")
+    print(f"  update_product per item : {per_item * 1000:9.1f} ms")
+    print(f"  bulk_update_products    : {bulk * 1000:9.1f} ms  ({per_item / bulk:.1f}x)")
+    print(f"  bulk relative stock +5  : {bulk_relative * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
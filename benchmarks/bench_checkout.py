@@ -0,0 +1,140 @@
+"""Compare the per-line legacy checkout with database.create_sale.
+
+Usage: python benchmarks/bench_checkout.py [--runs N] [--tills N]
+
+Then runs --tills concurrent tills through create_sale directly and through
+the group-commit checkout queue.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import checkout_queue  # noqa: E402
+import database  # noqa: E402
+
+BASKET_SIZES = (1, 10, 100)
+PRODUCTS = 500
+
+
+def legacy_create_sale(items, payment_method="Cash"):
+    """The original checkout: one lookup, INSERT and UPDATE per cart line."""
+    conn = database.get_connection()
+    try:
+        total = 0.0
+        sale_rows = []
+        for item in items:
+            product = database.get_product_by_id(item["product_id"])
+            if product is None:
+                raise ValueError(f"Product ID {item['product_id']} not found")
+            if product["stock"] < item["quantity"]:
+                raise ValueError(f"Insufficient stock for '{product['name']}'")
+            subtotal = product["price"] * item["quantity"]
+            total += subtotal
+            sale_rows.append((product["id"], product["name"], item["quantity"],
+                              product["price"], subtotal))
+
+        cur = conn.execute(
+            "INSERT INTO sales (total, payment_method) VALUES (?, ?)",
+            (round(total, 2), payment_method)
+        )
+        sale_id = cur.lastrowid
+        for product_id, name, quantity, price, subtotal in sale_rows:
+            conn.execute("""
+                INSERT INTO sale_items (sale_id, product_id, product_name, quantity, unit_price, subtotal)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sale_id, product_id, name, quantity, price, round(subtotal, 2)))
+            conn.execute("UPDATE products SET stock = stock - ? WHERE id = ?",
+                         (quantity, product_id))
+        conn.commit()
+        return sale_id
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def setup_database(path):
+    database.DB_PATH = path
+    database.init_db()
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO products (name, barcode, price, cost_price, stock) VALUES (?, ?, ?, ?, ?)",
+        [(f"Product {i}", f"B{i:06d}", 1.0 + i % 50, 0.5, 10 ** 9)
+         for i in range(PRODUCTS)],
+    )
+    conn.commit()
+    return [row["id"] for row in conn.execute("SELECT id FROM products")]
+
+
+def time_checkout(fn, product_ids, size, runs):
+    items = [{"product_id": product_ids[i % len(product_ids)], "quantity": 1}
+             for i in range(size)]
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(items)
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def time_concurrent(fn, product_ids, tills, runs):
+    """Checkouts per second and p99 latency with `tills` threads."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def till(offset):
+        items = [{"product_id": product_ids[(offset + i) % len(product_ids)], "quantity": 1}
+                 for i in range(5)]
+        mine = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            try:
+                fn(items)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            mine.append(time.perf_counter() - started)
+        database.release_connection()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=till, args=(i * 7,)) for i in range(tills)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return len(latencies) / elapsed, p99, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--tills", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        product_ids = setup_database(os.path.join(tmp, "bench.db"))
+        print(f"{'lines':>6} {'legacy ms':>10} {'batched ms':>11} {'speedup':>8}")
+        for size in BASKET_SIZES:
+            legacy = time_checkout(legacy_create_sale, product_ids, size, args.runs)
+            batched = time_checkout(database.create_sale, product_ids, size, args.runs)
+            print(f"{size:>6} {legacy:>10.3f} {batched:>11.3f} {legacy / batched:>7.1f}x")
+        database.release_connection()
+
+        print(f"\n{args.tills} tills x {args.runs} checkouts")
+        for label, fn in (("create_sale", database.create_sale),
+                          ("checkout_queue", checkout_queue.checkout)):
+            rate, p99, errors = time_concurrent(fn, product_ids, args.tills, args.runs)
+            print(f"  {label:<15} {rate:>8.0f}/s  p99 {p99:>8.2f} ms  errors {errors}")
+        print(f"  mean batch size {checkout_queue.queue_stats()['mean_batch_size']}")
+        checkout_queue.get_queue().stop()
+
+
+if __name__ == "__main__":
+    main()
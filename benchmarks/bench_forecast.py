@@ -0,0 +1,49 @@
+"""Time the reorder engine over a generated store.
+
+Usage: python benchmarks/bench_forecast.py [--db PATH] [--skus N] [--years N]
+
+Generates the database with datagen first when it does not exist, e.g.
+--skus 50000 --years 2 for the full-size catalogue.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import forecast  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=datagen.DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the history read is a "slow query" by design
+    if not os.path.exists(args.db):
+        datagen.generate(args.db, skus=args.skus, years=args.years)
+    database.DB_PATH = args.db
+    database.init_db()
+
+    started = time.perf_counter()
+    stats = forecast.forecast()
+    modelled = time.perf_counter() - started
+    started = time.perf_counter()
+    result = forecast.reorder_suggestions()
+    suggested = time.perf_counter() - started
+    database.release_connection()
+
+    print(f"{len(stats['id'])} products")
+    print(f"  forecast             : {modelled * 1000:9.1f} ms")
+    print(f"  reorder_suggestions  : {suggested * 1000:9.1f} ms  "
+          f"({len(result['products'])} lines, {len(result['purchase_orders'])} POs)")
+
+
+if __name__ == "__main__":
+    main()
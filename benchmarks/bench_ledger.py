@@ -0,0 +1,93 @@
+"""Time point-in-time stock, valuation and reconciliation over a large ledger.
+
+Usage: python benchmarks/bench_ledger.py [--db PATH] [--skus N] [--movements N]
+                                         [--after N] [--lookups N]
+
+Builds a catalogue with datagen (no sales), appends --movements stock
+changes to the ledger, and answers the same questions by full replay and
+from a snapshot taken before the last --after movements.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import ledger  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "supermarket-ledger-bench.db")
+
+
+def churn(conn, product_ids, count, rng):
+    """Append count movements through the trigger, as restocks and sales would."""
+    conn.executemany("UPDATE products SET stock = stock + ? WHERE id = ?",
+                     [(rng.randint(1, 20), rng.choice(product_ids)) for _ in range(count)])
+    conn.commit()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=10000)
+    parser.add_argument("--movements", type=int, default=1000000)
+    parser.add_argument("--after", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the bulk loads are "slow queries" by design
+    datagen.generate(args.db, skus=args.skus, years=0)
+    database.DB_PATH = args.db
+    database.init_db()
+    conn = database.get_connection()
+    product_ids = [r[0] for r in conn.execute("SELECT id FROM products")]
+    rng = random.Random(11)
+    churn(conn, product_ids, args.movements - args.after, rng)
+    sample = rng.sample(product_ids, min(args.lookups, len(product_ids)))
+
+    def lookups():
+        return [ledger.stock_at(product_id) for product_id in sample]
+
+    _, replay_lookup = timed(lookups)
+    _, replay_valuation = timed(ledger.valuation)
+    _, replay_reconcile = timed(ledger.reconcile, True)
+
+    snapshot, first_snapshot = timed(ledger.take_snapshot)
+    churn(conn, product_ids, args.after, rng)
+    _, next_snapshot = timed(ledger.take_snapshot)
+    conn.execute("DELETE FROM stock_snapshots WHERE id > ?", (snapshot["id"],))
+    conn.commit()
+
+    _, snap_lookup = timed(lookups)
+    _, snap_valuation = timed(ledger.valuation)
+    mismatches, snap_reconcile = timed(ledger.reconcile)
+    database.release_connection()
+    assert not mismatches
+
+    movements = args.movements + len(product_ids)
+    print(f"{len(product_ids)} SKUs, {movements:,} movements, "
+          f"{args.after:,} after the snapshot")
+    print(f"{'':22}{'replay':>12}{'snapshot':>12}")
+    print(f"  stock_at            {replay_lookup / len(sample) * 1e6:9.1f} us"
+          f"{snap_lookup / len(sample) * 1e6:9.1f} us")
+    print(f"  valuation           {replay_valuation * 1000:9.1f} ms"
+          f"{snap_valuation * 1000:9.1f} ms")
+    print(f"  reconcile           {replay_reconcile * 1000:9.1f} ms"
+          f"{snap_reconcile * 1000:9.1f} ms")
+    print(f"  take_snapshot       {first_snapshot * 1000:9.1f} ms first, "
+          f"{next_snapshot * 1000:.1f} ms incremental")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Time basket pricing against a large set of promotions.
+
+Usage: python benchmarks/bench_pricing.py [--db PATH] [--skus N] [--promotions N]
+                                          [--lines N] [--baskets N]
+
+Builds a catalogue with datagen (no sales), adds the promotions, a mix of
+price cuts, percent-off products and categories and multi-buys, some
+scheduled or expired, and gives a few categories their own tax rate.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import pricing  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "supermarket-pricing-bench.db")
+
+
+def add_promotions(count, seed=42):
+    rng = random.Random(seed)
+    conn = database.get_connection()
+    products = conn.execute("SELECT id, price FROM products").fetchall()
+    categories = [r[0] for r in conn.execute("SELECT id FROM categories")]
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        product = rng.choice(products)
+        # A tenth scheduled for later, a tenth already over.
+        window = rng.random()
+        starts = now + timedelta(days=3) if window < 0.1 else now - timedelta(days=30)
+        ends = now - timedelta(days=1) if 0.1 <= window < 0.2 else now + timedelta(days=30)
+        kind = rng.choice(("price", "percent", "percent", "multibuy"))
+        if kind == "price":
+            row = (f"Price cut {i}", kind, product["id"], None, None, None,
+                   round(product["price"] * 0.8, 2))
+        elif kind == "multibuy":
+            quantity = rng.randint(2, 4)
+            row = (f"{quantity} for less {i}", kind, product["id"], None, None, quantity,
+                   round(product["price"] * (quantity - 1), 2))
+        elif rng.random() < 0.002:
+            row = (f"Category deal {i}", kind, None, rng.choice(categories),
+                   rng.choice((5, 10, 15)), None, None)
+        else:
+            row = (f"Percent off {i}", kind, product["id"], None,
+                   rng.choice((10, 20, 25, 33)), None, None)
+        rows.append(row + (starts.strftime("%Y-%m-%d %H:%M:%S"),
+                           ends.strftime("%Y-%m-%d %H:%M:%S")))
+    conn.execute("DELETE FROM promotions")
+    conn.executemany("""
+        INSERT INTO promotions (name, kind, product_id, category_id, percent, quantity,
+                                price, starts_at, ends_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.execute("UPDATE categories SET tax_rate = 0.0 WHERE id % 5 = 0")
+    conn.commit()
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=10000)
+    parser.add_argument("--promotions", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=100)
+    parser.add_argument("--baskets", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the bulk loads are "slow queries" by design
+    datagen.generate(args.db, skus=args.skus, years=0)
+    database.DB_PATH = args.db
+    database.init_db()
+    products = add_promotions(args.promotions)
+    conn = database.get_connection()
+    catalogue = {row["id"]: row for row in conn.execute(
+        "SELECT id, name, price, category_id FROM products")}
+
+    rng = random.Random(7)
+    baskets = [
+        [{"product_id": p["id"], "name": catalogue[p["id"]]["name"], "price": p["price"],
+          "category_id": catalogue[p["id"]]["category_id"], "quantity": rng.randint(1, 6)}
+         for p in rng.sample(products, args.lines)]
+        for _ in range(args.baskets)
+    ]
+
+    started = time.perf_counter()
+    rules = pricing.load_rules(conn)
+    compiled = time.perf_counter() - started
+
+    started = time.perf_counter()
+    discounted = 0
+    for basket in baskets:
+        lines, _ = pricing.price_basket(basket, rules)
+        discounted += sum(1 for line in lines if line["discount"])
+    priced = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for basket in baskets:
+        pricing.price_basket(basket, database.pricing_rules(conn))
+    checked = time.perf_counter() - started
+    database.release_connection()
+
+    per_basket = priced / args.baskets
+    print(f"{rules.count} promotions compiled, {args.baskets} baskets of {args.lines} lines "
+          f"({discounted / args.baskets:.1f} discounted lines per basket)")
+    print(f"  compile              : {compiled * 1000:9.1f} ms")
+    print(f"  price_basket         : {per_basket * 1e6:9.1f} us/basket  "
+          f"({args.lines / per_basket:,.0f} lines/s)")
+    print(f"  + version check      : {checked / args.baskets * 1e6:9.1f} us/basket")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Time booking large deliveries against purchase orders.
+
+Usage: python benchmarks/bench_receiving.py [--db PATH] [--skus N] [--lines N]
+                                            [--deliveries N]
+
+Builds a catalogue with datagen (no sales), links every product to one
+supplier, then per delivery raises a purchase order of --lines products and
+receives it in two deliveries of half the ordered quantity each.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "supermarket-receiving-bench.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--deliveries", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the bulk loads are "slow queries" by design
+    datagen.generate(args.db, skus=args.skus, years=0)
+    database.DB_PATH = args.db
+    database.init_db()
+    supplier_id = database.add_supplier("Bench Wholesale", "", "", "")
+    conn = database.get_connection()
+    products = conn.execute("SELECT id, barcode FROM products").fetchall()
+    conn.executemany(
+        "INSERT INTO supplier_products (supplier_id, product_id, supply_price) VALUES (?, ?, 1)",
+        [(supplier_id, p["id"]) for p in products])
+    conn.commit()
+
+    rng = random.Random(3)
+    ordered = received = 0.0
+    for _ in range(args.deliveries):
+        lines = rng.sample(products, args.lines)
+        started = time.perf_counter()
+        order_id = database.create_purchase_order(
+            supplier_id, [{"product_id": p["id"], "quantity": 12} for p in lines])
+        ordered += time.perf_counter() - started
+
+        # Half the order now, the rest in a second delivery.
+        for _ in range(2):
+            scans = [{"barcode": p["barcode"], "quantity": 6} for p in lines]
+            started = time.perf_counter()
+            database.receive_goods(order_id, scans)
+            received += time.perf_counter() - started
+    movements = conn.execute(
+        "SELECT COUNT(*) FROM stock_movements WHERE reason = 'receipt'").fetchone()[0]
+    database.release_connection()
+
+    print(f"{args.deliveries} purchase orders of {args.lines} lines, "
+          f"{movements} receipt movements")
+    print(f"  create_purchase_order : {ordered / args.deliveries * 1000:9.1f} ms/order")
+    print(f"  receive_goods         : {received / (2 * args.deliveries) * 1000:9.1f} ms/delivery")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Time JSON serialization of large inventory payloads and cached page fragments.
+
+Usage: python benchmarks/bench_serialize.py [--db PATH] [--skus N] [--repeat N]
+
+Builds a catalogue with datagen (no sales) and compares, on every product
+at once:
+  legacy    a dict built field by field per row, then jsonify
+  serialize serialize.records + serialize.dumps (orjson when installed)
+then reports the gzip saving and the page routes with a cold and a warm
+fragment cache.
+"""
+import argparse
+import gzip
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as webapp  # noqa: E402
+import database  # noqa: E402
+import serialize  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "supermarket-serialize-bench.db")
+
+
+def legacy_dict(p):
+    return {
+        "id": p["id"], "name": p["name"], "barcode": p["barcode"],
+        "category_id": p["category_id"], "category_name": p["category_name"],
+        "price": p["price"], "cost_price": p["cost_price"],
+        "stock": p["stock"], "low_stock_threshold": p["low_stock_threshold"],
+    }
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the bulk loads are "slow queries" by design
+    datagen.generate(args.db, skus=args.skus, years=0)
+    database.DB_PATH = args.db
+    database.init_db()
+    conn = database.get_connection()
+    # Low enough thresholds for a dashboard-sized low-stock list.
+    conn.execute("UPDATE products SET low_stock_threshold = stock WHERE id % 50 = 0")
+    conn.commit()
+    rows, _ = database.list_products("name", None, args.skus)
+
+    with webapp.app.test_request_context():
+        legacy = best_of(args.repeat, lambda: webapp.jsonify(
+            {"items": [legacy_dict(p) for p in rows]}).get_data())
+        lean = best_of(args.repeat, lambda: webapp.json_response(
+            {"items": serialize.records(rows, webapp.PRODUCT_JSON_FIELDS)}).get_data())
+        body = serialize.dumps({"items": serialize.records(rows, webapp.PRODUCT_JSON_FIELDS)})
+        compress = best_of(args.repeat, lambda: gzip.compress(
+            body, webapp.COMPRESS_LEVEL, mtime=0))
+        packed = gzip.compress(body, webapp.COMPRESS_LEVEL, mtime=0)
+    database.release_connection()
+
+    encoder = "orjson" if serialize.orjson is not None else "json"
+    print(f"{len(rows)} products ({encoder})")
+    print(f"  legacy dicts + jsonify : {legacy * 1000:9.1f} ms")
+    print(f"  serialize              : {lean * 1000:9.1f} ms  ({legacy / lean:.1f}x)")
+    print(f"  gzip level {webapp.COMPRESS_LEVEL}           : {compress * 1000:9.1f} ms  "
+          f"{len(body) / 1024:,.0f} KiB -> {len(packed) / 1024:,.0f} KiB")
+
+    client = webapp.app.test_client()
+    for path in ("/dashboard", "/inventory", "/suppliers"):
+        def cold():
+            webapp._fragments.clear()
+            client.get(path)
+        cold_time = best_of(args.repeat, cold)
+        warm_time = best_of(args.repeat, lambda: client.get(path))
+        print(f"  GET {path:<18} : {cold_time * 1000:9.2f} ms cold, "
+              f"{warm_time * 1000:.2f} ms warm")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Populate a scratch database with a synthetic store.
+
+Usage: python benchmarks/datagen.py [--db PATH] [--skus N] [--categories N]
+                                    [--suppliers N] [--years N] [--sales-per-day N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import migrations  # noqa: E402
+import reports  # noqa: E402
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "supermarket-bench.db")
+
+ADJECTIVES = ["Fresh", "Organic", "Classic", "Premium", "Family", "Lite", "Spicy",
+              "Sweet", "Smoked", "Frozen", "Wholegrain", "Crunchy"]
+NOUNS = ["Milk", "Bread", "Cheese", "Yogurt", "Juice", "Water", "Cola", "Chips",
+         "Cookies", "Apples", "Bananas", "Chicken", "Beef", "Pizza", "Soap",
+         "Coffee", "Tea", "Rice", "Pasta", "Sauce", "Butter", "Eggs", "Cereal"]
+SIZES = ["100g", "200g", "500g", "1kg", "250ml", "1L", "2L", "6-pack", "12-pack"]
+PAYMENT_METHODS = ["Cash", "Card", "Card", "Card", "Mobile"]
+
+
+def generate(path, skus=5000, categories=20, suppliers=50, years=1,
+             sales_per_day=200, seed=42):
+    """Create (or replace) the database at path. Returns row counts."""
+    rng = random.Random(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    database.DB_PATH = path
+    database.init_db()
+    conn = database.get_connection()
+
+    database.upsert_products([
+        {"name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(SIZES)} #{i}",
+         "barcode": f"{i:012d}",
+         "category": f"Category {i % categories}",
+         "price": round(rng.uniform(0.5, 30), 2),
+         "cost_price": 0.0,
+         "stock": rng.randint(0, 10 ** 6),
+         "low_stock_threshold": rng.randint(5, 50)}
+        for i in range(skus)
+    ])
+    conn.execute("UPDATE products SET cost_price = ROUND(price * 0.6, 2)")
+    products = conn.execute("SELECT id, name, price, cost_price FROM products").fetchall()
+
+    conn.executemany(
+        "INSERT INTO suppliers (name, phone, email, address) VALUES (?, ?, ?, ?)",
+        [(f"Supplier {i}", f"555-{i:04d}", f"orders@supplier{i}.test", f"{i} Depot Road")
+         for i in range(suppliers)],
+    )
+    supplier_ids = [r[0] for r in conn.execute("SELECT id FROM suppliers")]
+    conn.executemany(
+        "INSERT OR IGNORE INTO supplier_products (supplier_id, product_id, supply_price) "
+        "VALUES (?, ?, ?)",
+        [(rng.choice(supplier_ids), p["id"], round(p["price"] * 0.55, 2)) for p in products],
+    )
+    conn.commit()
+
+    start = datetime.now() - timedelta(days=365 * years)
+    sale_count = 0
+    for day in range(365 * years):
+        date = start + timedelta(days=day)
+        sales, items = [], []
+        for _ in range(sales_per_day):
+            sale_count += 1
+            lines = rng.sample(products, rng.randint(1, 12))
+            total = 0.0
+            for p in lines:
+                qty = rng.randint(1, 4)
+                total += p["price"] * qty
+                items.append((sale_count, p["id"], p["name"], qty, p["price"],
+                              round(p["price"] * qty, 2), p["cost_price"]))
+            created = date + timedelta(seconds=rng.randint(8 * 3600, 22 * 3600))
+            sales.append((sale_count, round(total, 2), rng.choice(PAYMENT_METHODS),
+                          created.strftime("%Y-%m-%d %H:%M:%S")))
+        conn.executemany(
+            "INSERT INTO sales (id, total, payment_method, created_at) VALUES (?, ?, ?, ?)",
+            sales,
+        )
+        conn.executemany("""
+            INSERT INTO sale_items (sale_id, product_id, product_name, quantity, unit_price,
+                                    subtotal, unit_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, items)
+        conn.commit()
+
+    database.rebuild_dashboard_stats()
+    reports.rebuild_rollups()
+    conn.execute(migrations.BACKFILL_RECEIPTS)
+    conn.commit()
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("products", "categories", "suppliers", "sales", "sale_items")}
+    database.release_connection()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--suppliers", type=int, default=50)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--sales-per-day", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.db, args.skus, args.categories, args.suppliers,
+                      args.years, args.sales_per_day, args.seed)
+    print(f"{args.db}: " + ", ".join(f"{n} {t}" for t, n in counts.items())
+          + f" in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Drive the POS hot paths through the Flask test client from concurrent tills.
+
+Usage: python benchmarks/load_test.py [--db PATH] [--threads N] [--duration S]
+                                      [--output results.json] [--compare old.json]
+
+Each thread behaves like a till: it searches, looks products up, fills a
+cart and checks out, with the back office loading /dashboard and
+/inventory in between. Reports p50/p95/p99 latency and throughput per
+endpoint, as JSON for comparison across commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        result = {}
+        for name, values in sorted(self.samples.items()):
+            values = sorted(values)
+            result[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput_rps": round(len(values) / elapsed, 1),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        return result
+
+
+def till(app, recorder, product_ids, words, deadline, seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+
+    def call(name, method, url, **kwargs):
+        started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        recorder.record(name, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    while time.perf_counter() < deadline:
+        call("GET /api/products/search", "get",
+             f"/api/products/search?q={rng.choice(words)}")
+        for _ in range(rng.randint(1, 10)):
+            product_id = rng.choice(product_ids)
+            call("GET /api/products/<id>", "get", f"/api/products/{product_id}")
+            call("POST /api/cart/add", "post", "/api/cart/add",
+                 json={"product_id": product_id, "quantity": 1})
+        call("GET /api/cart", "get", "/api/cart")
+        call("POST /api/checkout", "post", "/api/checkout",
+             json={"payment_method": rng.choice(datagen.PAYMENT_METHODS)})
+        if rng.random() < 0.2:
+            call("GET /dashboard", "get", "/dashboard")
+        if rng.random() < 0.1:
+            call("GET /inventory", "get", "/inventory")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(db_path, threads=8, duration=10.0, seed=1):
+    database.DB_PATH = db_path
+    database.init_db()
+    from app import app
+
+    conn = database.get_connection()
+    product_ids = [r[0] for r in conn.execute("SELECT id FROM products WHERE stock > 1000")]
+    words = sorted({w for (name,) in conn.execute("SELECT name FROM products LIMIT 2000")
+                    for w in name.split() if len(w) >= 3 and not w.startswith("#")})
+    database.release_connection()
+    if not product_ids:
+        raise SystemExit(f"{db_path} has no stocked products; run benchmarks/datagen.py first")
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    workers = [threading.Thread(target=till,
+                                args=(app, recorder, product_ids, words, deadline, seed + i))
+               for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "revision": git_revision(),
+        "db": db_path,
+        "threads": threads,
+        "duration_s": round(elapsed, 2),
+        "endpoints": recorder.summary(elapsed),
+        "pool": database.pool_stats(),
+    }
+
+
+def print_report(report, baseline=None):
+    base = (baseline or {}).get("endpoints", {})
+    print(f"revision {report['revision']}  threads {report['threads']}  "
+          f"duration {report['duration_s']}s", file=sys.stderr)
+    print(f"{'endpoint':<28}{'count':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'err':>5}" + ("  p95 vs base" if base else ""), file=sys.stderr)
+    for name, s in report["endpoints"].items():
+        line = (f"{name:<28}{s['count']:>7}{s['throughput_rps']:>8}{s['p50_ms']:>9}"
+                f"{s['p95_ms']:>9}{s['p99_ms']:>9}{s['errors']:>5}")
+        if name in base and base[name]["p95_ms"]:
+            line += f"  {(s['p95_ms'] / base[name]['p95_ms'] - 1) * 100:+.1f}%"
+        print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=datagen.DEFAULT_DB)
+    parser.add_argument("--generate", action="store_true",
+                        help="(re)generate the database with datagen defaults first")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare p95 against")
+    args = parser.parse_args()
+
+    if args.generate or not os.path.exists(args.db):
+        datagen.generate(args.db)
+    report = run(args.db, args.threads, args.duration, args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
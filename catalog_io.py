@@ -0,0 +1,154 @@
+"""Streaming product catalogue import and export (CSV and JSON Lines).
+
+    python catalog_io.py import products.csv
+    python catalog_io.py export --format jsonl > products.jsonl
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import database
+
+FIELDS = ("name", "barcode", "category", "price", "cost_price", "stock",
+          "low_stock_threshold")
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+def format_for(filename, default="csv"):
+    for fmt in FORMATS:
+        if filename and filename.lower().endswith("." + fmt):
+            return fmt
+    return default
+
+
+def read_rows(stream, fmt="csv"):
+    """Yield (line_number, raw dict) from a text stream, one row at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, row if isinstance(row, dict) else ValueError("not an object")
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+
+def _optional(row, field, cast):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return cast(value)
+
+
+def validate_row(row):
+    """Normalise one raw row for database.upsert_products, or raise ValueError."""
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    price = _optional(row, "price", float)
+    if price is None:
+        raise ValueError("price is required")
+    product = {
+        "name": name,
+        "barcode": _optional(row, "barcode", lambda v: str(v).strip()),
+        "category": _optional(row, "category", lambda v: str(v).strip()),
+        "price": price,
+        "cost_price": _optional(row, "cost_price", float),
+        "stock": _optional(row, "stock", int),
+        "low_stock_threshold": _optional(row, "low_stock_threshold", int),
+    }
+    for field in ("price", "cost_price", "stock", "low_stock_threshold"):
+        if product[field] is not None and product[field] < 0:
+            raise ValueError(f"{field} must not be negative")
+    return product
+
+
+def import_catalog(stream, fmt="csv", batch_size=BATCH_SIZE):
+    """
+    Validate and upsert products from a text stream in batches.
+    Returns a summary dict; invalid rows are skipped and listed in "errors".
+    """
+    summary = {"inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    batch = []
+
+    def flush():
+        inserted, updated = database.upsert_products(batch)
+        summary["inserted"] += inserted
+        summary["updated"] += updated
+        batch.clear()
+
+    for line_number, raw in read_rows(stream, fmt):
+        try:
+            if isinstance(raw, Exception):
+                raise ValueError(str(raw))
+            batch.append(validate_row(raw))
+        except (ValueError, TypeError) as e:
+            summary["error_count"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"line": line_number, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return summary
+
+
+def export_catalog(fmt="csv", batch_size=1000):
+    """Yield the catalogue as chunks of CSV or JSON Lines text."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(FIELDS)
+    for i, p in enumerate(database.iter_products(batch_size), 1):
+        values = (p["name"], p["barcode"], p["category_name"], p["price"],
+                  p["cost_price"], p["stock"], p["low_stock_threshold"])
+        if fmt == "csv":
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(FIELDS, values))) + "\n")
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export the product catalogue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=FORMATS)
+    exp = sub.add_parser("export")
+    exp.add_argument("--format", choices=FORMATS, default="csv")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            summary = import_catalog(f, args.format or format_for(args.path))
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        for chunk in export_catalog(args.format):
+            sys.stdout.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
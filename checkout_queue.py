@@ -0,0 +1,193 @@
+"""Group-commit checkout queue.
+
+SQLite takes one writer at a time, so instead of every till opening its own
+write transaction and contending for the lock, checkouts are handed to one
+writer thread per process. It takes everything queued so far (up to
+MAX_BATCH) and records it with database.create_sales in one transaction,
+so under load a single commit covers many sales. Callers block on a Future
+for their sale ID; a checkout that is still waiting in the queue when its
+caller gives up is cancelled rather than written later. Each store database
+gets its own queue and writer.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+
+MAX_PENDING = 1000      # queued checkouts before submit() refuses more
+MAX_BATCH = 64          # sales per transaction
+SUBMIT_TIMEOUT = 1.0    # seconds to wait for room in a full queue
+RESULT_TIMEOUT = 10.0   # seconds a caller waits for its sale ID
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_STOP = object()
+
+
+class CheckoutBusy(RuntimeError):
+    """The writer is too far behind to take or finish this checkout."""
+
+
+class CheckoutQueue:
+    """Bounded queue of checkouts drained by a single writer thread."""
+
+    def __init__(self, path, store=None, max_pending=MAX_PENDING, max_batch=MAX_BATCH):
+        self.path = path
+        self.store = store
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._queue = queue.Queue(max_pending)
+        self._stats = {"submitted": 0, "committed": 0, "rejected": 0, "failed": 0,
+                       "busy": 0, "cancelled": 0, "batches": 0, "batch_seconds": 0.0,
+                       "wait_seconds": 0.0, "batch_sizes": dict.fromkeys(BATCH_BUCKETS, 0)}
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the parent's writer and queue are not ours.
+                self._pid = os.getpid()
+                self._queue = queue.Queue(self.max_pending)
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="checkout-writer",
+                                                daemon=True)
+                self._thread.start()
+
+    def submit(self, items, payment_method="Cash", cart_id=None):
+        """Queue a checkout and return a Future for its sale ID."""
+        self._ensure_writer()
+        future = Future()
+        try:
+            self._queue.put((future, items, payment_method, cart_id, time.perf_counter()),
+                            timeout=SUBMIT_TIMEOUT)
+        except queue.Full:
+            self._count("busy")
+            raise CheckoutBusy("Checkout queue is full, please retry")
+        self._count("submitted")
+        return future
+
+    def checkout(self, items, payment_method="Cash", cart_id=None, timeout=RESULT_TIMEOUT):
+        """Submit a checkout and wait for it. Raises ValueError if it is rejected."""
+        future = self.submit(items, payment_method, cart_id)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.cancel():
+                self._count("cancelled")
+                raise CheckoutBusy("Checkout timed out in the queue, please retry")
+            # Already in a transaction being written; its outcome is imminent.
+            return future.result()
+
+    def stop(self, timeout=5.0):
+        """Let the writer finish what is queued, then end it."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        database.set_store(self.store)
+        try:
+            stopping = False
+            while not stopping:
+                entry = self._queue.get()
+                if entry is _STOP:
+                    break
+                batch = [entry]
+                while len(batch) < self.max_batch:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is _STOP:
+                        stopping = True
+                        break
+                    batch.append(entry)
+                self._write(batch)
+        finally:
+            database.release_connection()
+
+    def _write(self, batch):
+        batch = [entry for entry in batch if entry[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            results = database.create_sales(
+                [{"items": items, "payment_method": payment_method, "cart_id": cart_id}
+                 for _, items, payment_method, cart_id, _ in batch])
+        except Exception as e:
+            # The whole transaction failed (e.g. the database stayed locked).
+            for future, *_ in batch:
+                future.set_exception(e)
+            self._count("failed", len(batch))
+            return
+        finished = time.perf_counter()
+
+        committed = 0
+        for (future, *_), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+                committed += 1
+        bucket = next((b for b in BATCH_BUCKETS if len(batch) <= b), BATCH_BUCKETS[-1])
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batch_sizes"][bucket] += 1
+            self._stats["batch_seconds"] += finished - started
+            self._stats["wait_seconds"] += sum(finished - entry[4] for entry in batch)
+            self._stats["committed"] += committed
+            self._stats["rejected"] += len(batch) - committed
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, batch_sizes=dict(self._stats["batch_sizes"]))
+        stats["depth"] = self._queue.qsize()
+        stats["max_pending"] = self.max_pending
+        done = stats["committed"] + stats["rejected"]
+        stats["mean_batch_size"] = round(done / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["mean_wait_ms"] = round(stats["wait_seconds"] / done * 1000, 3) if done else 0.0
+        return stats
+
+
+_queues = {}
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """The checkout queue for the current store's database."""
+    path = database.current_path()
+    writer = _queues.get(path)
+    if writer is None:
+        with _queue_lock:
+            writer = _queues.get(path)
+            if writer is None:
+                writer = _queues[path] = CheckoutQueue(path, database.current_store())
+    return writer
+
+
+def checkout(items, payment_method="Cash", cart_id=None, timeout=RESULT_TIMEOUT):
+    return get_queue().checkout(items, payment_method, cart_id, timeout)
+
+
+def queue_stats():
+    return get_queue().stats()
+
+
+@atexit.register
+def _shutdown():
+    for writer in list(_queues.values()):
+        writer.stop()
@@ -1,29 +1,320 @@
 import sqlite3
+import base64
+import contextlib
+import contextvars
+import json
 import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+import events
+import instrumentation
+import migrations
+import pricing
+from cache import LRUCache
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "supermarket.db")
 
-_conn = None
+# Store databases by store ID, for serving several branches from one app.
+# Empty means a single store at DB_PATH. Set with configure_stores() or
+# SUPERMARKET_STORES="north=/data/north.db,south=/data/south.db".
+STORES = {}
+
+CART_TTL_HOURS = 24
+
+PRODUCT_FIELDS = {"name", "barcode", "category_id", "price", "cost_price", "stock",
+                  "low_stock_threshold"}
+NUMERIC_PRODUCT_FIELDS = {"price", "cost_price", "stock", "low_stock_threshold"}
+
+# Sort keys accepted by list_products, mapped to their indexed columns.
+PRODUCT_SORTS = {"name": "p.name", "price": "p.price", "stock": "p.stock"}
+
+# Product edits touching more rows than this are broadcast as one
+# catalogue-wide change instead of row by row.
+EVENT_PRODUCT_LIMIT = 100
+
+PRODUCT_CACHE_SIZE = 4096
+PRODUCT_CACHE_TTL = 30.0
+
+POOL_SIZE = 8
+POOL_TIMEOUT = 10.0
+BUSY_TIMEOUT = 5.0
+
+# Applied to every new connection. WAL lets readers proceed while a till is
+# writing; synchronous=NORMAL is durable across app crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}",
+)
+
+_local = threading.local()
+
+# The store the current request or thread works on; None is DB_PATH.
+_store = contextvars.ContextVar("store", default=None)
+
+# Whether the products_fts index exists; detected lazily per process.
+_fts_enabled = None
+
+# Read-through caches, keyed by database path as well as the lookup key.
+# The barcode cache maps to a product ID and is re-checked against the row.
+_products_by_id = LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+_product_ids_by_barcode = LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+_categories = LRUCache(16, PRODUCT_CACHE_TTL)
 
 
-def _make_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON")
+def _make_connection(path=None):
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     conn.row_factory = sqlite3.Row
-    return conn
+    return instrumentation.InstrumentedConnection(conn)
 
 
-def get_connection():
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections to one database file.
+
+    Connections are created lazily up to ``size``; callers beyond that wait
+    up to ``timeout`` seconds for one to be released.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self._stats = {"checkouts": 0, "hits": 0, "created": 0,
+                       "waits": 0, "timeouts": 0, "wait_seconds": 0.0}
+
+    def acquire(self):
+        with self._cond:
+            if self._pid != os.getpid():
+                # Forked worker: never share the parent's connections.
+                self._reset()
+            self._stats["checkouts"] += 1
+            if not self._idle and self._open >= self.size:
+                self._stats["waits"] += 1
+                started = time.perf_counter()
+                ready = self._cond.wait_for(
+                    lambda: self._idle or self._open < self.size, self.timeout)
+                self._stats["wait_seconds"] += time.perf_counter() - started
+                if not ready:
+                    self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(
+                        f"connection pool exhausted ({self.size} in use)")
+            if self._idle:
+                self._stats["hits"] += 1
+                return self._idle.pop()
+            self._open += 1
+        try:
+            conn = _make_connection(self.path)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            for conn in self._idle:
+                conn.close()
+            self._open -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self.size, open=self._open, idle=len(self._idle),
+                         in_use=self._open - len(self._idle))
+        stats["hit_rate"] = (round(stats["hits"] / stats["checkouts"], 4)
+                             if stats["checkouts"] else 0.0)
+        return stats
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The connection pool for the current store's database."""
+    path = current_path()
+    pool = _pools.get(path)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def cache_stats():
+    return {
+        "products_by_id": _products_by_id.stats(),
+        "product_ids_by_barcode": _product_ids_by_barcode.stats(),
+        "categories": _categories.stats(),
+    }
+
+
+def invalidate_products(product_ids=None):
+    """Drop cached product rows; all of them when no IDs are given."""
+    if product_ids is None:
+        _products_by_id.clear()
+        _product_ids_by_barcode.clear()
+        return
+    for product_id in product_ids:
+        _products_by_id.pop((current_path(), product_id))
+
+
+def _connections():
+    """This request's connections by store path, else this thread's."""
     try:
         from flask import g
-        if "db" not in g:
-            g.db = _make_connection()
-        return g.db
+        if "dbs" not in g:
+            g.dbs = {}
+        return g.dbs
     except (ImportError, RuntimeError):
-        global _conn
-        if _conn is None:
-            _conn = _make_connection()
-        return _conn
+        # Outside a request each thread holds one pooled connection per
+        # store until it calls release_connection().
+        conns = getattr(_local, "conns", None)
+        if conns is None:
+            conns = _local.conns = {}
+        return conns
+
+
+def get_connection():
+    conns = _connections()
+    path = current_path()
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = get_pool().acquire()
+    return conn
+
+
+def release_connections(conns):
+    """Return {path: connection} pairs to their stores' pools."""
+    for path, conn in conns.items():
+        _pools[path].release(conn)
+
+
+def release_connection(conn=None):
+    """Return a connection to the current store's pool.
+
+    With no argument, releases the calling thread's non-request connections.
+    """
+    if conn is None:
+        conns = getattr(_local, "conns", None) or {}
+        _local.conns = None
+        release_connections(conns)
+        return
+    get_pool().release(conn)
+
+
+# ── Stores ──────────────────────────────────────────────────────────
+
+def configure_stores(stores):
+    """Replace the store table with {store_id: database path}."""
+    STORES.clear()
+    STORES.update({str(store_id): path for store_id, path in stores.items()})
+
+
+def parse_stores(value):
+    """Parse "id=path,id=path" as used in SUPERMARKET_STORES."""
+    stores = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        store_id, sep, path = entry.partition("=")
+        if not sep or not store_id.strip() or not path.strip():
+            raise ValueError(f"Invalid store entry '{entry}', expected id=path")
+        stores[store_id.strip()] = path.strip()
+    return stores
+
+
+def store_ids():
+    """Configured store IDs, or [None] when running a single store."""
+    return list(STORES) or [None]
+
+
+def current_store():
+    return _store.get()
+
+
+def current_path():
+    store = _store.get()
+    return DB_PATH if store is None else STORES[store]
+
+
+def set_store(store_id):
+    """
+    Route this thread's (or request's) queries to a store. Returns a token
+    for reset_store(). Raises ValueError for an unknown store.
+    """
+    if store_id is not None:
+        store_id = str(store_id)
+        if store_id not in STORES:
+            raise ValueError(f"Unknown store '{store_id}'")
+    return _store.set(store_id)
+
+
+def reset_store(token):
+    _store.reset(token)
+
+
+@contextlib.contextmanager
+def use_store(store_id):
+    """Run a block against one store, releasing its connection after."""
+    token = set_store(store_id)
+    try:
+        yield
+    finally:
+        conn = _connections().pop(current_path(), None)
+        if conn is not None:
+            get_pool().release(conn)
+        reset_store(token)
+
+
+def init_stores():
+    """Create or migrate every store's database."""
+    for store_id in store_ids():
+        with use_store(store_id):
+            init_db()
+
+
+configure_stores(parse_stores(os.environ.get("SUPERMARKET_STORES", "")))
 
 
 def init_db():
@@ -84,20 +375,100 @@ def init_db():
             FOREIGN KEY (product_id) REFERENCES products(id)
         );
     """)
+    _init_search_index(conn)
     conn.commit()
+    migrations.migrate(conn)
+
+
+def _init_search_index(conn):
+    """Create the trigram FTS5 index over product name/barcode, if supported."""
+    global _fts_enabled
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+    ).fetchone()
+    try:
+        conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, barcode,
+                content='products', content_rowid='id',
+                tokenize='trigram'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts (rowid, name, barcode)
+                VALUES (new.id, new.name, new.barcode);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, barcode)
+                VALUES ('delete', old.id, old.name, old.barcode);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS products_fts_au
+            AFTER UPDATE OF name, barcode ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, barcode)
+                VALUES ('delete', old.id, old.name, old.barcode);
+                INSERT INTO products_fts (rowid, name, barcode)
+                VALUES (new.id, new.name, new.barcode);
+            END;
+        """)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer).
+        _fts_enabled = False
+        return
+    if not exists:
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    _fts_enabled = True
+
+
+# ── Pagination ──────────────────────────────────────────────────────
+
+def encode_cursor(values):
+    """Encode the last row's sort key as an opaque, URL-safe page cursor."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _keyset_page(conn, query, params, limit, key):
+    """
+    Fetch one page plus one extra row to learn whether another page exists.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    rows = conn.execute(query + " LIMIT ?", params + [limit + 1]).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
 
 
 # ── Categories ──────────────────────────────────────────────────────
 
 def get_all_categories():
-    conn = get_connection()
-    return conn.execute("SELECT * FROM categories ORDER BY name").fetchall()
+    categories = _categories.get(current_path())
+    if categories is None:
+        conn = get_connection()
+        categories = conn.execute("SELECT * FROM categories ORDER BY name").fetchall()
+        _categories.set(current_path(), categories)
+    return categories
 
 
 def add_category(name):
     conn = get_connection()
     cur = conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
     conn.commit()
+    _categories.pop(current_path())
+    _publish("category", {"id": cur.lastrowid, "name": name})
     return cur.lastrowid
 
 
@@ -106,6 +477,10 @@ def delete_category(category_id):
     conn.execute("UPDATE products SET category_id = NULL WHERE category_id = ?", (category_id,))
     conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
     conn.commit()
+    _categories.pop(current_path())
+    # Cached rows carry category_name.
+    invalidate_products()
+    _publish("category_deleted", {"id": category_id})
 
 
 # ── Products ────────────────────────────────────────────────────────
@@ -120,7 +495,24 @@ def get_all_products():
     """).fetchall()
 
 
-def search_products(keyword="", category_id=None):
+def _search_index_available(conn):
+    global _fts_enabled
+    if _fts_enabled is None:
+        _fts_enabled = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+        ).fetchone() is not None
+    return _fts_enabled
+
+
+def list_products(sort="name", cursor=None, limit=50, category_id=None, descending=False):
+    """
+    One page of products ordered by name, price or stock, then ID.
+    Returns (rows, next_cursor).
+    """
+    if sort not in PRODUCT_SORTS:
+        raise ValueError(f"Unknown sort '{sort}'")
+    column = PRODUCT_SORTS[sort]
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
     conn = get_connection()
     query = """
         SELECT p.*, c.name as category_name
@@ -129,34 +521,97 @@ def search_products(keyword="", category_id=None):
         WHERE 1=1
     """
     params = []
+    if category_id:
+        query += " AND p.category_id = ?"
+        params.append(category_id)
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query += f" AND ({column}, p.id) {op} (?, ?)"
+        params.extend([last_value, last_id])
+    query += f" ORDER BY {column} {direction}, p.id {direction}"
+    return _keyset_page(conn, query, params, limit, lambda r: [r[sort], r["id"]])
+
+
+def search_products(keyword="", category_id=None, limit=None, offset=0):
+    """
+    Search by name or barcode substring, best matches first.
+    An exact barcode match short-circuits the full-text search.
+    """
+    conn = get_connection()
+    keyword = keyword.strip()
     if keyword:
-        query += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
-        params.extend([f"%{keyword}%", f"%{keyword}%"])
+        product = get_product_by_barcode(keyword)
+        if product and (not category_id or product["category_id"] == category_id):
+            return [product] if offset == 0 else []
+
+    params = []
+    # The trigram tokenizer needs at least three characters to match.
+    if len(keyword) >= 3 and _search_index_available(conn):
+        query = """
+            SELECT p.*, c.name as category_name
+            FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE products_fts MATCH ?
+        """
+        params.append('"' + keyword.replace('"', '""') + '"')
+        order = " ORDER BY f.rank, p.name"
+    else:
+        query = """
+            SELECT p.*, c.name as category_name
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE 1=1
+        """
+        if keyword:
+            query += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
+            params.extend([f"%{keyword}%", f"%{keyword}%"])
+        order = " ORDER BY p.name"
     if category_id:
         query += " AND p.category_id = ?"
         params.append(category_id)
-    query += " ORDER BY p.name"
+    query += order
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
     return conn.execute(query, params).fetchall()
 
 
 def get_product_by_id(product_id):
-    conn = get_connection()
-    return conn.execute("""
-        SELECT p.*, c.name as category_name
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        WHERE p.id = ?
-    """, (product_id,)).fetchone()
+    key = (current_path(), product_id)
+    product = _products_by_id.get(key)
+    if product is None:
+        conn = get_connection()
+        product = conn.execute("""
+            SELECT p.*, c.name as category_name
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE p.id = ?
+        """, (product_id,)).fetchone()
+        if product is not None:
+            _products_by_id.set(key, product)
+    return product
 
 
 def get_product_by_barcode(barcode):
+    key = (current_path(), barcode)
+    product_id = _product_ids_by_barcode.get(key)
+    if product_id is not None:
+        product = get_product_by_id(product_id)
+        if product is not None and product["barcode"] == barcode:
+            return product
+        _product_ids_by_barcode.pop(key)
     conn = get_connection()
-    return conn.execute("""
+    product = conn.execute("""
         SELECT p.*, c.name as category_name
         FROM products p
         LEFT JOIN categories c ON p.category_id = c.id
         WHERE p.barcode = ?
     """, (barcode,)).fetchone()
+    if product is not None:
+        _product_ids_by_barcode.set(key, product["id"])
+        _products_by_id.set((current_path(), product["id"]), product)
+    return product
 
 
 def add_product(name, barcode, category_id, price, cost_price, stock, low_stock_threshold):
@@ -166,6 +621,7 @@ def add_product(name, barcode, category_id, price, cost_price, stock, low_stock_
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (name, barcode or None, category_id or None, price, cost_price, stock, low_stock_threshold))
     conn.commit()
+    _publish_products([cur.lastrowid], created=True)
     return cur.lastrowid
 
 
@@ -179,12 +635,212 @@ def update_product(product_id, **fields):
     values = list(updates.values()) + [product_id]
     conn.execute(f"UPDATE products SET {set_clause} WHERE id = ?", values)
     conn.commit()
+    invalidate_products([product_id])
+    _publish_products([product_id])
+
+
+def bulk_update_products(updates):
+    """
+    Apply many product updates in one transaction.
+
+    Each update selects products by "id" or by "category_id" and maps fields
+    either to a new value or, for numeric fields, to a relative adjustment:
+    {"add": n} or {"mul": factor}. Updates that share a selector and the same
+    field/operation set are applied with a single executemany.
+    Returns {"requested", "updated", "statements"}.
+    """
+    groups = {}
+    by_id = set()
+    for update in updates:
+        if "id" in update:
+            selector = "id"
+            by_id.add(update["id"])
+        elif "category_id" in update:
+            selector = "category_id"
+        else:
+            raise ValueError("Each update needs an 'id' or 'category_id'")
+        sets, values = [], []
+        for field in sorted(k for k in update if k != selector):
+            if field not in PRODUCT_FIELDS:
+                raise ValueError(f"Unknown field '{field}'")
+            value = update[field]
+            if not isinstance(value, dict):
+                sets.append(f"{field} = ?")
+                values.append(value)
+                continue
+            if field not in NUMERIC_PRODUCT_FIELDS or len(value) != 1:
+                raise ValueError(f"Invalid adjustment for '{field}'")
+            (op, operand), = value.items()
+            if isinstance(operand, bool) or not isinstance(operand, (int, float)):
+                raise ValueError(f"Adjustment for '{field}' must be a number")
+            if op == "add":
+                sets.append(f"{field} = {field} + ?")
+            elif op == "mul" and field in ("price", "cost_price"):
+                sets.append(f"{field} = ROUND({field} * ?, 2)")
+            elif op == "mul":
+                sets.append(f"{field} = CAST(ROUND({field} * ?) AS INTEGER)")
+            else:
+                raise ValueError(f"Unknown adjustment '{op}' for '{field}'")
+            values.append(operand)
+        if not sets:
+            raise ValueError("Update has no fields to change")
+        sql = f"UPDATE products SET {', '.join(sets)} WHERE {selector} = ?"
+        groups.setdefault(sql, []).append(values + [update[selector]])
+
+    conn = get_connection()
+    updated = 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for sql, params in groups.items():
+            updated += conn.executemany(sql, params).rowcount
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise ValueError(f"Bulk update rejected, no changes applied: {e}")
+    except Exception:
+        conn.rollback()
+        raise
+    if len(by_id) == len(updates):
+        invalidate_products(by_id)
+        _publish_products(by_id)
+    else:
+        invalidate_products()
+        _publish_products()
+    return {"requested": len(updates), "updated": updated, "statements": len(groups)}
 
 
 def delete_product(product_id):
     conn = get_connection()
     conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
     conn.commit()
+    invalidate_products([product_id])
+    _publish("product_deleted", {"id": product_id})
+
+
+def upsert_products(rows):
+    """
+    Insert or update many products in one transaction, matching on barcode.
+    rows: dicts with name, price and optionally barcode, category (a name),
+    cost_price, stock and low_stock_threshold. Optional fields left out (None)
+    keep their current value on update and take the column default on insert.
+    Unknown category names are created. Returns (inserted, updated).
+    """
+    if not rows:
+        return 0, 0
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        categories = {r["name"]: r["id"] for r in conn.execute("SELECT id, name FROM categories")}
+        new_categories = {r["category"] for r in rows
+                          if r.get("category") and r["category"] not in categories}
+        for name in sorted(new_categories):
+            categories[name] = conn.execute(
+                "INSERT INTO categories (name) VALUES (?)", (name,)
+            ).lastrowid
+
+        barcodes = [r["barcode"] for r in rows if r.get("barcode")]
+        existing = set()
+        for i in range(0, len(barcodes), 900):
+            chunk = barcodes[i:i + 900]
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT barcode FROM products WHERE barcode IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+
+        params = []
+        updated = 0
+        for r in rows:
+            barcode = r.get("barcode") or None
+            if barcode in existing:
+                updated += 1
+            elif barcode:
+                existing.add(barcode)
+            category_id = categories.get(r.get("category")) if r.get("category") else None
+            params.append((
+                r["name"], barcode, category_id, r["price"],
+                r.get("cost_price") or 0,
+                r["stock"] if r.get("stock") is not None else 0,
+                r["low_stock_threshold"] if r.get("low_stock_threshold") is not None else 10,
+                category_id, r.get("cost_price"), r.get("stock"), r.get("low_stock_threshold"),
+            ))
+        conn.executemany("""
+            INSERT INTO products (name, barcode, category_id, price, cost_price, stock, low_stock_threshold)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(barcode) DO UPDATE SET
+                name = excluded.name,
+                price = excluded.price,
+                category_id = COALESCE(?, category_id),
+                cost_price = COALESCE(?, cost_price),
+                stock = COALESCE(?, stock),
+                low_stock_threshold = COALESCE(?, low_stock_threshold)
+        """, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if new_categories:
+        _categories.pop(current_path())
+    invalidate_products()
+    _publish_products()
+    return len(rows) - updated, updated
+
+
+def _publish(kind, data):
+    """Broadcast a change to pages open on the current store."""
+    events.publish(kind, data, channel=current_store())
+
+
+def _publish_products(product_ids=None, created=False):
+    """Broadcast the current rows of changed products, or one catalogue-wide
+    change when there are too many (or they are not known individually)."""
+    if product_ids is None or len(product_ids) > EVENT_PRODUCT_LIMIT:
+        _publish("catalog", {})
+        return
+    ids = list(product_ids)
+    if not ids:
+        return
+    conn = get_connection()
+    rows = conn.execute(f"""
+        SELECT p.*, c.name as category_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        WHERE p.id IN ({', '.join('?' * len(ids))})
+    """, ids).fetchall()
+    _publish("product", {"products": [dict(row) for row in rows], "created": created})
+
+
+def iter_products(batch_size=1000):
+    """
+    Yield every product with its category name in ID order, reading one
+    short keyset batch at a time so no read transaction is held open.
+    """
+    last_id = 0
+    while True:
+        conn = get_connection()
+        batch = conn.execute("""
+            SELECT p.*, c.name as category_name
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE p.id > ?
+            ORDER BY p.id
+            LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1]["id"]
+
+
+def get_stock_levels(product_ids):
+    """Current price and stock for the given products."""
+    ids = list(product_ids)
+    if not ids:
+        return []
+    conn = get_connection()
+    return conn.execute(
+        f"SELECT id, price, stock FROM products WHERE id IN ({', '.join('?' * len(ids))})",
+        ids,
+    ).fetchall()
 
 
 def get_low_stock_products():
@@ -198,6 +854,72 @@ def get_low_stock_products():
     """).fetchall()
 
 
+# ── Catalogue Sync ──────────────────────────────────────────────────
+
+def catalog_version():
+    """Latest catalogue change version; 0 for an empty catalogue."""
+    conn = get_connection()
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM catalog_changes").fetchone()[0]
+
+
+def data_version(name):
+    """
+    Trigger-maintained change counter of 'categories', 'suppliers' or
+    'low_stock' (the products on the low-stock list), for keying caches.
+    """
+    conn = get_connection()
+    row = conn.execute("SELECT version FROM data_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def get_catalog_changes(since=0, limit=1000):
+    """
+    Products and categories changed after version `since`, oldest change
+    first. Returns a dict with the current rows of changed products and
+    categories, the IDs of deleted ones, the version to ask from next time
+    and whether more changes are waiting beyond `limit`.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN")  # one snapshot for the log and the rows it names
+    try:
+        changes = conn.execute("""
+            SELECT version, entity, entity_id, deleted FROM catalog_changes
+            WHERE version > ? ORDER BY version LIMIT ?
+        """, (since, limit + 1)).fetchall()
+        more = len(changes) > limit
+        changes = changes[:limit]
+        changed = {"product": [], "category": []}
+        deleted = {"product": [], "category": []}
+        for change in changes:
+            (deleted if change["deleted"] else changed)[change["entity"]].append(change["entity_id"])
+
+        products = []
+        for start in range(0, len(changed["product"]), 500):
+            ids = changed["product"][start:start + 500]
+            products += conn.execute(f"""
+                SELECT p.*, c.name as category_name
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                WHERE p.id IN ({', '.join('?' * len(ids))})
+            """, ids).fetchall()
+        categories = []
+        if changed["category"]:
+            categories = conn.execute(
+                f"SELECT * FROM categories WHERE id IN ({', '.join('?' * len(changed['category']))})",
+                changed["category"],
+            ).fetchall()
+    finally:
+        conn.commit()
+    return {
+        "version": changes[-1]["version"] if changes else since,
+        "more": more,
+        "products": products,
+        "categories": categories,
+        "deleted_products": deleted["product"],
+        "deleted_categories": deleted["category"],
+    }
+
+
 # ── Suppliers ───────────────────────────────────────────────────────
 
 def get_all_suppliers():
@@ -205,6 +927,19 @@ def get_all_suppliers():
     return conn.execute("SELECT * FROM suppliers ORDER BY name").fetchall()
 
 
+def list_suppliers(cursor=None, limit=50):
+    """One page of suppliers ordered by name. Returns (rows, next_cursor)."""
+    conn = get_connection()
+    query = "SELECT * FROM suppliers"
+    params = []
+    if cursor:
+        last_name, last_id = decode_cursor(cursor)
+        query += " WHERE (name, id) > (?, ?)"
+        params.extend([last_name, last_id])
+    query += " ORDER BY name, id"
+    return _keyset_page(conn, query, params, limit, lambda r: [r["name"], r["id"]])
+
+
 def get_supplier_by_id(supplier_id):
     conn = get_connection()
     return conn.execute("SELECT * FROM suppliers WHERE id = ?", (supplier_id,)).fetchone()
@@ -267,6 +1002,507 @@ def get_supplier_products(supplier_id):
     """, (supplier_id,)).fetchall()
 
 
+# ── Stock Ledger ────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def _stock_reason(conn, reason, ref_id=None):
+    """
+    Attribute the stock changes made inside the block to reason/ref_id in
+    stock_movements. Only within the caller's transaction: on error the
+    rollback restores the default ('adjustment') along with everything else.
+    """
+    conn.execute("UPDATE stock_context SET reason = ?, ref_id = ? WHERE id = 1",
+                 (reason, ref_id))
+    yield
+    conn.execute("UPDATE stock_context SET reason = 'adjustment', ref_id = NULL WHERE id = 1")
+
+
+def list_stock_movements(product_id, cursor=None, limit=50):
+    """One product's stock movements, newest first. Returns (rows, next_cursor)."""
+    conn = get_connection()
+    query = "SELECT * FROM stock_movements WHERE product_id = ?"
+    params = [product_id]
+    if cursor:
+        last_id, = decode_cursor(cursor)
+        query += " AND id < ?"
+        params.append(last_id)
+    query += " ORDER BY id DESC"
+    return _keyset_page(conn, query, params, limit, lambda r: [r["id"]])
+
+
+# ── Purchase Orders ─────────────────────────────────────────────────
+
+def _merge_lines(lines, key="product_id"):
+    """Sum the quantities of repeated products, keeping first-seen order."""
+    merged = {}
+    for line in lines:
+        if not isinstance(line, dict) or key not in line:
+            raise ValueError(f"Each item needs {key} and quantity")
+        quantity = line.get("quantity", 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f"Quantity must be a positive whole number, got {quantity!r}")
+        merged[line[key]] = merged.get(line[key], 0) + quantity
+    return merged
+
+
+def create_purchase_order(supplier_id, lines, reference=None):
+    """
+    Order products from a supplier. lines: dicts with product_id, quantity
+    and optionally unit_cost, which defaults to the supply_price the product
+    is linked to the supplier at. Every product must be linked to the
+    supplier. Returns the new order ID.
+    """
+    if not lines:
+        raise ValueError("Purchase order has no lines")
+    quantities = _merge_lines(lines)
+    costs = {line["product_id"]: line["unit_cost"] for line in lines
+             if line.get("unit_cost") is not None}
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if get_supplier_by_id(supplier_id) is None:
+            raise ValueError(f"Supplier ID {supplier_id} not found")
+        ids = list(quantities)
+        linked = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            linked.update((row["id"], row) for row in conn.execute(f"""
+                SELECT p.id, p.name, sp.supply_price
+                FROM supplier_products sp
+                JOIN products p ON sp.product_id = p.id
+                WHERE sp.supplier_id = ? AND p.id IN ({', '.join('?' * len(chunk))})
+            """, [supplier_id, *chunk]))
+        missing = [product_id for product_id in ids if product_id not in linked]
+        if missing:
+            raise ValueError(f"Products not supplied by supplier {supplier_id}: "
+                             f"{', '.join(map(str, missing[:10]))}")
+        order_id = conn.execute(
+            "INSERT INTO purchase_orders (supplier_id, reference) VALUES (?, ?)",
+            (supplier_id, reference or None),
+        ).lastrowid
+        conn.executemany("""
+            INSERT INTO purchase_order_lines (order_id, product_id, product_name, unit_cost,
+                                              ordered)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(order_id, product_id, linked[product_id]["name"],
+               costs.get(product_id, linked[product_id]["supply_price"] or 0), quantity)
+              for product_id, quantity in quantities.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return order_id
+
+
+def list_purchase_orders(status=None, supplier_id=None, cursor=None, limit=50):
+    """Purchase orders, newest first, with their totals. Returns (rows, next_cursor)."""
+    conn = get_connection()
+    query = """
+        SELECT po.*, s.name AS supplier_name,
+               (SELECT COUNT(*) FROM purchase_order_lines l WHERE l.order_id = po.id)
+                   AS line_count,
+               (SELECT SUM(ordered) FROM purchase_order_lines l WHERE l.order_id = po.id)
+                   AS ordered,
+               (SELECT SUM(received) FROM purchase_order_lines l WHERE l.order_id = po.id)
+                   AS received
+        FROM purchase_orders po
+        JOIN suppliers s ON s.id = po.supplier_id
+        WHERE 1=1
+    """
+    params = []
+    if status:
+        query += " AND po.status = ?"
+        params.append(status)
+    if supplier_id:
+        query += " AND po.supplier_id = ?"
+        params.append(supplier_id)
+    if cursor:
+        last_id, = decode_cursor(cursor)
+        query += " AND po.id < ?"
+        params.append(last_id)
+    query += " ORDER BY po.id DESC"
+    return _keyset_page(conn, query, params, limit, lambda r: [r["id"]])
+
+
+def get_purchase_order(order_id):
+    """(order, lines, goods receipts) or (None, [], []) if there is no such order."""
+    conn = get_connection()
+    order = conn.execute("""
+        SELECT po.*, s.name AS supplier_name
+        FROM purchase_orders po
+        JOIN suppliers s ON s.id = po.supplier_id
+        WHERE po.id = ?
+    """, (order_id,)).fetchone()
+    if order is None:
+        return None, [], []
+    lines = conn.execute("""
+        SELECT l.*, p.barcode
+        FROM purchase_order_lines l
+        LEFT JOIN products p ON p.id = l.product_id
+        WHERE l.order_id = ?
+        ORDER BY l.product_name
+    """, (order_id,)).fetchall()
+    receipts = conn.execute(
+        "SELECT * FROM goods_receipts WHERE order_id = ? ORDER BY id", (order_id,)
+    ).fetchall()
+    return order, lines, receipts
+
+
+def cancel_purchase_order(order_id):
+    """Close an order that will not be (fully) delivered. Received stock stays."""
+    conn = get_connection()
+    cur = conn.execute("""
+        UPDATE purchase_orders SET status = 'cancelled'
+        WHERE id = ? AND status IN ('open', 'partial')
+    """, (order_id,))
+    conn.commit()
+    if cur.rowcount == 0:
+        raise ValueError(f"Purchase order {order_id} is not open")
+
+
+def receive_goods(order_id, lines):
+    """
+    Book a delivery against a purchase order in one transaction.
+    lines: scans, dicts with product_id or barcode and an optional quantity
+    (default 1); repeated scans of a product add up. A delivery may be
+    partial; receiving more than is still outstanding on a line is refused.
+
+    Stock is incremented relative to its current level with one set-based
+    UPDATE per 500 products, so sales made meanwhile are never overwritten,
+    and every increment is entered in stock_movements as a 'receipt' under
+    the goods receipt ID. Returns {"id", "order_id", "status", "line_count",
+    "units"}.
+    """
+    if not lines:
+        raise ValueError("Delivery has no lines")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        order = conn.execute(
+            "SELECT id, status FROM purchase_orders WHERE id = ?", (order_id,)
+        ).fetchone()
+        if order is None:
+            raise ValueError(f"Purchase order {order_id} not found")
+        if order["status"] not in ("open", "partial"):
+            raise ValueError(f"Purchase order {order_id} is {order['status']}")
+        outstanding, barcodes = {}, {}
+        for row in conn.execute("""
+            SELECT l.product_id, l.product_name, l.ordered - l.received AS outstanding,
+                   p.barcode
+            FROM purchase_order_lines l
+            LEFT JOIN products p ON p.id = l.product_id
+            WHERE l.order_id = ?
+        """, (order_id,)):
+            outstanding[row["product_id"]] = row
+            if row["barcode"]:
+                barcodes[row["barcode"]] = row["product_id"]
+
+        scans = []
+        for line in lines:
+            if not isinstance(line, dict):
+                raise ValueError("Each line needs a barcode or product_id and quantity")
+            product_id = line.get("product_id")
+            if product_id is None:
+                product_id = barcodes.get(line.get("barcode"))
+                if product_id is None:
+                    raise ValueError(f"Barcode {line.get('barcode')!r} is not on "
+                                     f"purchase order {order_id}")
+            scans.append({"product_id": product_id, "quantity": line.get("quantity", 1)})
+        delivered = _merge_lines(scans)
+        for product_id, quantity in delivered.items():
+            line = outstanding.get(product_id)
+            if line is None:
+                raise ValueError(f"Product ID {product_id} is not on purchase order {order_id}")
+            if quantity > line["outstanding"]:
+                raise ValueError(
+                    f"Received {quantity} of '{line['product_name']}', "
+                    f"only {line['outstanding']} outstanding"
+                )
+
+        units = sum(delivered.values())
+        receipt_id = conn.execute(
+            "INSERT INTO goods_receipts (order_id, line_count, units) VALUES (?, ?, ?)",
+            (order_id, len(delivered), units),
+        ).lastrowid
+        items = list(delivered.items())
+        stock = {}
+        with _stock_reason(conn, "receipt", receipt_id):
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                delivery = ", ".join(["(?, ?)"] * len(chunk))
+                params = [v for pair in chunk for v in pair]
+                stock.update(conn.execute(f"""
+                    UPDATE products
+                    SET stock = products.stock + delivery.qty
+                    FROM (SELECT column1 AS id, column2 AS qty
+                          FROM (VALUES {delivery})) AS delivery
+                    WHERE products.id = delivery.id
+                    RETURNING products.id, products.stock
+                """, params).fetchall())
+                conn.execute(f"""
+                    UPDATE purchase_order_lines
+                    SET received = received + delivery.qty
+                    FROM (SELECT column1 AS id, column2 AS qty
+                          FROM (VALUES {delivery})) AS delivery
+                    WHERE order_id = ? AND product_id = delivery.id
+                """, params + [order_id])
+        if len(stock) != len(delivered):
+            gone = [product_id for product_id in delivered if product_id not in stock]
+            raise ValueError(f"Products no longer exist: {', '.join(map(str, gone[:10]))}")
+        complete = not conn.execute(
+            "SELECT 1 FROM purchase_order_lines WHERE order_id = ? AND received < ordered",
+            (order_id,),
+        ).fetchone()
+        status = "received" if complete else "partial"
+        conn.execute("UPDATE purchase_orders SET status = ? WHERE id = ?", (status, order_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_products(stock)
+    if len(stock) > EVENT_PRODUCT_LIMIT:
+        _publish("catalog", {})
+    else:
+        _publish("stock", {"products": [{"id": product_id, "stock": level}
+                                        for product_id, level in stock.items()]})
+    return {"id": receipt_id, "order_id": order_id, "status": status,
+            "line_count": len(delivered), "units": units}
+
+
+# ── Carts ───────────────────────────────────────────────────────────
+
+def create_cart():
+    """Create an empty cart and return its ID. Also purges abandoned carts."""
+    conn = get_connection()
+    cart_id = secrets.token_urlsafe(12)
+    conn.execute(
+        "DELETE FROM carts WHERE updated_at < DATETIME('now', ?)",
+        (f"-{CART_TTL_HOURS} hours",)
+    )
+    conn.execute("INSERT INTO carts (id) VALUES (?)", (cart_id,))
+    conn.commit()
+    return cart_id
+
+
+def get_cart(cart_id):
+    conn = get_connection()
+    return conn.execute("SELECT * FROM carts WHERE id = ?", (cart_id,)).fetchone()
+
+
+def get_cart_items(cart_id):
+    conn = get_connection()
+    return conn.execute(
+        "SELECT * FROM cart_items WHERE cart_id = ? ORDER BY position", (cart_id,)
+    ).fetchall()
+
+
+def get_cart_item(cart_id, product_id):
+    conn = get_connection()
+    return conn.execute(
+        "SELECT * FROM cart_items WHERE cart_id = ? AND product_id = ?",
+        (cart_id, product_id)
+    ).fetchone()
+
+
+def set_cart_item(cart_id, product, quantity):
+    """
+    Set the quantity of a product in the cart at its current price.
+    The cart's item_count and subtotal are adjusted by the difference.
+    """
+    conn = get_connection()
+    try:
+        old = get_cart_item(cart_id, product["id"])
+        subtotal = round(product["price"] * quantity, 2)
+        conn.execute("""
+            INSERT INTO cart_items (cart_id, product_id, position, name, price, quantity, subtotal)
+            VALUES (?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM cart_items WHERE cart_id = ?),
+                    ?, ?, ?, ?)
+            ON CONFLICT(cart_id, product_id) DO UPDATE SET
+                name = excluded.name, price = excluded.price,
+                quantity = excluded.quantity, subtotal = excluded.subtotal
+        """, (cart_id, product["id"], cart_id, product["name"], product["price"],
+              quantity, subtotal))
+        _adjust_cart_totals(
+            conn, cart_id,
+            quantity - (old["quantity"] if old else 0),
+            subtotal - (old["subtotal"] if old else 0),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def remove_cart_item(cart_id, product_id):
+    conn = get_connection()
+    try:
+        old = get_cart_item(cart_id, product_id)
+        if old is None:
+            return
+        conn.execute(
+            "DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?",
+            (cart_id, product_id)
+        )
+        _adjust_cart_totals(conn, cart_id, -old["quantity"], -old["subtotal"])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def clear_cart(cart_id):
+    conn = get_connection()
+    _clear_cart(conn, cart_id)
+    conn.commit()
+
+
+def _clear_cart(conn, cart_id):
+    conn.execute("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
+    conn.execute("""
+        UPDATE carts SET item_count = 0, subtotal = 0, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (cart_id,))
+
+
+def _adjust_cart_totals(conn, cart_id, quantity_delta, subtotal_delta):
+    conn.execute("""
+        UPDATE carts
+        SET item_count = item_count + ?,
+            subtotal = ROUND(subtotal + ?, 2),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (quantity_delta, subtotal_delta, cart_id))
+
+
+def price_cart(cart_id):
+    """
+    The cart priced as checkout will charge it: (priced lines, totals), see
+    pricing.price_basket. Lines use the products' current shelf prices.
+    """
+    conn = get_connection()
+    lines = conn.execute("""
+        SELECT ci.product_id, COALESCE(p.name, ci.name) AS name,
+               COALESCE(p.price, ci.price) AS price, p.category_id, ci.quantity
+        FROM cart_items ci
+        LEFT JOIN products p ON p.id = ci.product_id
+        WHERE ci.cart_id = ?
+        ORDER BY ci.position
+    """, (cart_id,)).fetchall()
+    return pricing.price_basket(lines, pricing_rules(conn))
+
+
+# ── Promotions ──────────────────────────────────────────────────────
+
+def pricing_rules(conn=None):
+    """The current store's compiled promotions and tax rates."""
+    return pricing.rules_for(conn or get_connection(), current_path())
+
+
+def get_promotions(active_only=False):
+    conn = get_connection()
+    query = """
+        SELECT pr.*, p.name AS product_name, c.name AS category_name
+        FROM promotions pr
+        LEFT JOIN products p ON p.id = pr.product_id
+        LEFT JOIN categories c ON c.id = pr.category_id
+    """
+    params = []
+    if active_only:
+        now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        query += """
+            WHERE (pr.starts_at IS NULL OR pr.starts_at <= ?)
+              AND (pr.ends_at IS NULL OR pr.ends_at > ?)
+        """
+        params = [now, now]
+    return conn.execute(query + " ORDER BY pr.id DESC", params).fetchall()
+
+
+def _parse_moment(value, field):
+    if value in (None, ""):
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{field} must be a date or date and time")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def add_promotion(name, kind, product_id=None, category_id=None, percent=None,
+                  quantity=None, price=None, starts_at=None, ends_at=None):
+    """
+    Add a promotion (see pricing.py for the kinds) and return its ID.
+    starts_at/ends_at are ISO dates or times, UTC unless they carry an offset.
+    """
+    if not name:
+        raise ValueError("Promotion name is required")
+    if kind not in pricing.PROMOTION_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(pricing.PROMOTION_KINDS)}")
+    if (product_id is None) == (category_id is None):
+        raise ValueError("A promotion applies to either a product or a category")
+    if kind != "percent" and product_id is None:
+        raise ValueError(f"A {kind} promotion applies to a product")
+    if kind == "percent":
+        percent = float(percent or 0)
+        if not 0 < percent <= 100:
+            raise ValueError("percent must be between 0 and 100")
+        quantity = price = None
+    else:
+        if price is None or float(price) < 0:
+            raise ValueError("price is required and must not be negative")
+        price = float(price)
+        if kind == "multibuy":
+            quantity = int(quantity or 0)
+            if quantity < 2:
+                raise ValueError("A multi-buy needs a quantity of at least 2")
+        else:
+            quantity = None
+        percent = None
+    starts_at = _parse_moment(starts_at, "starts_at")
+    ends_at = _parse_moment(ends_at, "ends_at")
+    if starts_at and ends_at and ends_at <= starts_at:
+        raise ValueError("ends_at must be after starts_at")
+
+    conn = get_connection()
+    try:
+        cur = conn.execute("""
+            INSERT INTO promotions (name, kind, product_id, category_id, percent, quantity,
+                                    price, starts_at, ends_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (name, kind, product_id, category_id, percent, quantity, price,
+              starts_at, ends_at))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        raise ValueError("Product or category not found")
+    _publish("pricing", {})
+    return cur.lastrowid
+
+
+def delete_promotion(promotion_id):
+    conn = get_connection()
+    conn.execute("DELETE FROM promotions WHERE id = ?", (promotion_id,))
+    conn.commit()
+    _publish("pricing", {})
+
+
+def set_category_tax_rate(category_id, tax_rate):
+    """Set a category's tax rate (e.g. 0.0 for zero-rated food); None restores the default."""
+    if tax_rate is not None:
+        tax_rate = float(tax_rate)
+        if not 0 <= tax_rate < 1:
+            raise ValueError("tax_rate must be a fraction between 0 and 1")
+    conn = get_connection()
+    cur = conn.execute("UPDATE categories SET tax_rate = ? WHERE id = ?",
+                       (tax_rate, category_id))
+    conn.commit()
+    if cur.rowcount == 0:
+        raise ValueError("Category not found")
+    _categories.pop(current_path())
+    _publish("pricing", {})
+
+
 # ── Sales ───────────────────────────────────────────────────────────
 
 def create_sale(items, payment_method="Cash"):
@@ -274,105 +1510,507 @@ def create_sale(items, payment_method="Cash"):
     items: list of dicts with keys: product_id, quantity
     Creates a sale in a single transaction. Decrements stock.
     Returns the new sale ID.
+
+    Runs under BEGIN IMMEDIATE so the stock check and the decrement cannot
+    interleave with another till; products are fetched in one query and
+    stock is decremented with one set-based UPDATE. The sale is added to
+    the hourly/daily report rollups in the same transaction.
     """
     conn = get_connection()
     try:
-        total = 0.0
-        sale_rows = []
-
-        for item in items:
-            product = get_product_by_id(item["product_id"])
-            if product is None:
-                raise ValueError(f"Product ID {item['product_id']} not found")
-            if product["stock"] < item["quantity"]:
-                raise ValueError(
-                    f"Insufficient stock for '{product['name']}': "
-                    f"requested {item['quantity']}, available {product['stock']}"
-                )
-            subtotal = product["price"] * item["quantity"]
-            total += subtotal
-            sale_rows.append({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "quantity": item["quantity"],
-                "unit_price": product["price"],
-                "subtotal": subtotal,
-            })
-
-        cur = conn.execute(
-            "INSERT INTO sales (total, payment_method) VALUES (?, ?)",
-            (round(total, 2), payment_method)
+        conn.execute("BEGIN IMMEDIATE")
+        sale = _insert_sale(conn, items, payment_method)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_products(sale["stock"])
+    _publish_sales([sale])
+    return sale["id"]
+
+
+def create_sales(orders):
+    """
+    Record several sales in one transaction (group commit).
+    orders: list of dicts with keys items, payment_method and optionally
+    cart_id, client_ref and created_at (see _insert_sale).
+
+    Returns one entry per order: the sale ID, or the ValueError that
+    rejected it. Each sale runs in its own savepoint, so a rejected sale
+    leaves the rest of the batch untouched. Paid carts are emptied in the
+    same transaction.
+    """
+    conn = get_connection()
+    results, recorded = [], []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Holding the write lock, so the rules cannot change under the batch.
+        rules = pricing_rules(conn)
+        for order in orders:
+            conn.execute("SAVEPOINT sale")
+            try:
+                sale = _insert_sale(
+                    conn, order["items"], order.get("payment_method", "Cash"),
+                    client_ref=order.get("client_ref"), created_at=order.get("created_at"),
+                    rules=rules)
+                if order.get("cart_id") is not None:
+                    _clear_cart(conn, order["cart_id"])
+            except ValueError as e:
+                conn.execute("ROLLBACK TO sale")
+                conn.execute("RELEASE sale")
+                results.append(e)
+                continue
+            conn.execute("RELEASE sale")
+            recorded.append(sale)
+            results.append(sale["id"])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_products({pid for sale in recorded for pid in sale["stock"]})
+    _publish_sales(recorded)
+    return results
+
+
+def _publish_sales(sales):
+    """Broadcast committed sales and the stock levels they left behind."""
+    stock = {}
+    for sale in sales:
+        if sale.get("duplicate"):
+            continue
+        stock.update(sale["stock"])
+        _publish("sale", {k: sale[k] for k in
+                                ("id", "total", "item_count", "payment_method", "created_at")})
+    if stock:
+        _publish("stock", {"products": [{"id": product_id, "stock": level}
+                                              for product_id, level in stock.items()]})
+
+
+def _insert_sale(conn, items, payment_method, client_ref=None, created_at=None,
+                 rules=None):
+    """
+    Write one sale and its receipt inside the caller's transaction, priced
+    with the store's promotions and tax rates (pricing.py). Returns a dict
+    with the sale's id, total (before tax), item_count, payment_method,
+    created_at and the remaining stock of each product sold ({product_id: stock}).
+
+    client_ref is an ID chosen by the till; a sale whose client_ref is
+    already recorded is not written again and its existing ID is returned.
+    created_at ('YYYY-MM-DD HH:MM:SS', UTC) defaults to now. rules are the
+    compiled pricing rules, if the caller already holds them.
+    """
+    if client_ref is not None:
+        existing = conn.execute(
+            "SELECT id FROM sales WHERE client_ref = ?", (client_ref,)
+        ).fetchone()
+        if existing:
+            return {"id": existing["id"], "stock": {}, "duplicate": True}
+    if not items:
+        raise ValueError("Sale has no items")
+    ids = list({item["product_id"] for item in items})
+    placeholders = ", ".join("?" * len(ids))
+    products = {
+        row["id"]: row for row in conn.execute(
+            f"""SELECT id, name, price, cost_price, stock, category_id
+                FROM products WHERE id IN ({placeholders})""",
+            ids,
         )
-        sale_id = cur.lastrowid
-
-        for row in sale_rows:
-            conn.execute("""
-                INSERT INTO sale_items (sale_id, product_id, product_name, quantity, unit_price, subtotal)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (sale_id, row["product_id"], row["product_name"],
-                  row["quantity"], row["unit_price"], round(row["subtotal"], 2)))
-
-            conn.execute(
-                "UPDATE products SET stock = stock - ? WHERE id = ?",
-                (row["quantity"], row["product_id"])
+    }
+
+    # One line per product, in the order first scanned.
+    needed = {}
+    for item in items:
+        product = products.get(item["product_id"])
+        if product is None:
+            raise ValueError(f"Product ID {item['product_id']} not found")
+        needed[product["id"]] = needed.get(product["id"], 0) + item["quantity"]
+
+    for product_id, quantity in needed.items():
+        product = products[product_id]
+        if product["stock"] < quantity:
+            raise ValueError(
+                f"Insufficient stock for '{product['name']}': "
+                f"requested {quantity}, available {product['stock']}"
             )
 
-        conn.commit()
-        return sale_id
+    created_at = created_at or time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    # Priced at created_at, so an offline sale gets the promotions it was rung up with.
+    lines, totals = pricing.price_basket(
+        [{"product_id": product_id, "name": products[product_id]["name"],
+          "price": products[product_id]["price"],
+          "category_id": products[product_id]["category_id"], "quantity": quantity}
+         for product_id, quantity in needed.items()],
+        rules or pricing_rules(conn), created_at,
+    )
+    # sales.total is the takings before tax; the receipt holds tax and amount due.
+    cur = conn.execute("""
+        INSERT INTO sales (total, payment_method, client_ref, created_at)
+        VALUES (?, ?, ?, ?)
+    """, (totals["subtotal"], payment_method, client_ref, created_at))
+    sale_id = cur.lastrowid
+
+    conn.executemany("""
+        INSERT INTO sale_items (sale_id, product_id, product_name, quantity, unit_price,
+                                subtotal, unit_cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(sale_id, line["product_id"], line["product_name"], line["quantity"],
+           line["unit_price"], line["subtotal"], products[line["product_id"]]["cost_price"])
+          for line in lines])
+    for statement in migrations.ROLLUP_SALE:
+        conn.execute(statement, (sale_id,))
+    receipt = build_receipt(
+        {"id": sale_id, "created_at": created_at, "payment_method": payment_method}, lines)
+    conn.execute(
+        "INSERT INTO receipts (sale_id, created_at, total, body) VALUES (?, ?, ?, ?)",
+        (sale_id, created_at, receipt["total"], encode_receipt(receipt)),
+    )
+
+    basket = ", ".join(["(?, ?)"] * len(needed))
+    with _stock_reason(conn, "sale", sale_id):
+        remaining = dict(conn.execute(f"""
+            UPDATE products
+            SET stock = products.stock - basket.qty
+            FROM (SELECT column1 AS id, column2 AS qty FROM (VALUES {basket})) AS basket
+            WHERE products.id = basket.id AND products.stock >= basket.qty
+            RETURNING products.id, products.stock
+        """, [v for pair in needed.items() for v in pair]).fetchall())
+    if len(remaining) != len(needed):
+        raise ValueError("Stock changed during checkout, please retry")
+    return {
+        "id": sale_id,
+        "total": totals["subtotal"],
+        "item_count": len(lines),
+        "payment_method": payment_method,
+        "created_at": created_at,
+        "stock": remaining,
+    }
+
 
+def return_items(sale_id, items):
+    """
+    Put goods returned from a live sale back on the shelf. items: dicts with
+    product_id and quantity; no more of a product can come back than the
+    sale sold, less what was returned before. The stock comes back through
+    stock_movements as 'return' movements under the sale ID. Refunds are
+    the till's business: the sale and the sales reports are left as they are.
+    Returns {"sale_id", "units", "stock": {product_id: stock}}.
+    """
+    if not items:
+        raise ValueError("Return has no items")
+    returning = _merge_lines(items)
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        sold = dict(conn.execute("""
+            SELECT product_id, SUM(quantity) FROM sale_items
+            WHERE sale_id = ? AND product_id IS NOT NULL
+            GROUP BY product_id
+        """, (sale_id,)).fetchall())
+        if not sold:
+            raise ValueError(f"Sale {sale_id} not found")
+        returned = dict(conn.execute("""
+            SELECT product_id, SUM(delta) FROM stock_movements
+            WHERE reason = 'return' AND ref_id = ?
+            GROUP BY product_id
+        """, (sale_id,)).fetchall())
+        for product_id, quantity in returning.items():
+            returnable = sold.get(product_id, 0) - returned.get(product_id, 0)
+            if quantity > returnable:
+                raise ValueError(f"Only {returnable} of product ID {product_id} "
+                                 f"can be returned from sale {sale_id}")
+        lines = ", ".join(["(?, ?)"] * len(returning))
+        with _stock_reason(conn, "return", sale_id):
+            stock = dict(conn.execute(f"""
+                UPDATE products
+                SET stock = products.stock + returned.qty
+                FROM (SELECT column1 AS id, column2 AS qty FROM (VALUES {lines})) AS returned
+                WHERE products.id = returned.id
+                RETURNING products.id, products.stock
+            """, [v for pair in returning.items() for v in pair]).fetchall())
+        if len(stock) != len(returning):
+            raise ValueError("A returned product no longer exists")
+        conn.commit()
     except Exception:
         conn.rollback()
         raise
+    invalidate_products(stock)
+    _publish("stock", {"products": [{"id": product_id, "stock": level}
+                                    for product_id, level in stock.items()]})
+    return {"sale_id": sale_id, "units": sum(returning.values()), "stock": stock}
+
+
+def find_sales_by_client_ref(client_refs):
+    """Map each already-recorded client_ref to its sale ID."""
+    conn = get_connection()
+    found = {}
+    refs = list(client_refs)
+    for start in range(0, len(refs), 500):
+        chunk = refs[start:start + 500]
+        found.update(conn.execute(
+            f"SELECT client_ref, id FROM sales WHERE client_ref IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall())
+    return found
 
 
 def get_recent_sales(limit=20):
     conn = get_connection()
     return conn.execute("""
-        SELECT s.*, COUNT(si.id) as item_count
+        SELECT s.*,
+               (SELECT COUNT(*) FROM sale_items si WHERE si.sale_id = s.id) as item_count
         FROM sales s
-        LEFT JOIN sale_items si ON s.id = si.sale_id
-        GROUP BY s.id
         ORDER BY s.created_at DESC
         LIMIT ?
     """, (limit,)).fetchall()
 
 
+def list_sales(cursor=None, limit=20):
+    """One page of sales, newest first. Returns (rows, next_cursor)."""
+    conn = get_connection()
+    query = """
+        SELECT s.*,
+               (SELECT COUNT(*) FROM sale_items si WHERE si.sale_id = s.id) as item_count
+        FROM sales s
+    """
+    params = []
+    if cursor:
+        last_created, last_id = decode_cursor(cursor)
+        query += " WHERE (s.created_at, s.id) < (?, ?)"
+        params.extend([last_created, last_id])
+    query += " ORDER BY s.created_at DESC, s.id DESC"
+    return _keyset_page(conn, query, params, limit, lambda r: [r["created_at"], r["id"]])
+
+
 def get_sale_details(sale_id):
+    """The sale and its items, from the live tables or the month it was archived to."""
     conn = get_connection()
     sale = conn.execute("SELECT * FROM sales WHERE id = ?", (sale_id,)).fetchone()
+    if sale is None:
+        return _get_archived_sale(conn, sale_id)
     items = conn.execute(
         "SELECT * FROM sale_items WHERE sale_id = ? ORDER BY id", (sale_id,)
     ).fetchall()
     return sale, items
 
 
+def archive_dir():
+    """Directory holding the current store's monthly sales archives."""
+    return os.path.splitext(current_path())[0] + "-archive"
+
+
+def _open_archive(filename):
+    """Read-only connection to one monthly archive, or None if it is missing."""
+    path = os.path.join(archive_dir(), filename)
+    if not os.path.exists(path):
+        return None
+    archived = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    archived.row_factory = sqlite3.Row
+    return archived
+
+
+def _archives_holding(conn, sale_id):
+    # Months can overlap in ID (an offline till may sync a sale late), so
+    # every archive whose range covers the ID is a candidate.
+    for archive in conn.execute("""
+        SELECT path FROM sale_archives
+        WHERE first_sale_id <= ? AND last_sale_id >= ?
+        ORDER BY month DESC
+    """, (sale_id, sale_id)).fetchall():
+        archived = _open_archive(archive["path"])
+        if archived is None:
+            continue
+        try:
+            yield archived
+        finally:
+            archived.close()
+
+
+def _get_archived_sale(conn, sale_id):
+    for archived in _archives_holding(conn, sale_id):
+        sale = archived.execute("SELECT * FROM sales WHERE id = ?", (sale_id,)).fetchone()
+        if sale is not None:
+            return sale, archived.execute(
+                "SELECT * FROM sale_items WHERE sale_id = ? ORDER BY id", (sale_id,)
+            ).fetchall()
+    return None, []
+
+
+# ── Receipts ────────────────────────────────────────────────────────
+# Sales never change once committed, so each one's receipt is frozen at
+# checkout into a compact JSON document with its tax and totals. Items are
+# stored as [name, quantity, unit_price, subtotal, discount, tax_rate,
+# promotion] rows; receipts from before promotions have the first four.
+
+RECEIPT_ITEM_FIELDS = ("product_name", "quantity", "unit_price", "subtotal",
+                       "discount", "tax_rate", "promotion")
+
+
+def build_receipt(sale, items, tax_rate=pricing.TAX_RATE):
+    """
+    items: priced lines (see pricing.price_basket), or the sale_items rows
+    of a sale recorded without them, which are taxed at tax_rate.
+    """
+    lines = []
+    for item in items:
+        priced = "tax_rate" in item.keys()
+        lines.append({
+            "product_name": item["product_name"],
+            "quantity": item["quantity"],
+            "unit_price": item["unit_price"],
+            "subtotal": item["subtotal"],
+            "discount": item["discount"] if priced else 0.0,
+            "tax_rate": item["tax_rate"] if priced else tax_rate,
+            "promotion": item["promotion"] if priced else None,
+        })
+    totals = pricing.totals(lines)
+    return {
+        "sale_id": sale["id"],
+        "created_at": sale["created_at"],
+        "payment_method": sale["payment_method"],
+        "items": lines,
+        "subtotal": totals["subtotal"],
+        "discount": totals["discount"],
+        # The one rate charged, or None when the receipt lists several.
+        "tax_rate": totals["taxes"][0][0] if len(totals["taxes"]) == 1 else None,
+        "taxes": totals["taxes"],
+        "tax": totals["tax"],
+        "total": totals["total"],
+    }
+
+
+def encode_receipt(receipt):
+    body = dict(receipt, items=[[item[f] for f in RECEIPT_ITEM_FIELDS]
+                                for item in receipt["items"]])
+    return json.dumps(body, separators=(",", ":"))
+
+
+def decode_receipt(body):
+    receipt = json.loads(body)
+    receipt["items"] = [dict(zip(RECEIPT_ITEM_FIELDS, row)) for row in receipt["items"]]
+    return receipt
+
+
+def sale_exists(sale_id):
+    """Whether a sale is on record, live or archived."""
+    conn = get_connection()
+    if conn.execute("SELECT 1 FROM sales WHERE id = ?", (sale_id,)).fetchone():
+        return True
+    for archived in _archives_holding(conn, sale_id):
+        if archived.execute("SELECT 1 FROM sales WHERE id = ?", (sale_id,)).fetchone():
+            return True
+    return False
+
+
+def get_receipt(sale_id):
+    """A sale's stored receipt, or None. Looks in the archives as well."""
+    conn = get_connection()
+    row = conn.execute("SELECT body FROM receipts WHERE sale_id = ?", (sale_id,)).fetchone()
+    if row is not None:
+        return decode_receipt(row["body"])
+    for archived in _archives_holding(conn, sale_id):
+        try:
+            row = archived.execute(
+                "SELECT body FROM receipts WHERE sale_id = ?", (sale_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            continue  # archived before receipts were stored
+        if row is not None:
+            return decode_receipt(row["body"])
+    # Bulk-loaded, or archived before receipts were stored.
+    sale, items = get_sale_details(sale_id)
+    return build_receipt(sale, items) if sale is not None else None
+
+
+def iter_receipts(start, end, batch_size=500):
+    """
+    Stored receipts of sales made in [start, end) ('YYYY-MM-DD HH:MM:SS'),
+    oldest first: archived months, then the live table.
+    """
+    conn = get_connection()
+    months = conn.execute("""
+        SELECT path FROM sale_archives
+        WHERE month >= strftime('%Y-%m', ?) AND month <= strftime('%Y-%m', ?)
+        ORDER BY month
+    """, (start, end)).fetchall()
+    for archive in months:
+        archived = _open_archive(archive["path"])
+        if archived is None:
+            continue
+        try:
+            yield from _receipts_between(archived, start, end, batch_size)
+        finally:
+            archived.close()
+    yield from _receipts_between(conn, start, end, batch_size)
+
+
+def _receipts_between(conn, start, end, batch_size):
+    try:
+        cursor = conn.execute("""
+            SELECT body FROM receipts
+            WHERE created_at >= ? AND created_at < ?
+            ORDER BY created_at, sale_id
+        """, (start, end))
+    except sqlite3.OperationalError:
+        # An archive written before receipts were stored.
+        yield from _receipts_from_sales(conn, start, end)
+        return
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield decode_receipt(row["body"])
+
+
+def _receipts_from_sales(conn, start, end):
+    sales = conn.execute("""
+        SELECT * FROM sales WHERE created_at >= ? AND created_at < ?
+        ORDER BY created_at, id
+    """, (start, end)).fetchall()
+    items = {}
+    for item in conn.execute("""
+        SELECT si.* FROM sale_items si JOIN sales s ON s.id = si.sale_id
+        WHERE s.created_at >= ? AND s.created_at < ?
+        ORDER BY si.id
+    """, (start, end)):
+        items.setdefault(item["sale_id"], []).append(item)
+    for sale in sales:
+        yield build_receipt(sale, items.get(sale["id"], []))
+
+
 # ── Dashboard Stats ─────────────────────────────────────────────────
 
 def get_dashboard_stats():
+    """Read the trigger-maintained counters; see rebuild_dashboard_stats()."""
     conn = get_connection()
-    total_products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
-    total_categories = conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
-    low_stock_count = conn.execute(
-        "SELECT COUNT(*) FROM products WHERE stock <= low_stock_threshold"
-    ).fetchone()[0]
-    today_sales = conn.execute("""
-        SELECT COUNT(*), COALESCE(SUM(total), 0)
-        FROM sales WHERE DATE(created_at) = DATE('now')
-    """).fetchone()
-    total_revenue = conn.execute(
-        "SELECT COALESCE(SUM(total), 0) FROM sales"
-    ).fetchone()[0]
+    stats = conn.execute("SELECT * FROM dashboard_stats WHERE id = 1").fetchone()
+    today = conn.execute(
+        "SELECT sales_count, revenue FROM daily_sales WHERE day = DATE('now')"
+    ).fetchone()
 
     return {
-        "total_products": total_products,
-        "total_categories": total_categories,
-        "low_stock_count": low_stock_count,
-        "today_sales_count": today_sales[0],
-        "today_revenue": today_sales[1],
-        "total_revenue": total_revenue,
+        "total_products": stats["total_products"],
+        "total_categories": stats["total_categories"],
+        "low_stock_count": stats["low_stock_count"],
+        "today_sales_count": today["sales_count"] if today else 0,
+        "today_revenue": round(today["revenue"], 2) if today else 0,
+        "total_revenue": round(stats["total_revenue"], 2),
     }
 
 
+def rebuild_dashboard_stats():
+    """Reconcile the dashboard counters and daily rollup with the raw tables."""
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in migrations.REBUILD_LIVE_DASHBOARD_STATS:
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
 # ── Seed Data ───────────────────────────────────────────────────────
 
 def seed_sample_data():
@@ -386,27 +2024,28 @@ def seed_sample_data():
     for cat in categories:
         add_category(cat)
 
-    cats = {row["name"]: row["id"] for row in get_all_categories()}
-
     products = [
-        ("Whole Milk 1L", "1001", cats["Dairy"], 3.49, 2.10, 45, 10),
-        ("Cheddar Cheese 200g", "1002", cats["Dairy"], 4.99, 3.20, 30, 8),
-        ("Greek Yogurt 500g", "1003", cats["Dairy"], 5.49, 3.50, 25, 8),
-        ("White Bread Loaf", "2001", cats["Bakery"], 2.49, 1.20, 50, 15),
-        ("Croissants 4-pack", "2002", cats["Bakery"], 3.99, 2.40, 20, 10),
-        ("Orange Juice 1L", "3001", cats["Beverages"], 4.29, 2.80, 35, 10),
-        ("Sparkling Water 6-pack", "3002", cats["Beverages"], 5.99, 3.60, 40, 12),
-        ("Cola 2L", "3003", cats["Beverages"], 2.99, 1.50, 60, 15),
-        ("Potato Chips 150g", "4001", cats["Snacks"], 3.29, 1.80, 55, 15),
-        ("Chocolate Bar", "4002", cats["Snacks"], 1.99, 0.90, 80, 20),
-        ("Bananas 1kg", "5001", cats["Fruits & Vegetables"], 1.49, 0.70, 5, 10),
-        ("Tomatoes 500g", "5002", cats["Fruits & Vegetables"], 2.99, 1.60, 3, 8),
-        ("Chicken Breast 500g", "6001", cats["Meat & Poultry"], 7.99, 5.20, 20, 8),
-        ("Frozen Pizza", "7001", cats["Frozen Foods"], 6.49, 3.80, 15, 5),
-        ("Dish Soap 500ml", "8001", cats["Household"], 3.99, 2.00, 25, 10),
+        ("Whole Milk 1L", "1001", "Dairy", 3.49, 2.10, 45, 10),
+        ("Cheddar Cheese 200g", "1002", "Dairy", 4.99, 3.20, 30, 8),
+        ("Greek Yogurt 500g", "1003", "Dairy", 5.49, 3.50, 25, 8),
+        ("White Bread Loaf", "2001", "Bakery", 2.49, 1.20, 50, 15),
+        ("Croissants 4-pack", "2002", "Bakery", 3.99, 2.40, 20, 10),
+        ("Orange Juice 1L", "3001", "Beverages", 4.29, 2.80, 35, 10),
+        ("Sparkling Water 6-pack", "3002", "Beverages", 5.99, 3.60, 40, 12),
+        ("Cola 2L", "3003", "Beverages", 2.99, 1.50, 60, 15),
+        ("Potato Chips 150g", "4001", "Snacks", 3.29, 1.80, 55, 15),
+        ("Chocolate Bar", "4002", "Snacks", 1.99, 0.90, 80, 20),
+        ("Bananas 1kg", "5001", "Fruits & Vegetables", 1.49, 0.70, 5, 10),
+        ("Tomatoes 500g", "5002", "Fruits & Vegetables", 2.99, 1.60, 3, 8),
+        ("Chicken Breast 500g", "6001", "Meat & Poultry", 7.99, 5.20, 20, 8),
+        ("Frozen Pizza", "7001", "Frozen Foods", 6.49, 3.80, 15, 5),
+        ("Dish Soap 500ml", "8001", "Household", 3.99, 2.00, 25, 10),
     ]
-    for p in products:
-        add_product(*p)
+    upsert_products([
+        {"name": name, "barcode": barcode, "category": category, "price": price,
+         "cost_price": cost_price, "stock": stock, "low_stock_threshold": threshold}
+        for name, barcode, category, price, cost_price, stock, threshold in products
+    ])
 
     suppliers_data = [
         ("Fresh Farms Co.", "555-0101", "orders@freshfarms.com", "123 Farm Road"),
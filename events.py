@@ -0,0 +1,104 @@
+"""In-process broadcast of data changes as server-sent events.
+
+database.py publishes a compact event after each write transaction commits
+(a sale, new stock levels, a product or category edit); /api/events streams
+them to every open page. The last BUFFER_SIZE events are kept so a browser
+that reconnects with Last-Event-ID catches up on what it missed, or is told
+to resync when it has fallen further behind than that.
+
+Each store has its own channel, so pages only hear about their store.
+The broker lives in the process, like the connection pool: run the app as
+one (threaded) process, or pages only hear about writes made by the worker
+serving their stream.
+"""
+import json
+import threading
+from collections import deque
+
+BUFFER_SIZE = 1000
+HEARTBEAT = 15.0
+RETRY_MS = 3000
+
+_lock = threading.Lock()
+_channels = {}
+_stats = {"published": 0, "subscribers": 0}
+
+
+class _Channel:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.events = deque(maxlen=BUFFER_SIZE)   # (id, kind, data)
+        self.last_id = 0
+
+
+def _channel(name):
+    with _lock:
+        channel = _channels.get(name)
+        if channel is None:
+            channel = _channels[name] = _Channel()
+        return channel
+
+
+def _count(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+def publish(kind, data, channel=None):
+    """Broadcast an event to every stream open on a channel. Returns its ID."""
+    chan = _channel(channel)
+    with chan.cond:
+        chan.last_id += 1
+        chan.events.append((chan.last_id, kind, data))
+        chan.cond.notify_all()
+        event_id = chan.last_id
+    _count("published")
+    return event_id
+
+
+def last_event_id(channel=None):
+    chan = _channel(channel)
+    with chan.cond:
+        return chan.last_id
+
+
+def _format(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream(last_id=None, channel=None, heartbeat=HEARTBEAT):
+    """
+    Yield text/event-stream chunks for events on a channel after last_id
+    (default: only new ones), with a comment every `heartbeat` seconds to
+    keep proxies from closing an idle stream.
+    """
+    chan = _channel(channel)
+    with chan.cond:
+        if last_id is None or last_id > chan.last_id:
+            last_id = chan.last_id
+    _count("subscribers")
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            with chan.cond:
+                chan.cond.wait_for(lambda: chan.last_id > last_id, heartbeat)
+                pending = [e for e in chan.events if e[0] > last_id]
+                missed = chan.last_id > last_id and (not pending or pending[0][0] > last_id + 1)
+                current = chan.last_id
+            if missed:
+                # Older than the buffer: the page must reload its state.
+                yield _format(current, "resync", {})
+                last_id = current
+                continue
+            if not pending:
+                yield ": keep-alive\n\n"
+                continue
+            yield "".join(_format(*event) for event in pending)
+            last_id = pending[-1][0]
+    finally:
+        _count("subscribers", -1)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, channels=len(_channels))
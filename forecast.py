@@ -0,0 +1,226 @@
+"""Demand forecasting and reorder suggestions.
+
+Daily unit sales for every product are read from sales_daily in one query
+and reduced with NumPy across all SKUs at once: short and long moving
+averages, an exponentially smoothed daily demand and its spread. From those
+come days until stock-out and an order quantity that covers the supplier
+lead time plus a review period, with safety stock for the demand spread.
+Suggestions are grouped into one draft purchase order per supplier at the
+cheapest supply_price on file.
+"""
+import itertools
+from datetime import datetime, timedelta
+
+import database
+
+try:
+    import numpy as np
+except ImportError:  # only the reorder engine needs it
+    np = None
+
+HISTORY_DAYS = 730
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+SMOOTHING = 0.1        # weight of the most recent day in the smoothed demand
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 14
+SERVICE_Z = 1.65       # safety stock for a ~95% chance of not running out
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Reorder suggestions need NumPy: pip install numpy")
+
+
+def _columns(rows, width, dtype):
+    flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=dtype,
+                       count=len(rows) * width)
+    return flat.reshape(-1, width).T
+
+
+def load_history(as_of, days=HISTORY_DAYS):
+    """
+    Units sold per product per day over the `days` days up to as_of.
+    Returns (product_ids, ages, units) arrays; age 0 is as_of itself.
+    """
+    _require_numpy()
+    cursor = database.get_connection().cursor()
+    cursor.row_factory = None  # plain tuples; this can be millions of rows
+    # sales_daily has a row per payment method; demand and its spread
+    # need one total per product-day.
+    rows = cursor.execute("""
+        SELECT product_id, CAST(julianday(day) AS INTEGER), SUM(units)
+        FROM sales_daily
+        WHERE day > ? AND day <= ? AND product_id != 0
+        GROUP BY product_id, day
+    """, ((as_of - timedelta(days=days)).isoformat(), as_of.isoformat())).fetchall()
+    product_ids, day_numbers, units = _columns(rows, 3, np.float64)
+    # Julian day number of as_of, truncated the same way as in the query.
+    today = as_of.toordinal() + 1721424
+    return product_ids.astype(np.int64), today - day_numbers.astype(np.int64), units
+
+
+def forecast(as_of=None, history_days=HISTORY_DAYS, smoothing=SMOOTHING):
+    """
+    Per-product demand statistics for every product, as a dict of arrays
+    aligned with the "id" array (ascending product id).
+    """
+    _require_numpy()
+    if not 0 < smoothing <= 1:
+        raise ValueError("smoothing must be in (0, 1]")
+    as_of = as_of or datetime.utcnow().date()
+    conn = database.get_connection()
+    products = conn.execute(
+        "SELECT id, stock, low_stock_threshold FROM products ORDER BY id"
+    ).fetchall()
+    ids, stock, threshold = _columns(products, 3, np.float64)
+    ids = ids.astype(np.int64)
+    n = len(ids)
+
+    sold_ids, ages, units = load_history(as_of, history_days)
+    # Drop history for products deleted since.
+    index = np.searchsorted(ids, sold_ids)
+    known = index < n
+    known[known] = ids[index[known]] == sold_ids[known]
+    index, ages, units = index[known], ages[known], units[known]
+
+    def window_sum(days, weights):
+        recent = ages < days
+        return np.bincount(index[recent], weights=weights[recent], minlength=n)
+
+    short_avg = window_sum(SHORT_WINDOW, units) / SHORT_WINDOW
+    long_avg = window_sum(LONG_WINDOW, units) / LONG_WINDOW
+    long_sq = window_sum(LONG_WINDOW, units * units) / LONG_WINDOW
+    spread = np.sqrt(np.maximum(long_sq - long_avg * long_avg, 0.0))
+
+    # Exponential smoothing over the daily series (zero on days without
+    # sales) has a closed form, so it needs no dense SKU x day matrix.
+    decay = 1.0 - smoothing
+    # Without any sales in the window bincount returns integers; the
+    # start-up correction below divides in place, so keep it float.
+    smoothed = np.bincount(index, weights=units * smoothing * decay ** ages,
+                           minlength=n).astype(np.float64)
+    # Correct the start-up bias for products with a short history.
+    first_sale = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(first_sale, index, ages)
+    has_history = first_sale >= 0
+    smoothed[has_history] /= 1.0 - decay ** (first_sale[has_history] + 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(smoothed > 0, stock / smoothed, np.inf)
+        trend = np.where(long_avg > 0, short_avg / long_avg, np.nan)
+
+    return {
+        "as_of": as_of, "id": ids, "stock": stock, "low_stock_threshold": threshold,
+        "demand": smoothed, "short_avg": short_avg, "long_avg": long_avg,
+        "spread": spread, "trend": trend, "days_until_stockout": days_left,
+    }
+
+
+def _cheapest_suppliers(product_ids):
+    conn = database.get_connection()
+    cheapest = {}
+    for chunk in range(0, len(product_ids), 500):
+        ids = product_ids[chunk:chunk + 500]
+        # SQLite takes the bare columns from the row holding the MIN().
+        for row in conn.execute(f"""
+            SELECT sp.product_id, sp.supplier_id, s.name AS supplier_name,
+                   MIN(sp.supply_price) AS supply_price
+            FROM supplier_products sp
+            JOIN suppliers s ON s.id = sp.supplier_id
+            WHERE sp.product_id IN ({",".join("?" * len(ids))})
+            GROUP BY sp.product_id
+        """, ids):
+            cheapest[row["product_id"]] = row
+    return cheapest
+
+
+def _column(values, digits=2):
+    """Rounded floats for JSON, with None where not finite."""
+    finite = np.isfinite(values)
+    return [v if ok else None
+            for v, ok in zip(np.round(values, digits).tolist(), finite.tolist())]
+
+
+def reorder_suggestions(lead_time=LEAD_TIME_DAYS, cover=COVER_DAYS, as_of=None):
+    """
+    Products to reorder now and draft purchase orders grouped by supplier.
+
+    A product is due when its stock would not last the lead time plus
+    safety stock, or when it is at or under its static low-stock
+    threshold. The quantity brings it up to lead_time + cover days of
+    demand plus safety stock, and never below twice the threshold.
+    """
+    _require_numpy()
+    if lead_time < 0 or cover < 0:
+        raise ValueError("lead_time and cover must not be negative")
+    stats = forecast(as_of)
+    stock, demand, threshold = stats["stock"], stats["demand"], stats["low_stock_threshold"]
+
+    safety = SERVICE_Z * stats["spread"] * np.sqrt(lead_time)
+    reorder_point = demand * lead_time + safety
+    target = np.maximum(demand * (lead_time + cover) + safety, 2 * threshold)
+    due = ((demand > 0) & (stock <= reorder_point)) | (stock <= threshold)
+    quantity = np.ceil(np.maximum(target - stock, 0))
+    due &= quantity > 0
+
+    order = np.flatnonzero(due)
+    order = order[np.argsort(stats["days_until_stockout"][order], kind="stable")]
+    product_ids = [int(i) for i in stats["id"][order]]
+    products = {}
+    conn = database.get_connection()
+    for chunk in range(0, len(product_ids), 500):
+        ids = product_ids[chunk:chunk + 500]
+        for row in conn.execute(
+            f"SELECT id, name, cost_price FROM products WHERE id IN ({','.join('?' * len(ids))})",
+            ids,
+        ):
+            products[row["id"]] = row
+    suppliers = _cheapest_suppliers(product_ids)
+
+    columns = zip(
+        product_ids, stock[order].astype(np.int64).tolist(), _column(demand[order], 3),
+        _column(stats["short_avg"][order]), _column(stats["long_avg"][order]),
+        _column(stats["trend"][order]), _column(stats["days_until_stockout"][order], 1),
+        _column(reorder_point[order], 1), quantity[order].astype(np.int64).tolist(),
+    )
+    lines, orders = [], {}
+    for product_id, on_hand, rate, avg_7d, avg_28d, trend, days_left, point, qty in columns:
+        product = products[product_id]
+        supplier = suppliers.get(product_id)
+        unit_cost = (supplier["supply_price"] if supplier and supplier["supply_price"] is not None
+                     else product["cost_price"]) or 0.0
+        line = {
+            "product_id": product_id,
+            "name": product["name"],
+            "stock": on_hand,
+            "demand_per_day": rate,
+            "avg_7d": avg_7d,
+            "avg_28d": avg_28d,
+            "trend": trend,
+            "days_until_stockout": days_left,
+            "reorder_point": point,
+            "quantity": qty,
+            "unit_cost": unit_cost,
+            "line_total": round(unit_cost * qty, 2),
+            "supplier_id": supplier["supplier_id"] if supplier else None,
+        }
+        lines.append(line)
+        key = line["supplier_id"]
+        po = orders.get(key)
+        if po is None:
+            po = orders[key] = {
+                "supplier_id": key,
+                "supplier_name": supplier["supplier_name"] if supplier else None,
+                "lines": [], "total": 0.0,
+            }
+        po["lines"].append(line)
+        po["total"] = round(po["total"] + line["line_total"], 2)
+
+    return {
+        "as_of": stats["as_of"].isoformat(),
+        "lead_time_days": lead_time,
+        "cover_days": cover,
+        "products": lines,
+        "purchase_orders": sorted(orders.values(), key=lambda po: -po["total"]),
+    }
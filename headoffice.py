@@ -0,0 +1,126 @@
+"""Chain-wide figures across every store database.
+
+Each store is read on its own pooled connection from a thread pool, using
+the same queries as the store's own pages; sqlite3 releases the GIL while
+a statement runs, so the stores are scanned in parallel. Per-store results
+are then merged here. A store that cannot be read is reported under
+"errors" instead of failing the whole request.
+"""
+import heapq
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import reports
+
+MAX_WORKERS = 8
+
+STAT_TOTALS = ("total_products", "low_stock_count", "today_sales_count",
+               "today_revenue", "total_revenue")
+
+
+def _label(store_id):
+    return store_id if store_id is not None else "default"
+
+
+def _read_store(store_id, fn, args):
+    with database.use_store(store_id):
+        path = database.current_path()
+        if not os.path.exists(path):
+            # Connecting would create an empty database in its place.
+            raise FileNotFoundError(f"Store database {path} not found")
+        return fn(*args)
+
+
+def across_stores(fn, *args):
+    """
+    Run fn(*args) against every store in parallel. Returns
+    ({store: result}, {store: error message}).
+    """
+    stores = database.store_ids()
+    results, errors = {}, {}
+    with ThreadPoolExecutor(min(MAX_WORKERS, len(stores))) as pool:
+        futures = {store_id: pool.submit(_read_store, store_id, fn, args)
+                   for store_id in stores}
+    for store_id, future in futures.items():
+        try:
+            results[_label(store_id)] = future.result()
+        except Exception as e:
+            errors[_label(store_id)] = str(e)
+    return results, errors
+
+
+def dashboard():
+    """Dashboard counters per store and summed over the chain."""
+    stores, errors = across_stores(database.get_dashboard_stats)
+    totals = {key: 0 for key in STAT_TOTALS}
+    for stats in stores.values():
+        for key in STAT_TOTALS:
+            totals[key] += stats[key]
+    totals["today_revenue"] = round(totals["today_revenue"], 2)
+    totals["total_revenue"] = round(totals["total_revenue"], 2)
+    return {"totals": totals, "stores": stores, "errors": errors}
+
+
+def _low_stock_rows():
+    return [{"id": p["id"], "name": p["name"], "barcode": p["barcode"],
+             "stock": p["stock"], "low_stock_threshold": p["low_stock_threshold"]}
+            for p in database.get_low_stock_products()]
+
+
+def low_stock(limit=None):
+    """Low-stock products of every store, lowest stock first."""
+    stores, errors = across_stores(_low_stock_rows)
+    # Each store's list is already ordered by stock.
+    merged = heapq.merge(*([dict(row, store=store) for row in rows]
+                          for store, rows in stores.items()),
+                         key=lambda row: row["stock"])
+    return {"products": list(itertools.islice(merged, limit)), "errors": errors}
+
+
+def _report_rows(start, end, group_by, order_by):
+    return [dict(row) for row in reports.sales_report(start, end, group_by, order_by)]
+
+
+def sales_report(start, end, group_by="product", order_by="revenue", limit=None):
+    """
+    reports.sales_report summed over the chain. Product IDs are local to a
+    store, so products are matched by barcode (or name, without one), and
+    categories by name.
+    """
+    if group_by not in reports.GROUPINGS:
+        raise ValueError(f"Unknown grouping '{group_by}'")
+    if order_by not in reports.TOP_SELLER_METRICS:
+        raise ValueError(f"Unknown ordering '{order_by}'")
+    stores, errors = across_stores(_report_rows, start, end, group_by, order_by)
+    merged = {}
+    for rows in stores.values():
+        for row in rows:
+            key = row.get("barcode") or row["name"]
+            total = merged.get(key)
+            if total is None:
+                total = merged[key] = {"name": row["name"], "units": 0, "revenue": 0.0,
+                                       "cost": 0.0, "stores": 0}
+                if group_by == "product":
+                    total["barcode"] = row["barcode"]
+            total["units"] += row["units"]
+            total["revenue"] += row["revenue"]
+            total["cost"] += row["cost"]
+            total["stores"] += 1
+    for total in merged.values():
+        total["margin"] = round(total["revenue"] - total["cost"], 2)
+        total["revenue"] = round(total["revenue"], 2)
+        total["cost"] = round(total["cost"], 2)
+    rows = sorted(merged.values(), key=lambda row: row[order_by], reverse=True)
+    return {"rows": rows[:limit] if limit is not None else rows, "errors": errors}
+
+
+def summary(start, end):
+    """Units, revenue, cost and margin per store and for the chain."""
+    stores, errors = across_stores(reports.summary, start, end)
+    totals = {key: sum(s[key] for s in stores.values())
+              for key in ("units", "revenue", "cost", "margin")}
+    for key in ("revenue", "cost", "margin"):
+        totals[key] = round(totals[key], 2)
+    return {"totals": totals, "stores": stores, "errors": errors}
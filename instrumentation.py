@@ -0,0 +1,264 @@
+"""Per-statement query timing, slow-query logging and Prometheus metrics.
+
+Pooled connections are wrapped in InstrumentedConnection so every
+execute/executemany and the fetches that follow are timed and their rows
+counted. Totals are kept per normalised statement for the process, and per
+request between begin_request() and end_request().
+"""
+import functools
+import logging
+import re
+import threading
+import time
+
+SLOW_QUERY_MS = 100.0
+MAX_STATEMENT_LABELS = 500
+
+slow_log = logging.getLogger("supermarket.slow_query")
+
+_local = threading.local()
+_lock = threading.Lock()
+_statements = {}   # label -> [calls, seconds, rows]
+_requests = {}     # (method, endpoint, status) -> [count, seconds]
+_slow_queries = 0
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:, \?)+")
+_VALUES_LIST = re.compile(r"\((?:\?\.\.\.|\?)\)(?:, \((?:\?\.\.\.|\?)\))+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize(sql):
+    """Collapse whitespace and variable-length placeholder lists into one label."""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST.sub("?...", sql)
+    return _VALUES_LIST.sub("(?...)...", sql)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that accounts execution and fetch time to its statement."""
+
+    def __init__(self, conn, cursor):
+        self._conn = conn
+        self._cursor = cursor
+        self._sql = None
+        self._label = None
+        self._params = None
+        self._seconds = 0.0
+        self._logged = False
+        self._pending = [0.0, 0]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def _start(self, sql, params):
+        self._sql = sql
+        self._label = normalize(sql)
+        self._params = params
+        self._seconds = 0.0
+        self._logged = False
+
+    def _account(self, seconds, rows, calls=0):
+        self._seconds += seconds
+        _record(self._label, seconds, rows, calls)
+        if not self._logged and self._seconds * 1000 >= SLOW_QUERY_MS:
+            self._logged = True
+            _log_slow(self._conn, self._sql, self._params, self._seconds)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        started = time.perf_counter()
+        self._cursor.execute(sql, parameters)
+        rows = self._cursor.rowcount if self._cursor.rowcount > 0 else 0
+        self._account(time.perf_counter() - started, rows, calls=1)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_parameters)
+        rows = self._cursor.rowcount if self._cursor.rowcount > 0 else 0
+        self._account(time.perf_counter() - started, rows, calls=1)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._account(time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # Accumulated locally and accounted once the iteration ends.
+        pending = self._pending
+        started = time.perf_counter()
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            pending[0] += time.perf_counter() - started
+            self._account(pending[0], pending[1])
+            self._pending = [0.0, 0]
+            raise
+        pending[0] += time.perf_counter() - started
+        pending[1] += 1
+        return row
+
+
+class InstrumentedConnection:
+    """Connection proxy whose execute/executemany return InstrumentedCursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name == "_conn":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._conn, self._conn.cursor(*args))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _record(label, seconds, rows, calls):
+    with _lock:
+        entry = _statements.get(label)
+        if entry is None:
+            if len(_statements) >= MAX_STATEMENT_LABELS:
+                label = "other"
+                entry = _statements.setdefault(label, [0, 0.0, 0])
+            else:
+                entry = _statements[label] = [0, 0.0, 0]
+        entry[0] += calls
+        entry[1] += seconds
+        entry[2] += rows
+    collector = getattr(_local, "request", None)
+    if collector is not None:
+        collector["queries"] += calls
+        collector["seconds"] += seconds
+        collector["rows"] += rows
+        per_statement = collector["statements"].setdefault(label, [0, 0.0, 0])
+        per_statement[0] += calls
+        per_statement[1] += seconds
+        per_statement[2] += rows
+
+
+def _log_slow(conn, sql, params, seconds):
+    global _slow_queries
+    with _lock:
+        _slow_queries += 1
+    plan = ""
+    if params is not None and sql.lstrip()[:6].upper() in ("SELECT", "WITH ", "UPDATE", "DELETE"):
+        try:
+            plan = "; ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        except Exception as e:
+            plan = f"unavailable ({e})"
+    slow_log.warning("slow query %.1fms: %s | plan: %s",
+                     seconds * 1000, normalize(sql), plan or "n/a")
+
+
+# ── Per-request Collection ──────────────────────────────────────────
+
+def begin_request():
+    _local.request = {"started": time.perf_counter(), "queries": 0,
+                      "seconds": 0.0, "rows": 0, "statements": {}}
+
+
+def end_request(method, endpoint, status):
+    """Stop collecting for this thread's request and return its summary."""
+    collector = getattr(_local, "request", None)
+    _local.request = None
+    if collector is None:
+        return None
+    collector["total_seconds"] = time.perf_counter() - collector.pop("started")
+    key = (method, endpoint or "unknown", status)
+    with _lock:
+        entry = _requests.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += collector["total_seconds"]
+    return collector
+
+
+def server_timing(summary):
+    return (f'db;desc="{summary["queries"]} queries, {summary["rows"]} rows";'
+            f'dur={summary["seconds"] * 1000:.2f}, '
+            f'app;dur={summary["total_seconds"] * 1000:.2f}')
+
+
+# ── Prometheus Exposition ───────────────────────────────────────────
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_metrics(gauges=()):
+    """
+    Render all counters in Prometheus text format.
+    gauges: iterable of (name, help, type, [(labels dict, value), ...]).
+    A sample may also be (suffix, labels dict, value), e.g. the "_bucket",
+    "_sum" and "_count" series of a histogram.
+    """
+    with _lock:
+        statements = {k: list(v) for k, v in _statements.items()}
+        requests = {k: list(v) for k, v in _requests.items()}
+        slow = _slow_queries
+
+    families = [
+        ("supermarket_db_statement_calls_total", "Statement executions.", "counter",
+         [({"statement": s}, v[0]) for s, v in statements.items()]),
+        ("supermarket_db_statement_seconds_total", "Time spent executing and fetching.",
+         "counter", [({"statement": s}, round(v[1], 6)) for s, v in statements.items()]),
+        ("supermarket_db_statement_rows_total", "Rows fetched or changed.", "counter",
+         [({"statement": s}, v[2]) for s, v in statements.items()]),
+        ("supermarket_db_slow_queries_total",
+         f"Statements slower than {SLOW_QUERY_MS}ms.", "counter", [({}, slow)]),
+        ("supermarket_http_requests_total", "HTTP requests served.", "counter",
+         [({"method": m, "endpoint": e, "status": st}, v[0])
+          for (m, e, st), v in requests.items()]),
+        ("supermarket_http_request_seconds_total", "Time spent serving requests.",
+         "counter", [({"method": m, "endpoint": e, "status": st}, round(v[1], 6))
+                     for (m, e, st), v in requests.items()]),
+    ]
+    families.extend(gauges)
+
+    lines = []
+    for name, help_text, kind, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+            lines.append(f"{name}{suffix}{_labels(**labels) if labels else ''} {value}")
+    return "\n".join(lines) + "\n"
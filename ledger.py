@@ -0,0 +1,229 @@
+"""Point-in-time stock from the stock_movements ledger.
+
+Every change to products.stock is appended to stock_movements by trigger
+(migration 12) with its reason, one of MOVEMENT_REASONS. Summing a
+product's movements gives its stock at any moment, but the ledger grows
+with every sale, so take_snapshot() periodically folds it into per-product
+levels: the previous snapshot plus the movements since, never a full
+replay. Stock at a moment is then the last snapshot taken before it plus
+the movements after that snapshot, read through the ledger's
+(product_id, id) index for one product or as one id range for all.
+
+Snapshots also record each product's cost_price, which month-end valuation
+prices stock at; products created after the snapshot use their current cost.
+History starts with migration 12: stock held before it is one 'opening'
+movement per product, dated when the migration ran.
+
+    flask snapshot-stock               # nightly, from cron
+    flask reconcile-stock [--repair]   # products.stock against the ledger
+"""
+from datetime import datetime, timedelta
+
+import database
+import reports
+
+MOVEMENT_REASONS = ("opening", "adjustment", "sale", "receipt", "return", "reconcile")
+
+# Snapshots older than this are pruned, except the last of each month.
+SNAPSHOT_KEEP_DAYS = 35
+
+_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def moment(at):
+    """
+    An exclusive bound as 'YYYY-MM-DD HH:MM:SS' (UTC): a bare date means the
+    end of that day, None the end of the current second.
+    """
+    if at is None:
+        return (datetime.utcnow() + timedelta(seconds=1)).strftime(_TIMESTAMP)
+    if isinstance(at, datetime):
+        return at.strftime(_TIMESTAMP)
+    try:
+        return reports.parse_bound(at, end=True).strftime(_TIMESTAMP)
+    except ValueError:
+        raise ValueError(f"Invalid moment '{at}', expected YYYY-MM-DD[ HH:MM[:SS]]")
+
+
+def _snapshot_before(conn, at):
+    """The last snapshot taken before `at`, or None."""
+    return conn.execute("""
+        SELECT * FROM stock_snapshots WHERE taken_at < ?
+        ORDER BY taken_at DESC, id DESC LIMIT 1
+    """, (at,)).fetchone()
+
+
+def latest_snapshot():
+    conn = database.get_connection()
+    return conn.execute("SELECT * FROM stock_snapshots ORDER BY id DESC LIMIT 1").fetchone()
+
+
+def take_snapshot():
+    """
+    Fold the movements since the previous snapshot into a new one. Levels
+    come from the ledger alone, so reconcile() compares products.stock
+    with an independent figure. Returns the snapshot row.
+    """
+    conn = database.get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+        previous = conn.execute(
+            "SELECT id, last_movement_id FROM stock_snapshots ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        snapshot_id = conn.execute(
+            "INSERT INTO stock_snapshots (last_movement_id) VALUES (?)", (last,)
+        ).lastrowid
+        conn.execute("""
+            INSERT INTO stock_snapshot_items (snapshot_id, product_id, stock, cost_price)
+            SELECT ?, l.product_id, SUM(l.stock), COALESCE(p.cost_price, 0)
+            FROM (
+                SELECT product_id, stock FROM stock_snapshot_items WHERE snapshot_id = ?
+                UNION ALL
+                SELECT product_id, delta FROM stock_movements WHERE id > ? AND id <= ?
+            ) AS l
+            LEFT JOIN products p ON p.id = l.product_id
+            GROUP BY l.product_id
+            HAVING SUM(l.stock) != 0
+        """, (snapshot_id, previous["id"] if previous else None,
+              previous["last_movement_id"] if previous else 0, last))
+        conn.execute("""
+            UPDATE stock_snapshots SET
+                skus = totals.skus, units = totals.units, value = totals.value
+            FROM (SELECT COUNT(*) AS skus, COALESCE(SUM(stock), 0) AS units,
+                         ROUND(COALESCE(SUM(stock * cost_price), 0), 2) AS value
+                  FROM stock_snapshot_items WHERE snapshot_id = ?) AS totals
+            WHERE id = ?
+        """, (snapshot_id, snapshot_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT * FROM stock_snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+
+
+def prune_snapshots(keep_days=SNAPSHOT_KEEP_DAYS):
+    """Drop snapshots older than keep_days but the last of each month. Returns how many."""
+    conn = database.get_connection()
+    cur = conn.execute("""
+        DELETE FROM stock_snapshots
+        WHERE taken_at < datetime('now', ?)
+          AND id NOT IN (SELECT MAX(id) FROM stock_snapshots
+                         GROUP BY strftime('%Y-%m', taken_at))
+    """, (f"-{int(keep_days)} days",))
+    conn.commit()
+    return cur.rowcount
+
+
+def stock_at(product_id, at=None):
+    """A product's stock at `at` (see moment()): one snapshot row plus a delta scan."""
+    at = moment(at)
+    conn = database.get_connection()
+    snapshot = _snapshot_before(conn, at)
+    base, since = 0, 0
+    if snapshot is not None:
+        since = snapshot["last_movement_id"]
+        row = conn.execute("""
+            SELECT stock FROM stock_snapshot_items WHERE snapshot_id = ? AND product_id = ?
+        """, (snapshot["id"], product_id)).fetchone()
+        base = row["stock"] if row else 0
+    delta = conn.execute("""
+        SELECT COALESCE(SUM(delta), 0) FROM stock_movements
+        WHERE product_id = ? AND id > ? AND created_at < ?
+    """, (product_id, since, at)).fetchone()[0]
+    return base + delta
+
+
+def valuation(at=None):
+    """
+    Units on hand and their value at cost at `at`, in total and by category:
+    {"at", "snapshot_id", "skus", "units", "value", "categories": [...]}.
+    For month-end, pass the last day of the month.
+    """
+    at = moment(at)
+    conn = database.get_connection()
+    snapshot = _snapshot_before(conn, at)
+    rows = conn.execute("""
+        WITH levels AS (
+            SELECT l.product_id, SUM(l.stock) AS stock,
+                   COALESCE(MAX(l.cost_price), p.cost_price, 0) AS cost_price,
+                   p.category_id
+            FROM (
+                SELECT product_id, stock, cost_price
+                FROM stock_snapshot_items WHERE snapshot_id = ?
+                UNION ALL
+                -- NOT INDEXED: read the id range after the snapshot, not
+                -- the whole product index for its ready-made grouping.
+                SELECT product_id, SUM(delta), NULL
+                FROM stock_movements NOT INDEXED WHERE id > ? AND created_at < ?
+                GROUP BY product_id
+            ) AS l
+            LEFT JOIN products p ON p.id = l.product_id
+            GROUP BY l.product_id
+            HAVING SUM(l.stock) != 0
+        )
+        SELECT levels.category_id, COALESCE(c.name, 'Uncategorised') AS name,
+               COUNT(*) AS skus, SUM(stock) AS units,
+               ROUND(SUM(stock * cost_price), 2) AS value
+        FROM levels
+        LEFT JOIN categories c ON c.id = levels.category_id
+        GROUP BY levels.category_id
+        ORDER BY value DESC
+    """, (snapshot["id"] if snapshot else None,
+          snapshot["last_movement_id"] if snapshot else 0, at)).fetchall()
+    return {
+        "at": at,
+        "snapshot_id": snapshot["id"] if snapshot else None,
+        "skus": sum(r["skus"] for r in rows),
+        "units": sum(r["units"] for r in rows),
+        "value": round(sum(r["value"] for r in rows), 2),
+        "categories": [dict(r) for r in rows],
+    }
+
+
+_MISMATCHES = """
+    SELECT id AS product_id, MAX(name) AS name, SUM(stock) AS stock,
+           SUM(ledger) AS ledger_stock
+    FROM (
+        SELECT id, name, stock, 0 AS ledger FROM products
+        UNION ALL
+        SELECT product_id, NULL, 0, stock FROM stock_snapshot_items WHERE snapshot_id = ?
+        UNION ALL
+        SELECT product_id, NULL, 0, delta FROM stock_movements WHERE id > ?
+    )
+    GROUP BY id
+    HAVING SUM(stock) != SUM(ledger)
+    ORDER BY id
+"""
+
+
+def reconcile(full=False, repair=False):
+    """
+    Compare products.stock with the ledger for every product in one
+    set-based pass: the latest snapshot plus the movements since, or with
+    full the whole ledger. Returns the mismatches as dicts with product_id,
+    name (None for deleted products), stock and ledger_stock.
+
+    With repair, a 'reconcile' movement for each difference is appended in
+    the same transaction, so the ledger agrees with the shelf again.
+    """
+    conn = database.get_connection()
+    try:
+        # Immediate, so no movement lands between the check and the repair.
+        conn.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+        snapshot = None if full else conn.execute(
+            "SELECT id, last_movement_id FROM stock_snapshots ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        mismatches = [dict(r) for r in conn.execute(_MISMATCHES, (
+            snapshot["id"] if snapshot else None,
+            snapshot["last_movement_id"] if snapshot else 0,
+        ))]
+        if repair and mismatches:
+            conn.executemany("""
+                INSERT INTO stock_movements (product_id, delta, reason) VALUES (?, ?, 'reconcile')
+            """, [(m["product_id"], m["stock"] - m["ledger_stock"]) for m in mismatches])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return mismatches
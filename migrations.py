@@ -0,0 +1,642 @@
+"""Versioned schema migrations, tracked in PRAGMA user_version.
+
+Each migration runs in its own BEGIN IMMEDIATE transaction together with the
+user_version bump, so a half-applied migration is never recorded and two
+processes starting at once cannot both apply it. In WAL mode readers keep
+working while an index is being built; only writers wait.
+
+    python migrations.py                # migrate supermarket.db
+    python migrations.py --check-plans  # fail if a hot query does a full scan
+"""
+import re
+import sys
+
+import pricing
+
+# Recomputes the dashboard counters and daily rollup from raw rows.
+REBUILD_DASHBOARD_STATS = (
+    "DELETE FROM dashboard_stats",
+    """
+    INSERT INTO dashboard_stats
+        (id, total_products, total_categories, low_stock_count, total_revenue)
+    SELECT 1,
+           (SELECT COUNT(*) FROM products),
+           (SELECT COUNT(*) FROM categories),
+           (SELECT COUNT(*) FROM products WHERE stock <= low_stock_threshold),
+           (SELECT COALESCE(SUM(total), 0) FROM sales)
+    """,
+    "DELETE FROM daily_sales",
+    """
+    INSERT INTO daily_sales (day, sales_count, revenue)
+    SELECT DATE(created_at), COUNT(*), SUM(total) FROM sales GROUP BY DATE(created_at)
+    """,
+)
+
+# Sales rollups: (table, bucket column, strftime format of the bucket).
+SALES_ROLLUPS = (
+    ("sales_hourly", "hour", "%Y-%m-%d %H:00:00"),
+    ("sales_daily", "day", "%Y-%m-%d"),
+)
+
+
+def sales_rollup_statements(where="1=1"):
+    """Statements adding the sale_items matched by ``where`` to each rollup."""
+    return tuple(f"""
+        INSERT INTO {table} ({column}, product_id, payment_method, category_id,
+                             units, revenue, cost)
+        SELECT strftime('{fmt}', s.created_at), COALESCE(si.product_id, 0),
+               COALESCE(s.payment_method, ''), MAX(p.category_id),
+               SUM(si.quantity), SUM(si.subtotal), SUM(si.quantity * si.unit_cost)
+        FROM sale_items si
+        JOIN sales s ON s.id = si.sale_id
+        LEFT JOIN products p ON p.id = si.product_id
+        WHERE {where}
+        GROUP BY 1, 2, 3
+        ON CONFLICT({column}, product_id, payment_method) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            cost = cost + excluded.cost
+    """ for table, column, fmt in SALES_ROLLUPS)
+
+
+# Adds one sale (bound parameter: the sale ID) to the rollups.
+ROLLUP_SALE = sales_rollup_statements("s.id = ?")
+
+REBUILD_SALES_ROLLUPS = (
+    tuple(f"DELETE FROM {table}" for table, _, _ in SALES_ROLLUPS)
+    + sales_rollup_statements()
+)
+
+# First day still held in the live sales tables. Older months have been moved
+# to archive databases (see archive.py) and only their rollups remain here.
+LIVE_SALES_START = """(
+    SELECT COALESCE(DATE(MAX(month) || '-01', '+1 month'), '0000-01-01') FROM sale_archives
+)"""
+
+# The rebuilds for a database that may have archived sales: counters add the
+# archived revenue, and daily/hourly rows before LIVE_SALES_START are kept.
+REBUILD_LIVE_DASHBOARD_STATS = (
+    "DELETE FROM dashboard_stats",
+    """
+    INSERT INTO dashboard_stats
+        (id, total_products, total_categories, low_stock_count, total_revenue)
+    SELECT 1,
+           (SELECT COUNT(*) FROM products),
+           (SELECT COUNT(*) FROM categories),
+           (SELECT COUNT(*) FROM products WHERE stock <= low_stock_threshold),
+           (SELECT COALESCE(SUM(total), 0) FROM sales)
+           + (SELECT COALESCE(SUM(revenue), 0) FROM sale_archives)
+    """,
+    f"DELETE FROM daily_sales WHERE day >= {LIVE_SALES_START}",
+    f"""
+    INSERT INTO daily_sales (day, sales_count, revenue)
+    SELECT DATE(created_at), COUNT(*), SUM(total) FROM sales
+    WHERE created_at >= {LIVE_SALES_START}
+    GROUP BY DATE(created_at)
+    """,
+)
+
+REBUILD_LIVE_SALES_ROLLUPS = (
+    tuple(f"DELETE FROM {table} WHERE {column} >= strftime('{fmt}', {LIVE_SALES_START})"
+          for table, column, fmt in SALES_ROLLUPS)
+    + sales_rollup_statements(f"s.created_at >= {LIVE_SALES_START}")
+)
+
+# Stores a receipt for every sale without one, at the default tax rate, the
+# only one before receipts were stored (bulk loads insert sales directly).
+BACKFILL_RECEIPTS = f"""
+    INSERT OR IGNORE INTO receipts (sale_id, created_at, total, body)
+    SELECT id, created_at, total_due, json_object(
+        'sale_id', id, 'created_at', created_at, 'payment_method', payment_method,
+        'items', json(items), 'subtotal', subtotal, 'tax_rate', {pricing.TAX_RATE},
+        'tax', tax, 'total', total_due)
+    FROM (
+        SELECT s.id, s.created_at, s.payment_method, t.items, t.subtotal,
+               ROUND(t.subtotal * {pricing.TAX_RATE}, 2) AS tax,
+               ROUND(t.subtotal + ROUND(t.subtotal * {pricing.TAX_RATE}, 2), 2) AS total_due
+        FROM sales s
+        JOIN (
+            SELECT sale_id, ROUND(SUM(subtotal), 2) AS subtotal,
+                   json_group_array(json_array(product_name, quantity,
+                                               unit_price, subtotal)) AS items
+            FROM (SELECT * FROM sale_items ORDER BY sale_id, id)
+            GROUP BY sale_id
+        ) t ON t.sale_id = s.id
+    )
+"""
+
+# Each entry is a tuple of SQL statements or a callable taking the connection.
+# Append only: the position in this list is the schema version.
+MIGRATIONS = [
+    # 1: secondary indexes for sales history, receipts and category filters
+    (
+        "CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON sale_items(sale_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sale_items_product_id ON sale_items(product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_products_category_id ON products(category_id)",
+        "CREATE INDEX IF NOT EXISTS idx_supplier_products_product_id "
+        "ON supplier_products(product_id)",
+    ),
+    # 2: dashboard counters and daily sales rollup, maintained by triggers
+    (
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_stats (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            total_products INTEGER NOT NULL DEFAULT 0,
+            total_categories INTEGER NOT NULL DEFAULT 0,
+            low_stock_count INTEGER NOT NULL DEFAULT 0,
+            total_revenue REAL NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            sales_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_products_ai AFTER INSERT ON products BEGIN
+            UPDATE dashboard_stats
+            SET total_products = total_products + 1,
+                low_stock_count = low_stock_count + (new.stock <= new.low_stock_threshold)
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_products_ad AFTER DELETE ON products BEGIN
+            UPDATE dashboard_stats
+            SET total_products = total_products - 1,
+                low_stock_count = low_stock_count - (old.stock <= old.low_stock_threshold)
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_products_au
+        AFTER UPDATE OF stock, low_stock_threshold ON products
+        WHEN (old.stock <= old.low_stock_threshold) != (new.stock <= new.low_stock_threshold)
+        BEGIN
+            UPDATE dashboard_stats
+            SET low_stock_count = low_stock_count
+                + (new.stock <= new.low_stock_threshold)
+                - (old.stock <= old.low_stock_threshold)
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_categories_ai AFTER INSERT ON categories BEGIN
+            UPDATE dashboard_stats SET total_categories = total_categories + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_categories_ad AFTER DELETE ON categories BEGIN
+            UPDATE dashboard_stats SET total_categories = total_categories - 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_sales_ai AFTER INSERT ON sales BEGIN
+            UPDATE dashboard_stats SET total_revenue = total_revenue + new.total WHERE id = 1;
+            INSERT INTO daily_sales (day, sales_count, revenue)
+            VALUES (DATE(new.created_at), 1, new.total)
+            ON CONFLICT(day) DO UPDATE SET
+                sales_count = sales_count + 1,
+                revenue = revenue + excluded.revenue;
+        END
+        """,
+    ) + REBUILD_DASHBOARD_STATS,
+    # 3: server-side carts; the session cookie only carries the cart ID
+    (
+        """
+        CREATE TABLE IF NOT EXISTS carts (
+            id TEXT PRIMARY KEY,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_carts_updated_at ON carts(updated_at)",
+        """
+        CREATE TABLE IF NOT EXISTS cart_items (
+            cart_id TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL CHECK(quantity > 0),
+            subtotal REAL NOT NULL,
+            PRIMARY KEY (cart_id, product_id),
+            FOREIGN KEY (cart_id) REFERENCES carts(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+    ),
+    # 4: indexes backing keyset pagination of products and suppliers
+    (
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)",
+        "CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)",
+        "CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock)",
+        "CREATE INDEX IF NOT EXISTS idx_products_category_name ON products(category_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_suppliers_name ON suppliers(name)",
+    ),
+    # 5: unit cost captured at sale time, hourly and daily sales rollups
+    (
+        "ALTER TABLE sale_items ADD COLUMN unit_cost REAL NOT NULL DEFAULT 0",
+        """
+        UPDATE sale_items SET unit_cost = COALESCE(
+            (SELECT cost_price FROM products p WHERE p.id = sale_items.product_id), 0)
+        """,
+    ) + tuple(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {column} TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            payment_method TEXT NOT NULL,
+            category_id INTEGER,
+            units INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY ({column}, product_id, payment_method)
+        ) WITHOUT ROWID
+        """ for table, column, _ in SALES_ROLLUPS) + REBUILD_SALES_ROLLUPS,
+    # 6: till-generated sale reference, so a replayed offline sale is recorded once
+    (
+        "ALTER TABLE sales ADD COLUMN client_ref TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_client_ref ON sales(client_ref)",
+    ),
+    # 7: catalogue change log for incremental client sync
+    (
+        """
+        CREATE TABLE IF NOT EXISTS catalog_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_catalog_changes_entity "
+        "ON catalog_changes(entity, entity_id)",
+    ) + tuple(
+        # One row per product/category: each change replaces the previous
+        # one under a new, higher version, so the log stays catalogue-sized.
+        f"""
+        CREATE TRIGGER IF NOT EXISTS catalog_{table}_{suffix} {event} ON {table}
+        {when}BEGIN
+            INSERT OR REPLACE INTO catalog_changes (entity, entity_id, deleted)
+            VALUES ('{entity}', {row}.id, {deleted});
+        END
+        """
+        for table, entity, columns in (
+            ("products", "product", ("name", "barcode", "category_id", "price", "stock")),
+            ("categories", "category", ("name",)),
+        )
+        for suffix, event, when, row, deleted in (
+            ("ai", "AFTER INSERT", "", "new", 0),
+            ("au", f"AFTER UPDATE OF {', '.join(columns)}",
+             "WHEN " + " OR ".join(f"old.{c} IS NOT new.{c}" for c in columns) + "\n        ",
+             "new", 0),
+            ("ad", "AFTER DELETE", "", "old", 1),
+        )
+    ) + (
+        """
+        INSERT OR IGNORE INTO catalog_changes (entity, entity_id)
+        SELECT 'category', id FROM categories
+        """,
+        """
+        INSERT OR IGNORE INTO catalog_changes (entity, entity_id)
+        SELECT 'product', id FROM products
+        """,
+    ),
+    # 8: index of monthly sales archives, for routing lookups by sale ID
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sale_archives (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            first_sale_id INTEGER NOT NULL,
+            last_sale_id INTEGER NOT NULL,
+            sales_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sale_archives_first_sale_id "
+        "ON sale_archives(first_sale_id)",
+    ),
+    # 9: receipts frozen at checkout; existing sales at the 5% rate used so far
+    (
+        """
+        CREATE TABLE IF NOT EXISTS receipts (
+            sale_id INTEGER PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            total REAL NOT NULL,
+            body TEXT NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_receipts_created_at ON receipts(created_at)",
+        BACKFILL_RECEIPTS,
+    ),
+    # 10: promotions and per-category tax rates, compiled by pricing.py
+    (
+        "ALTER TABLE categories ADD COLUMN tax_rate REAL",
+        """
+        CREATE TABLE IF NOT EXISTS promotions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK(kind IN ('price', 'percent', 'multibuy')),
+            product_id INTEGER,
+            category_id INTEGER,
+            percent REAL,
+            quantity INTEGER,
+            price REAL,
+            starts_at TEXT,
+            ends_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            CHECK((product_id IS NULL) != (category_id IS NULL)),
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_promotions_product_id ON promotions(product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_promotions_category_id ON promotions(category_id)",
+        "CREATE INDEX IF NOT EXISTS idx_promotions_ends_at ON promotions(ends_at)",
+        """
+        CREATE TABLE IF NOT EXISTS pricing_state (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT OR IGNORE INTO pricing_state (id, version) VALUES (1, 0)",
+    ) + tuple(
+        # Any change to the rules invalidates every process's compiled copy.
+        f"""
+        CREATE TRIGGER IF NOT EXISTS pricing_{table}_{suffix} {event} ON {table}
+        {when}BEGIN
+            UPDATE pricing_state SET version = version + 1 WHERE id = 1;
+        END
+        """
+        for table, suffix, event, when in (
+            ("promotions", "ai", "AFTER INSERT", ""),
+            ("promotions", "au", "AFTER UPDATE", ""),
+            ("promotions", "ad", "AFTER DELETE", ""),
+            ("categories", "au", "AFTER UPDATE OF tax_rate",
+             "WHEN old.tax_rate IS NOT new.tax_rate\n        "),
+        )
+    ),
+    # 11: change counters keying the page fragment cache
+    (
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        "INSERT OR IGNORE INTO data_versions (name) "
+        "VALUES ('categories'), ('suppliers'), ('low_stock')",
+    ) + tuple(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS versions_{table}_{suffix} {event} ON {table}
+        {when}BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = '{name}';
+        END
+        """
+        for name, table, suffix, event, when in (
+            ("categories", "categories", "ai", "AFTER INSERT", ""),
+            ("categories", "categories", "au", "AFTER UPDATE OF name", ""),
+            ("categories", "categories", "ad", "AFTER DELETE", ""),
+            ("suppliers", "suppliers", "ai", "AFTER INSERT", ""),
+            ("suppliers", "suppliers", "au", "AFTER UPDATE", ""),
+            ("suppliers", "suppliers", "ad", "AFTER DELETE", ""),
+            # Only changes to products on (or entering/leaving) the low-stock
+            # list, so ordinary sales leave the dashboard's copy valid.
+            ("low_stock", "products", "ai", "AFTER INSERT",
+             "WHEN new.stock <= new.low_stock_threshold\n        "),
+            ("low_stock", "products", "au", "AFTER UPDATE OF name, stock, low_stock_threshold",
+             "WHEN (old.stock <= old.low_stock_threshold OR new.stock <= new.low_stock_threshold)\n"
+             "         AND (old.name IS NOT new.name OR old.stock != new.stock\n"
+             "              OR old.low_stock_threshold != new.low_stock_threshold)\n        "),
+            ("low_stock", "products", "ad", "AFTER DELETE",
+             "WHEN old.stock <= old.low_stock_threshold\n        "),
+        )
+    ),
+    # 12: append-only stock ledger; purchase orders and goods receipts
+    (
+        """
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            ref_id INTEGER,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_product_id "
+        "ON stock_movements(product_id, id)",
+        # What the stock changes of the current transaction are for. Writers
+        # set it inside their transaction and reset it before committing.
+        """
+        CREATE TABLE IF NOT EXISTS stock_context (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            reason TEXT NOT NULL DEFAULT 'adjustment',
+            ref_id INTEGER
+        )
+        """,
+        "INSERT OR IGNORE INTO stock_context (id) VALUES (1)",
+        """
+        CREATE TRIGGER IF NOT EXISTS ledger_products_ai AFTER INSERT ON products
+        WHEN new.stock != 0
+        BEGIN
+            INSERT INTO stock_movements (product_id, delta, reason)
+            VALUES (new.id, new.stock, 'opening');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ledger_products_au AFTER UPDATE OF stock ON products
+        WHEN old.stock != new.stock
+        BEGIN
+            INSERT INTO stock_movements (product_id, delta, reason, ref_id)
+            SELECT new.id, new.stock - old.stock, reason, ref_id
+            FROM stock_context WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ledger_products_ad AFTER DELETE ON products
+        WHEN old.stock != 0
+        BEGIN
+            INSERT INTO stock_movements (product_id, delta, reason, ref_id)
+            SELECT old.id, -old.stock, reason, ref_id FROM stock_context WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ledger_movements_bu BEFORE UPDATE ON stock_movements
+        BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ledger_movements_bd BEFORE DELETE ON stock_movements
+        BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+        """,
+        # Stock on hand before the ledger existed.
+        """
+        INSERT INTO stock_movements (product_id, delta, reason)
+        SELECT id, stock, 'opening' FROM products WHERE stock != 0
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS purchase_orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            supplier_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open'
+                CHECK(status IN ('open', 'partial', 'received', 'cancelled')),
+            reference TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_purchase_orders_supplier_id "
+        "ON purchase_orders(supplier_id)",
+        "CREATE INDEX IF NOT EXISTS idx_purchase_orders_status ON purchase_orders(status)",
+        """
+        CREATE TABLE IF NOT EXISTS purchase_order_lines (
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            unit_cost REAL NOT NULL DEFAULT 0,
+            ordered INTEGER NOT NULL CHECK(ordered > 0),
+            received INTEGER NOT NULL DEFAULT 0 CHECK(received >= 0),
+            PRIMARY KEY (order_id, product_id),
+            FOREIGN KEY (order_id) REFERENCES purchase_orders(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS goods_receipts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            units INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES purchase_orders(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_goods_receipts_order_id ON goods_receipts(order_id)",
+    ),
+    # 13: stock snapshots folded from the ledger (ledger.py); returns by sale
+    (
+        """
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            taken_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_movement_id INTEGER NOT NULL,
+            skus INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            value REAL NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stock_snapshots_taken_at ON stock_snapshots(taken_at)",
+        """
+        CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+            snapshot_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            stock INTEGER NOT NULL,
+            cost_price REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (snapshot_id, product_id),
+            FOREIGN KEY (snapshot_id) REFERENCES stock_snapshots(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        # Only return movements are looked up by sale; sales stay unindexed.
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_returns "
+        "ON stock_movements(ref_id) WHERE reason = 'return'",
+    ),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations in order. Returns the list of versions applied."""
+    applied = []
+    while get_version(conn) < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock; another process may have won.
+            version = get_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                break
+            step = MIGRATIONS[version]
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version + 1)
+    return applied
+
+
+# ── Query Plan Checks ───────────────────────────────────────────────
+
+# Read paths that must be served from an index. Each is called for real
+# with the given arguments and every SELECT it issues is EXPLAINed.
+HOT_PATHS = [
+    ("get_recent_sales", (20,)),
+    ("get_sale_details", (1,)),
+    ("search_products", ("", 1)),
+    ("get_product_by_id", (1,)),
+    ("get_product_by_barcode", ("1001",)),
+    ("get_supplier_products", (1,)),
+    ("get_dashboard_stats", ()),
+    ("list_products", ("price", None, 50)),
+    ("list_suppliers", ()),
+    ("list_sales", ()),
+    ("list_stock_movements", (1,)),
+    ("get_purchase_order", (1,)),
+]
+
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+
+
+def explain(conn, sql):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def check_query_plans(database, hot_paths=HOT_PATHS):
+    """Run each hot path and return (function, sql, plan step) for full scans."""
+    conn = database.get_connection()
+    failures = []
+    for name, args in hot_paths:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            getattr(database, name)(*args)
+        finally:
+            conn.set_trace_callback(None)
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            for detail in explain(conn, sql):
+                if _FULL_SCAN.match(detail):
+                    failures.append((name, " ".join(sql.split()), detail))
+    return failures
+
+
+if __name__ == "__main__":
+    import database
+
+    database.init_db()
+    if "--check-plans" in sys.argv:
+        failures = check_query_plans(database)
+        for name, sql, detail in failures:
+            print(f"FULL SCAN in {name}: {detail}\n    {sql}")
+        print(f"{len(HOT_PATHS)} hot paths checked, {len(failures)} full scans")
+        sys.exit(1 if failures else 0)
+    print(f"schema version {get_version(database.get_connection())}")
@@ -0,0 +1,170 @@
+"""Sales reporting over the hourly/daily rollups.
+
+A date range is split into whole days (read from sales_daily), whole hours
+at either end (sales_hourly) and the partial hours at the very edges, which
+are the only part read from raw sale_items. create_sale keeps the rollups
+current; rebuild_rollups() recomputes them from raw rows. The rollups of
+archived months stay in the live database, so reports over them only miss
+the partial hours at the edges of a range.
+"""
+from datetime import datetime, timedelta
+
+import database
+import migrations
+
+GROUPINGS = ("product", "category", "payment_method")
+TOP_SELLER_METRICS = ("units", "revenue", "margin")
+
+_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+_RAW_SEGMENT = """
+    SELECT COALESCE(si.product_id, 0) AS product_id, p.category_id,
+           COALESCE(s.payment_method, '') AS payment_method,
+           si.quantity AS units, si.subtotal AS revenue,
+           si.quantity * si.unit_cost AS cost
+    FROM sales s
+    JOIN sale_items si ON si.sale_id = s.id
+    LEFT JOIN products p ON p.id = si.product_id
+    WHERE s.created_at >= ? AND s.created_at < ?
+"""
+
+_ROLLUP_SEGMENT = """
+    SELECT product_id, category_id, payment_method, units, revenue, cost
+    FROM {table} WHERE {column} >= ? AND {column} < ?
+"""
+
+_GROUP_COLUMNS = {
+    "product": ("r.product_id AS product_id, "
+                "COALESCE(p.name, 'Product #' || r.product_id) AS name, p.barcode AS barcode",
+                "r.product_id"),
+    "category": ("r.category_id AS category_id, "
+                 "COALESCE(c.name, 'Uncategorised') AS name",
+                 "r.category_id"),
+    "payment_method": ("r.payment_method AS payment_method, r.payment_method AS name",
+                       "r.payment_method"),
+}
+
+
+def parse_bound(value, end=False):
+    """
+    Parse 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM[:SS]'. A bare date used as the
+    end of a range includes that whole day.
+    """
+    parsed = datetime.fromisoformat(value.strip())
+    if end and len(value.strip()) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def default_range(days=30):
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return end - timedelta(days=days), end
+
+
+def _ceil(moment, unit):
+    floor = _floor(moment, unit)
+    return floor if floor == moment else floor + unit
+
+
+def _floor(moment, unit):
+    if unit == timedelta(days=1):
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def split_range(start, end):
+    """Return [(source, lo, hi)] covering [start, end) with the coarsest buckets."""
+    hour, day = timedelta(hours=1), timedelta(days=1)
+    if start >= end:
+        return []
+    first_hour, last_hour = _ceil(start, hour), _floor(end, hour)
+    if first_hour >= last_hour:
+        return [("raw", start, end)]
+    segments = [("raw", start, first_hour)]
+    first_day, last_day = _ceil(first_hour, day), _floor(last_hour, day)
+    if first_day < last_day:
+        segments += [("sales_hourly", first_hour, first_day),
+                     ("sales_daily", first_day, last_day),
+                     ("sales_hourly", last_day, last_hour)]
+    else:
+        segments.append(("sales_hourly", first_hour, last_hour))
+    segments.append(("raw", last_hour, end))
+    return [(source, lo, hi) for source, lo, hi in segments if lo < hi]
+
+
+def _range_cte(start, end):
+    parts, params = [], []
+    for source, lo, hi in split_range(start, end):
+        if source == "raw":
+            parts.append(_RAW_SEGMENT)
+            params += [lo.strftime(_TIMESTAMP), hi.strftime(_TIMESTAMP)]
+        elif source == "sales_daily":
+            parts.append(_ROLLUP_SEGMENT.format(table=source, column="day"))
+            params += [lo.strftime("%Y-%m-%d"), hi.strftime("%Y-%m-%d")]
+        else:
+            parts.append(_ROLLUP_SEGMENT.format(table=source, column="hour"))
+            params += [lo.strftime(_TIMESTAMP), hi.strftime(_TIMESTAMP)]
+    if not parts:
+        parts.append(_RAW_SEGMENT + " AND 0")
+        params += ["", ""]
+    return "WITH r AS (" + " UNION ALL ".join(parts) + ")", params
+
+
+def sales_report(start, end, group_by="product", order_by="revenue", limit=None):
+    """Units, revenue, cost and margin per product, category or payment method."""
+    if group_by not in GROUPINGS:
+        raise ValueError(f"Unknown grouping '{group_by}'")
+    if order_by not in TOP_SELLER_METRICS:
+        raise ValueError(f"Unknown ordering '{order_by}'")
+    select, key = _GROUP_COLUMNS[group_by]
+    cte, params = _range_cte(start, end)
+    query = f"""
+        {cte}
+        SELECT {select},
+               SUM(r.units) AS units,
+               ROUND(SUM(r.revenue), 2) AS revenue,
+               ROUND(SUM(r.cost), 2) AS cost,
+               ROUND(SUM(r.revenue) - SUM(r.cost), 2) AS margin
+        FROM r
+        LEFT JOIN products p ON p.id = r.product_id
+        LEFT JOIN categories c ON c.id = r.category_id
+        GROUP BY {key}
+        ORDER BY {order_by} DESC
+    """
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    conn = database.get_connection()
+    return conn.execute(query, params).fetchall()
+
+
+def top_sellers(start, end, by="units", limit=10):
+    return sales_report(start, end, group_by="product", order_by=by, limit=limit)
+
+
+def summary(start, end):
+    """Totals for the range: units, revenue, cost and margin."""
+    cte, params = _range_cte(start, end)
+    conn = database.get_connection()
+    row = conn.execute(f"""
+        {cte}
+        SELECT COALESCE(SUM(units), 0) AS units,
+               ROUND(COALESCE(SUM(revenue), 0), 2) AS revenue,
+               ROUND(COALESCE(SUM(cost), 0), 2) AS cost,
+               ROUND(COALESCE(SUM(revenue), 0) - COALESCE(SUM(cost), 0), 2) AS margin
+        FROM r
+    """, params).fetchone()
+    return dict(row)
+
+
+def rebuild_rollups():
+    """Recompute sales_hourly and sales_daily from sale_items."""
+    conn = database.get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in migrations.REBUILD_LIVE_SALES_ROLLUPS:
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
@@ -85,7 +85,9 @@ async function saveProduct() {
     if (data.success) {
         bootstrap.Modal.getInstance(document.getElementById("productModal")).hide();
         showToast(productId ? "Product updated" : "Product added", "success");
-        setTimeout(() => location.reload(), 500);
+        // The event stream brings the same row; this covers a dropped stream.
+        const saved = await fetch(`/api/products/${productId || data.id}`);
+        if (saved.ok) upsertInventoryRow(await saved.json(), !productId);
     } else {
         showToast(data.error || "Failed to save", "danger");
     }
@@ -97,7 +99,7 @@ async function deleteProduct(productId, name) {
     const data = await resp.json();
     if (data.success) {
         showToast("Product deleted", "success");
-        setTimeout(() => location.reload(), 500);
+        removeInventoryRow(productId);
     } else {
         showToast(data.error || "Failed to delete", "danger");
     }
@@ -183,8 +185,13 @@ async function addToCart() {
     const qty = parseInt(qtyInput.value) || 1;
     if (!query) return;
 
-    const resp = await fetch(`/api/products/search?q=${encodeURIComponent(query)}`);
-    const products = await resp.json();
+    let products;
+    if (till.enabled) {
+        products = tillFind(query);
+    } else {
+        const resp = await fetch(`/api/products/search?q=${encodeURIComponent(query)}`);
+        products = await resp.json();
+    }
 
     if (products.length === 0) {
         showToast("No product found", "warning");
@@ -216,6 +223,14 @@ function showProductPicker(products, qty) {
 }
 
 async function doAddToCart(productId, quantity) {
+    if (till.enabled) {
+        if (tillCartAdd(productId, quantity)) {
+            document.getElementById("product-search").value = "";
+            document.getElementById("cart-qty").value = "1";
+            document.getElementById("product-search").focus();
+        }
+        return;
+    }
     const resp = await fetch("/api/cart/add", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -232,11 +247,16 @@ async function doAddToCart(productId, quantity) {
     }
 }
 
-async function removeFromCart(index) {
+async function removeFromCart(productId) {
+    if (till.enabled) {
+        till.cart = till.cart.filter(item => item.product_id !== productId);
+        renderTillCart();
+        return;
+    }
     const resp = await fetch("/api/cart/remove", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ index }),
+        body: JSON.stringify({ product_id: productId }),
     });
     const data = await resp.json();
     if (data.success) refreshCartDisplay(data.cart, data.totals);
@@ -244,6 +264,11 @@ async function removeFromCart(index) {
 
 async function clearCart() {
     if (!confirm("Clear entire cart?")) return;
+    if (till.enabled) {
+        till.cart = [];
+        renderTillCart();
+        return;
+    }
     const resp = await fetch("/api/cart/clear", { method: "POST" });
     const data = await resp.json();
     if (data.success) refreshCartDisplay(data.cart, data.totals);
@@ -263,12 +288,13 @@ function refreshCartDisplay(cart, totals) {
             const tr = document.createElement("tr");
             tr.innerHTML = `
                 <td>${i + 1}</td>
-                <td>${item.name}</td>
+                <td>${item.name}${item.promotion ? `
+                    <div class="small text-success">${escapeHtml(item.promotion)} &minus;$${item.discount.toFixed(2)}</div>` : ""}</td>
                 <td>$${item.price.toFixed(2)}</td>
                 <td>${item.quantity}</td>
                 <td>$${item.subtotal.toFixed(2)}</td>
                 <td>
-                    <button class="btn btn-sm btn-outline-danger btn-action" onclick="removeFromCart(${i})">
+                    <button class="btn btn-sm btn-outline-danger btn-action" onclick="removeFromCart(${item.product_id})">
                         <i class="bi bi-x-lg"></i>
                     </button>
                 </td>`;
@@ -278,10 +304,22 @@ function refreshCartDisplay(cart, totals) {
 
     document.getElementById("summary-items").textContent = totals.item_count;
     document.getElementById("summary-subtotal").textContent = `$${totals.subtotal.toFixed(2)}`;
+    const discountRow = document.getElementById("summary-discount-row");
+    if (discountRow) {
+        discountRow.style.setProperty("display", totals.discount ? "" : "none", "important");
+        document.getElementById("summary-discount").textContent = `\u2212$${(totals.discount || 0).toFixed(2)}`;
+    }
     document.getElementById("summary-tax").textContent = `$${totals.tax.toFixed(2)}`;
     document.getElementById("summary-total").textContent = `$${totals.total.toFixed(2)}`;
 }
 
+async function reloadCart() {
+    if (till.enabled) return;  // the till prices its own cart
+    const resp = await fetch("/api/cart");
+    const data = await resp.json();
+    if (data.success) refreshCartDisplay(data.cart, data.totals);
+}
+
 async function checkout() {
     const cartBody = document.getElementById("cart-body");
     if (!cartBody || cartBody.children.length === 0) {
@@ -291,6 +329,10 @@ async function checkout() {
 
     const paymentMethod = document.getElementById("payment-method").value;
     if (!confirm(`Complete checkout? (${paymentMethod})`)) return;
+    if (till.enabled) {
+        await tillCheckout(paymentMethod);
+        return;
+    }
 
     const resp = await fetch("/api/checkout", {
         method: "POST",
@@ -302,12 +344,574 @@ async function checkout() {
         refreshCartDisplay([], { item_count: 0, subtotal: 0, tax: 0, total: 0 });
         showToast("Sale completed!", "success");
         window.open(`/receipt/${data.sale_id}`, "_blank");
-        setTimeout(() => location.reload(), 1000);
     } else {
         showToast(data.error, "danger");
     }
 }
 
+// ── Sales: Offline Till Mode ────────────────────────────────────
+// The till keeps a local copy of the catalogue and a journal of completed
+// sales in IndexedDB, so it can keep selling while the server is slow or
+// unreachable. The catalogue is loaded once from /api/catalog/snapshot and
+// then kept current from /api/catalog/changes. Journaled sales are synced in
+// batches to /api/sales/batch; each carries a client_ref, so a batch that is
+// retried is not recorded twice. Each store gets its own local database, and
+// the till's requests name the store it was opened on. The cart is priced
+// from the promotions and tax rates of /api/pricing/rules, the way
+// pricing.price_basket() prices it at checkout.
+
+const TILL_DB = "supermarket-till";
+const TILL_SYNC_MS = 10000;
+const TILL_SYNC_BATCH = 50;
+
+const till = {
+    enabled: false, db: null, products: new Map(), byBarcode: new Map(),
+    pricing: null, cart: [], syncing: false,
+};
+
+function tillStoreId() {
+    const page = document.getElementById("sales-page");
+    return (page && page.dataset.store) || "";
+}
+
+function tillHeaders(headers = {}) {
+    const store = tillStoreId();
+    return store ? { ...headers, "X-Store-ID": store } : headers;
+}
+
+function openTillDb() {
+    return new Promise((resolve, reject) => {
+        const store = tillStoreId();
+        const req = indexedDB.open(store ? `${TILL_DB}-${store}` : TILL_DB, 1);
+        req.onupgradeneeded = () => {
+            const db = req.result;
+            db.createObjectStore("products", { keyPath: "id" });
+            db.createObjectStore("meta");
+            db.createObjectStore("journal", { keyPath: "client_ref" }).createIndex("status", "status");
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+// Run fn(store) in one transaction; resolves with fn's request result once committed.
+function tillStore(name, mode, fn) {
+    return new Promise((resolve, reject) => {
+        const tx = till.db.transaction(name, mode);
+        const req = fn(tx.objectStore(name));
+        tx.oncomplete = () => resolve(req ? req.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+function tillIndexProduct(p) {
+    till.products.set(p.id, p);
+    if (p.barcode) till.byBarcode.set(p.barcode, p);
+}
+
+function tillForgetProduct(id) {
+    const old = till.products.get(id);
+    if (old && old.barcode) till.byBarcode.delete(old.barcode);
+    till.products.delete(id);
+}
+
+async function setTillMode(enabled) {
+    localStorage.setItem("till-mode", enabled ? "1" : "");
+    till.enabled = enabled;
+    if (!enabled) {
+        location.reload();
+        return;
+    }
+    till.db = till.db || await openTillDb();
+    (await tillStore("products", "readonly", store => store.getAll())).forEach(tillIndexProduct);
+    const pricing = await tillStore("meta", "readonly", store => store.get("pricing"));
+    if (pricing) till.pricing = tillCompileRules(pricing);
+    till.cart = JSON.parse(localStorage.getItem("till-cart") || "[]");
+    renderTillCart();
+    await tillTick();
+    if (!till.timer) {
+        till.timer = setInterval(tillTick, TILL_SYNC_MS);
+        window.addEventListener("online", tillTick);
+    }
+}
+
+async function tillTick() {
+    try {
+        const version = await tillStore("meta", "readonly", store => store.get("version"));
+        if (version === undefined) {
+            await loadTillSnapshot();
+        } else {
+            await pullTillChanges(version);
+        }
+        await pullTillPricing();
+    } catch (e) {
+        // Offline: keep selling from the catalogue we have.
+    }
+    await syncTillJournal();
+    updateTillStatus();
+}
+
+function tillRows(data) {
+    return data.rows.map(row => Object.fromEntries(data.fields.map((f, i) => [f, row[i]])));
+}
+
+async function loadTillSnapshot() {
+    const resp = await fetch("/api/catalog/snapshot", { headers: tillHeaders() });
+    if (!resp.ok) return;
+    const data = await resp.json();
+    const products = tillRows(data);
+    await tillStore("products", "readwrite", store => {
+        store.clear();
+        products.forEach(p => store.put(p));
+    });
+    await tillStore("meta", "readwrite", store => store.put(data.version, "version"));
+    till.products.clear();
+    till.byBarcode.clear();
+    products.forEach(tillIndexProduct);
+}
+
+async function pullTillChanges(version) {
+    for (;;) {
+        const resp = await fetch(`/api/catalog/changes?since=${version}`,
+                                 { headers: tillHeaders() });
+        if (!resp.ok) return;
+        const data = await resp.json();
+        const products = tillRows(data);
+        await tillStore("products", "readwrite", store => {
+            products.forEach(p => store.put(p));
+            data.deleted.forEach(id => store.delete(id));
+        });
+        data.deleted.concat(products.map(p => p.id)).forEach(tillForgetProduct);
+        products.forEach(tillIndexProduct);
+        version = data.version;
+        await tillStore("meta", "readwrite", store => store.put(version, "version"));
+        if (!data.more) return;
+    }
+}
+
+async function pullTillPricing() {
+    // no-cache: revalidate by ETag, so unchanged rules cost a 304.
+    const resp = await fetch("/api/pricing/rules", { headers: tillHeaders(), cache: "no-cache" });
+    if (!resp.ok) return;
+    const data = await resp.json();
+    if (till.pricing && till.pricing.version === data.version) return;
+    await tillStore("meta", "readwrite", store => store.put(data, "pricing"));
+    till.pricing = tillCompileRules(data);
+    renderTillCart();
+}
+
+function tillCompileRules(data) {
+    const byProduct = new Map(), byCategory = new Map();
+    data.promotions.forEach(rule => {
+        const [index, key] = rule.product_id !== null
+            ? [byProduct, rule.product_id] : [byCategory, rule.category_id];
+        if (!index.has(key)) index.set(key, []);
+        index.get(key).push(rule);
+    });
+    return { version: data.version, taxRate: data.tax_rate, taxRates: data.tax_rates,
+             byProduct, byCategory };
+}
+
+// round(value, 2) as Python does it: by the float's exact value (which
+// toFixed uses too), with exact ties, odd multiples of 1/8, to even.
+function round2(value) {
+    if (Number.isInteger(value * 8) && (value * 8) % 2 !== 0) {
+        const cents = Math.round(value * 100);
+        return (cents % 2 === 0 ? cents : cents - 1) / 100;
+    }
+    return Number(value.toFixed(2));
+}
+
+// Mirrors pricing.price_basket() and pricing.totals(): the lowest current
+// price, then the better of the percent-off and multi-buy deals.
+function tillPriceCart() {
+    const rules = till.pricing || tillCompileRules({
+        version: null, tax_rate: parseFloat(document.getElementById("sales-page").dataset.taxRate),
+        tax_rates: {}, promotions: [],
+    });
+    const at = new Date().toISOString().slice(0, 19).replace("T", " ");
+    const lines = till.cart.map(item => {
+        const product = till.products.get(item.product_id) || item;
+        let unit = product.price, bestPercent = null;
+        const deals = [];
+        const candidates = (rules.byProduct.get(item.product_id) || [])
+            .concat(rules.byCategory.get(product.category_id) || []);
+        for (const rule of candidates) {
+            if ((rule.starts_at !== null && at < rule.starts_at)
+                    || (rule.ends_at !== null && at >= rule.ends_at)) continue;
+            if (rule.kind === "price") {
+                unit = Math.min(unit, rule.price);
+            } else if (rule.kind === "percent") {
+                if (bestPercent === null || rule.percent > bestPercent.percent) bestPercent = rule;
+            } else {
+                deals.push(rule);
+            }
+        }
+        const gross = round2(unit * item.quantity);
+        let subtotal = gross, applied = null;
+        if (bestPercent !== null) {
+            subtotal = round2(gross * (1 - bestPercent.percent / 100));
+            applied = bestPercent;
+        }
+        for (const rule of deals) {
+            if (item.quantity >= rule.quantity) {
+                const bundles = Math.floor(item.quantity / rule.quantity);
+                const cost = round2(bundles * rule.price + (item.quantity % rule.quantity) * unit);
+                if (cost < subtotal) {
+                    subtotal = cost;
+                    applied = rule;
+                }
+            }
+        }
+        return {
+            product_id: item.product_id, name: item.name, price: unit, quantity: item.quantity,
+            subtotal, discount: round2(gross - subtotal), promotion: applied && applied.name,
+            taxRate: rules.taxRates[product.category_id] ?? rules.taxRate,
+        };
+    });
+
+    const bands = new Map();
+    lines.forEach(line => bands.set(line.taxRate, (bands.get(line.taxRate) || 0) + line.subtotal));
+    const tax = round2([...bands].sort((a, b) => a[0] - b[0])
+        .reduce((sum, [rate, net]) => sum + round2(round2(net) * rate), 0));
+    const subtotal = round2(lines.reduce((sum, line) => sum + line.subtotal, 0));
+    return [lines, {
+        item_count: lines.reduce((sum, line) => sum + line.quantity, 0),
+        subtotal, tax, total: round2(subtotal + tax),
+        discount: round2(lines.reduce((sum, line) => sum + line.discount, 0)),
+    }];
+}
+
+function tillFind(query) {
+    const exact = till.byBarcode.get(query);
+    if (exact) return [exact];
+    const needle = query.toLowerCase();
+    const matches = [];
+    for (const p of till.products.values()) {
+        if (p.name.toLowerCase().includes(needle) || (p.barcode || "").includes(query)) {
+            matches.push(p);
+            if (matches.length >= 20) break;
+        }
+    }
+    return matches;
+}
+
+function tillCartAdd(productId, quantity) {
+    const product = till.products.get(productId);
+    if (!product) {
+        // Deleted since it was scanned or listed.
+        showToast("Product is no longer in the catalogue", "warning");
+        return false;
+    }
+    const line = till.cart.find(item => item.product_id === productId);
+    const wanted = quantity + (line ? line.quantity : 0);
+    if (wanted > product.stock) {
+        showToast(`Insufficient stock for '${product.name}': available ${product.stock}`, "danger");
+        return false;
+    }
+    if (line) {
+        line.quantity = wanted;
+    } else {
+        till.cart.push({ product_id: productId, name: product.name, price: product.price,
+                         category_id: product.category_id, quantity });
+    }
+    renderTillCart();
+    return true;
+}
+
+function renderTillCart() {
+    localStorage.setItem("till-cart", JSON.stringify(till.cart));
+    refreshCartDisplay(...tillPriceCart());
+}
+
+async function tillCheckout(paymentMethod) {
+    const gone = till.cart.filter(item => !till.products.has(item.product_id));
+    if (gone.length) {
+        showToast(`No longer in the catalogue: ${gone.map(item => item.name).join(", ")}. ` +
+                  "Remove from the cart to continue.", "danger");
+        return;
+    }
+    const sale = {
+        client_ref: crypto.randomUUID(),
+        items: till.cart.map(item => ({ product_id: item.product_id, quantity: item.quantity })),
+        payment_method: paymentMethod,
+        created_at: new Date().toISOString(),
+        status: "pending",
+    };
+    await tillStore("journal", "readwrite", store => store.put(sale));
+    // Decrement the local snapshot so the next customer sees what is left.
+    const changed = till.cart.map(item => {
+        const p = till.products.get(item.product_id);
+        p.stock = Math.max(0, p.stock - item.quantity);
+        return p;
+    });
+    await tillStore("products", "readwrite", store => changed.forEach(p => store.put(p)));
+    till.cart = [];
+    renderTillCart();
+    showToast("Sale recorded", "success");
+    syncTillJournal();
+}
+
+async function syncTillJournal() {
+    if (!till.enabled || till.syncing || !navigator.onLine) return;
+    till.syncing = true;
+    try {
+        for (;;) {
+            const pending = (await tillStore("journal", "readonly",
+                store => store.index("status").getAll("pending", TILL_SYNC_BATCH)));
+            if (pending.length === 0) break;
+            const resp = await fetch("/api/sales/batch", {
+                method: "POST",
+                headers: tillHeaders({ "Content-Type": "application/json" }),
+                body: JSON.stringify({ sales: pending }),
+            });
+            if (!resp.ok) break;
+            const data = await resp.json();
+            await tillStore("journal", "readwrite", store => {
+                data.results.forEach((result, i) => {
+                    if (result.status === "created" || result.status === "duplicate") {
+                        store.delete(pending[i].client_ref);  // the server has it now
+                    } else {
+                        store.put({ ...pending[i], status: "conflict", error: result.error });
+                    }
+                });
+            });
+            // Server stock is the truth for everything this batch touched.
+            const updated = data.products.map(p => Object.assign(till.products.get(p.id) || { id: p.id }, p));
+            updated.forEach(tillIndexProduct);
+            await tillStore("products", "readwrite", store => updated.forEach(p => store.put(p)));
+            if (pending.length < TILL_SYNC_BATCH) break;
+        }
+    } catch (e) {
+        // Server unreachable: the journal keeps the sales until the next attempt.
+    } finally {
+        till.syncing = false;
+        updateTillStatus();
+    }
+}
+
+async function retryTillConflicts() {
+    const conflicts = await tillStore("journal", "readonly", store => store.index("status").getAll("conflict"));
+    await tillStore("journal", "readwrite", store =>
+        conflicts.forEach(sale => store.put({ ...sale, status: "pending", error: undefined })));
+    syncTillJournal();
+}
+
+async function updateTillStatus() {
+    const badge = document.getElementById("till-status");
+    if (!badge || !till.db) return;
+    const [pending, conflicts] = await Promise.all(["pending", "conflict"].map(status =>
+        tillStore("journal", "readonly", store => store.index("status").count(status))));
+    badge.textContent = `${till.products.size} products · ${pending} to sync` +
+        (conflicts ? ` · ${conflicts} conflicts` : "");
+    badge.className = `badge ${conflicts ? "text-bg-danger" : pending ? "text-bg-warning" : "text-bg-success"}`;
+    const retry = document.getElementById("till-retry");
+    if (retry) retry.style.display = conflicts ? "" : "none";
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    const toggle = document.getElementById("till-mode");
+    if (toggle && localStorage.getItem("till-mode")) {
+        toggle.checked = true;
+        setTillMode(true);
+    }
+});
+
+// ── Live Updates ────────────────────────────────────────────────
+// Pages subscribe to /api/events and patch themselves when sales, stock or
+// the catalogue change, instead of reloading after every write. The stream
+// reconnects on its own and replays what it missed; "resync" means it
+// missed too much and the page must reload.
+
+const DASHBOARD_REFRESH_MS = 1000;
+let dashboardRefresh = null;
+
+function escapeHtml(value) {
+    return String(value ?? "").replace(/[&<>"']/g, c => ({
+        "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;",
+    })[c]);
+}
+
+function stockRowClass(stock, threshold) {
+    if (stock <= Math.floor(threshold / 2)) return "low-stock-critical";
+    return stock <= threshold ? "low-stock-warning" : "";
+}
+
+function toggleEmpty(name, empty) {
+    const table = document.getElementById(`${name}-table`);
+    const placeholder = document.getElementById(`${name}-empty`);
+    if (table) table.style.display = empty ? "none" : "";
+    if (placeholder) placeholder.style.display = empty ? "" : "none";
+}
+
+function prependRecentSale(sale) {
+    const body = document.getElementById("recent-sales-body");
+    if (!body || body.querySelector(`tr[data-sale-id="${sale.id}"]`)) return;
+    const tr = document.createElement("tr");
+    tr.className = "cursor-pointer";
+    tr.dataset.saleId = sale.id;
+    tr.onclick = () => window.open(`/receipt/${sale.id}`, "_blank");
+    const payment = body.dataset.columns === "payment";
+    tr.innerHTML = `
+        <td><span class="text-primary fw-bold">#${sale.id}</span></td>
+        <td${payment ? "" : ' class="small"'}>${escapeHtml((sale.created_at || "").slice(0, 16))}</td>
+        <td class="text-center">${sale.item_count}</td>
+        <td class="text-end fw-bold">$${sale.total.toFixed(2)}</td>
+        ${payment ? `<td class="text-center"><span class="badge bg-secondary">${escapeHtml(sale.payment_method)}</span></td>` : ""}`;
+    body.prepend(tr);
+    const limit = parseInt(body.dataset.limit) || 10;
+    while (body.children.length > limit) body.lastElementChild.remove();
+    const count = document.getElementById("recent-sales-count");
+    if (count) count.textContent = body.children.length;
+    toggleEmpty("recent-sales", false);
+}
+
+// Dashboard counters come from one cheap request, at most once a second.
+function scheduleDashboardRefresh() {
+    if (dashboardRefresh) return;
+    dashboardRefresh = setTimeout(async () => {
+        dashboardRefresh = null;
+        const resp = await fetch("/api/dashboard");
+        if (resp.ok) renderDashboard(await resp.json());
+    }, DASHBOARD_REFRESH_MS);
+}
+
+function renderDashboard(data) {
+    document.querySelectorAll("[data-stat]").forEach(el => {
+        const value = data.stats[el.dataset.stat];
+        el.textContent = el.dataset.stat === "today_revenue" ? `$${value.toFixed(2)}` : value;
+        if (el.dataset.stat === "low_stock_count") el.classList.toggle("text-danger", value > 0);
+    });
+    const body = document.getElementById("low-stock-body");
+    body.innerHTML = "";
+    data.low_stock.forEach(p => {
+        const critical = stockRowClass(p.stock, p.low_stock_threshold) === "low-stock-critical";
+        const tr = document.createElement("tr");
+        tr.className = critical ? "low-stock-critical" : "low-stock-warning";
+        tr.innerHTML = `
+            <td>${escapeHtml(p.name)}</td>
+            <td class="text-center fw-bold">${p.stock}</td>
+            <td class="text-center">${p.low_stock_threshold}</td>
+            <td class="text-center">${critical
+                ? '<span class="badge bg-danger badge-stock">Critical</span>'
+                : '<span class="badge bg-warning text-dark badge-stock">Low</span>'}</td>`;
+        body.appendChild(tr);
+    });
+    document.getElementById("low-stock-count").textContent = data.low_stock.length;
+    toggleEmpty("low-stock", data.low_stock.length === 0);
+}
+
+function inventoryRow(productId) {
+    return document.querySelector(`#inventory-body tr[data-product-id="${productId}"]`);
+}
+
+function fillInventoryRow(tr, p) {
+    tr.dataset.productId = p.id;
+    tr.dataset.threshold = p.low_stock_threshold;
+    tr.className = stockRowClass(p.stock, p.low_stock_threshold);
+    tr.innerHTML = `
+        <td class="text-muted">${p.id}</td>
+        <td class="fw-medium">${escapeHtml(p.name)}</td>
+        <td><code>${escapeHtml(p.barcode || "—")}</code></td>
+        <td>${p.category_name
+            ? `<span class="badge bg-light text-dark">${escapeHtml(p.category_name)}</span>`
+            : '<span class="text-muted">—</span>'}</td>
+        <td class="text-end">$${p.price.toFixed(2)}</td>
+        <td class="text-end text-muted">$${p.cost_price.toFixed(2)}</td>
+        <td class="text-center">
+            <span class="badge ${p.stock <= p.low_stock_threshold ? "bg-danger" : "bg-success"} badge-stock">${p.stock}</span>
+        </td>
+        <td class="text-center text-muted">${p.low_stock_threshold}</td>
+        <td class="text-center">
+            <button class="btn btn-sm btn-outline-primary btn-action me-1"
+                    onclick="openProductModal(${p.id})" title="Edit">
+                <i class="bi bi-pencil"></i>
+            </button>
+            <button class="btn btn-sm btn-outline-danger btn-action"
+                    onclick="deleteProduct(${p.id}, ${escapeHtml(JSON.stringify(p.name))})" title="Delete">
+                <i class="bi bi-trash"></i>
+            </button>
+        </td>`;
+}
+
+// Edited rows are patched where they are; new products are only added to
+// the unfiltered listing, where they certainly belong.
+function upsertInventoryRow(p, created) {
+    const body = document.getElementById("inventory-body");
+    if (!body) return;
+    let tr = inventoryRow(p.id);
+    if (!tr) {
+        if (!created) return;
+        if (location.search) {
+            document.getElementById("inventory-stale").style.display = "";
+            return;
+        }
+        tr = document.createElement("tr");
+        body.prepend(tr);
+    }
+    fillInventoryRow(tr, p);
+    updateInventoryCount();
+}
+
+function removeInventoryRow(productId) {
+    const tr = inventoryRow(productId);
+    if (!tr) return;
+    tr.remove();
+    updateInventoryCount();
+}
+
+function patchInventoryStock(productId, stock) {
+    const tr = inventoryRow(productId);
+    if (!tr) return;
+    const threshold = parseInt(tr.dataset.threshold);
+    tr.className = stockRowClass(stock, threshold);
+    const badge = tr.querySelector(".badge-stock");
+    badge.textContent = stock;
+    badge.className = `badge ${stock <= threshold ? "bg-danger" : "bg-success"} badge-stock`;
+}
+
+function updateInventoryCount() {
+    const count = document.getElementById("inventory-body").children.length;
+    document.getElementById("inventory-count").textContent = count;
+    toggleEmpty("inventory", count === 0);
+}
+
+function liveHandlers() {
+    if (document.getElementById("dashboard-page")) {
+        const refresh = () => scheduleDashboardRefresh();
+        return {
+            sale: sale => { prependRecentSale(sale); refresh(); },
+            stock: refresh, product: refresh, product_deleted: refresh,
+            category: refresh, category_deleted: refresh, catalog: refresh,
+        };
+    }
+    if (document.getElementById("inventory-body")) {
+        const stale = () => { document.getElementById("inventory-stale").style.display = ""; };
+        return {
+            stock: data => data.products.forEach(p => patchInventoryStock(p.id, p.stock)),
+            product: data => data.products.forEach(p => upsertInventoryRow(p, data.created)),
+            product_deleted: data => removeInventoryRow(data.id),
+            category: () => refreshCategoryList(),
+            category_deleted: () => { refreshCategoryList(); stale(); },
+            catalog: stale,
+        };
+    }
+    if (document.getElementById("sales-page")) {
+        return { sale: prependRecentSale, pricing: reloadCart };
+    }
+    return null;
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    const handlers = liveHandlers();
+    if (!handlers || !window.EventSource) return;
+    const source = new EventSource("/api/events");
+    Object.entries(handlers).forEach(([kind, handle]) => {
+        source.addEventListener(kind, e => handle(JSON.parse(e.data)));
+    });
+    source.addEventListener("resync", () => location.reload());
+});
+
 // ── Suppliers ───────────────────────────────────────────────────
 
 async function saveSupplier() {
@@ -349,6 +953,32 @@ async function deleteSupplier(supplierId, name) {
     }
 }
 
+let typeaheadTimer = null;
+
+function productTypeahead(query) {
+    document.getElementById("link-product-id").value = "";
+    clearTimeout(typeaheadTimer);
+    typeaheadTimer = setTimeout(async () => {
+        const list = document.getElementById("link-product-results");
+        list.innerHTML = "";
+        if (!query.trim()) return;
+        const resp = await fetch(`/api/products/typeahead?q=${encodeURIComponent(query.trim())}`);
+        const products = await resp.json();
+        products.forEach(p => {
+            const btn = document.createElement("button");
+            btn.type = "button";
+            btn.className = "list-group-item list-group-item-action";
+            btn.textContent = `${p.name} (${p.barcode || "N/A"})`;
+            btn.addEventListener("click", () => {
+                document.getElementById("link-product-id").value = p.id;
+                document.getElementById("link-product-search").value = btn.textContent;
+                list.innerHTML = "";
+            });
+            list.appendChild(btn);
+        });
+    }, 200);
+}
+
 async function linkProduct(supplierId) {
     const productId = document.getElementById("link-product-id").value;
     const supplyPrice = parseFloat(document.getElementById("link-supply-price").value) || 0;
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh single-store database with the sample catalogue."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "supermarket.db"))
+    stores = dict(database.STORES)
+    database.configure_stores({})
+    database.init_db()
+    database.seed_sample_data()
+    yield database.get_connection()
+    database.release_connection()
+    database.configure_stores(stores)
+
+
+@pytest.fixture
+def client(db):
+    from app import app
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Two configured stores, "a" and "b", whose databases do not exist yet."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "supermarket.db"))
+    saved = dict(database.STORES)
+    paths = {store_id: str(tmp_path / f"{store_id}.db") for store_id in ("a", "b")}
+    database.configure_stores(paths)
+    yield paths
+    database.release_connection()
+    database.configure_stores(saved)
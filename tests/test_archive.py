@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import archive
+import database
+
+OLD_MONTH = "2025-01"
+
+
+@pytest.fixture
+def old_sales(db):
+    """Five sales in a closed month and one made today, as {sale_id: total}."""
+    ids = database.create_sales([
+        {"items": [{"product_id": 1 + i % 3, "quantity": 1 + i}],
+         "created_at": f"{OLD_MONTH}-{10 + i:02d} 12:00:00"}
+        for i in range(5)])
+    live = database.create_sale([{"product_id": 4, "quantity": 1}])
+    totals = dict(db.execute("SELECT id, total FROM sales").fetchall())
+    return ids, live, totals
+
+
+def archived_sales():
+    path = f"{database.archive_dir()}/sales-{OLD_MONTH}.db"
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM sales ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_archived_month_reads_back(db, old_sales):
+    ids, live, totals = old_sales
+    revenue = database.get_dashboard_stats()["total_revenue"]
+    details = {sale_id: database.get_receipt(sale_id) for sale_id in ids}
+
+    assert archive.archive_sales(keep_months=1, batch_size=2) == {OLD_MONTH: 5}
+    assert archived_sales() == ids
+    assert [r[0] for r in db.execute("SELECT id FROM sales")] == [live]
+    assert db.execute("SELECT COUNT(*) FROM sale_items WHERE sale_id != ?",
+                      (live,)).fetchone()[0] == 0
+
+    (month,) = archive.list_archives()
+    assert (month["month"], month["first_sale_id"], month["last_sale_id"],
+            month["sales_count"]) == (OLD_MONTH, ids[0], ids[-1], 5)
+    assert month["revenue"] == pytest.approx(sum(totals[i] for i in ids))
+    # The counters and rollups keep the archived sales.
+    assert database.get_dashboard_stats()["total_revenue"] == revenue
+
+    for sale_id in ids:
+        sale, items = database.get_sale_details(sale_id)
+        assert (sale["id"], sale["total"]) == (sale_id, totals[sale_id])
+        assert len(items) == 1
+        assert database.get_receipt(sale_id) == details[sale_id]
+        assert database.sale_exists(sale_id)
+    assert archive.archive_sales(keep_months=1) == {}
+
+
+def test_archive_interrupted_between_copy_and_delete_reruns_cleanly(db, old_sales):
+    ids, live, totals = old_sales
+    # Fail the second batch's delete, after its copy was committed.
+    db.execute(f"""
+        CREATE TEMP TRIGGER crash BEFORE DELETE ON main.sales WHEN old.id = {ids[2]}
+        BEGIN SELECT RAISE(ABORT, 'crash'); END
+    """)
+    with pytest.raises(sqlite3.IntegrityError, match="crash"):
+        archive.archive_sales(keep_months=1, batch_size=2)
+    assert archived_sales() == ids[:4]
+    assert [r[0] for r in db.execute("SELECT id FROM sales ORDER BY id")] == ids[2:] + [live]
+    assert archive.list_archives()[0]["sales_count"] == 2
+
+    db.execute("DROP TRIGGER temp.crash")
+    assert archive.archive_sales(keep_months=1, batch_size=2) == {OLD_MONTH: 3}
+    assert archived_sales() == ids
+    assert [r[0] for r in db.execute("SELECT id FROM sales")] == [live]
+    (month,) = archive.list_archives()
+    assert (month["first_sale_id"], month["last_sale_id"], month["sales_count"]) == (
+        ids[0], ids[-1], 5)
+    assert month["revenue"] == pytest.approx(sum(totals[i] for i in ids))
+    for sale_id in ids:
+        assert database.get_sale_details(sale_id)[0]["total"] == totals[sale_id]
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.parametrize("quantity", [0, -2, "two", None, [1]])
+def test_add_rejects_invalid_quantities(client, quantity):
+    response = client.post("/api/cart/add", json={"product_id": 1, "quantity": quantity})
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+    assert client.get("/api/cart").get_json()["cart"] == []
+
+
+def test_add_accumulates_up_to_stock(client):
+    # Whole Milk 1L (product 1) has 45 in stock.
+    assert client.post("/api/cart/add", json={"product_id": 1, "quantity": 40}).status_code == 200
+    response = client.post("/api/cart/add", json={"product_id": 1, "quantity": 6})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Only 45 available"
+    response = client.post("/api/cart/add", json={"product_id": 1, "quantity": 5})
+    assert [item["quantity"] for item in response.get_json()["cart"]] == [45]
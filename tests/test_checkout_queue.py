@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+import checkout_queue
+import database
+
+
+@pytest.fixture
+def writer(db):
+    queue = checkout_queue.CheckoutQueue(database.current_path())
+    yield queue
+    queue.stop()
+
+
+@pytest.fixture
+def blocked(writer, monkeypatch):
+    """The writer held inside its first batch until release is set."""
+    entered, release = threading.Event(), threading.Event()
+    create_sales = database.create_sales
+
+    def slow_create_sales(orders):
+        entered.set()
+        release.wait(5)
+        return create_sales(orders)
+
+    monkeypatch.setattr(database, "create_sales", slow_create_sales)
+    first = writer.submit([{"product_id": 1, "quantity": 1}])
+    assert entered.wait(5)
+    yield first, release
+    release.set()
+
+
+def test_rejected_sale_leaves_the_rest_of_the_batch(writer):
+    futures = [writer.submit([{"product_id": 1, "quantity": 1}]),
+               writer.submit([{"product_id": 12, "quantity": 1000}]),
+               writer.submit([{"product_id": 4, "quantity": 2}])]
+    first, rejected, last = futures
+    assert isinstance(first.result(5), int)
+    with pytest.raises(ValueError, match="Insufficient stock"):
+        rejected.result(5)
+    assert isinstance(last.result(5), int)
+    assert database.get_product_by_id(12)["stock"] == 3
+    stats = writer.stats()
+    assert (stats["committed"], stats["rejected"]) == (2, 1)
+
+    with pytest.raises(ValueError):
+        writer.checkout([{"product_id": 12, "quantity": 1000}])
+
+
+def test_checkout_waiting_in_the_queue_is_cancelled_on_timeout(writer, blocked):
+    first, release = blocked
+    with pytest.raises(checkout_queue.CheckoutBusy, match="timed out"):
+        writer.checkout([{"product_id": 4, "quantity": 1}], timeout=0.05)
+    release.set()
+    first.result(5)
+    writer.stop()  # drains the queue past the cancelled checkout
+    assert writer.stats()["cancelled"] == 1
+    assert writer.stats()["committed"] == 1
+    assert database.get_product_by_id(4)["stock"] == 50
+
+
+def test_full_queue_refuses_checkouts(db, monkeypatch):
+    monkeypatch.setattr(checkout_queue, "SUBMIT_TIMEOUT", 0.05)
+    queue = checkout_queue.CheckoutQueue(database.current_path(), max_pending=1)
+    queue._ensure_writer = lambda: None  # nothing drains it
+    queue.submit([{"product_id": 1, "quantity": 1}])
+    with pytest.raises(checkout_queue.CheckoutBusy, match="full"):
+        queue.submit([{"product_id": 1, "quantity": 1}])
+    assert queue.stats()["busy"] == 1
+
+
+def test_each_store_has_its_own_writer(stores):
+    for store_id in stores:
+        with database.use_store(store_id):
+            database.init_db()
+            database.seed_sample_data()
+    try:
+        for store_id, quantity in (("a", 1), ("b", 5), ("a", 2)):
+            with database.use_store(store_id):
+                checkout_queue.checkout([{"product_id": 1, "quantity": quantity}])
+        for store_id, stock in (("a", 42), ("b", 40)):
+            with database.use_store(store_id):
+                assert database.get_product_by_id(1)["stock"] == stock
+                assert checkout_queue.get_queue().store == store_id
+                assert checkout_queue.queue_stats()["committed"] == (2 if store_id == "a" else 1)
+    finally:
+        for path in stores.values():
+            checkout_queue._queues.pop(path).stop()
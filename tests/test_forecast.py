@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import forecast  # noqa: E402
+
+
+def test_forecast_without_sales_history(db):
+    stats = forecast.forecast()
+    assert stats["demand"].dtype == np.float64
+    assert not stats["demand"].any()
+    assert np.isinf(stats["days_until_stockout"]).all()
+
+
+def test_reorder_without_sales_history(client):
+    response = client.get("/api/reorder")
+    assert response.status_code == 200
+    # Only the static low-stock threshold applies before anything has sold.
+    products = response.get_json()["products"]
+    assert {p["name"] for p in products} == {"Bananas 1kg", "Tomatoes 500g"}
+    assert all(p["demand_per_day"] == 0 for p in products)
+
+
+def test_spread_is_over_daily_totals_across_payment_methods(db):
+    as_of = date(2026, 6, 30)
+    rows = []
+    for age in range(forecast.LONG_WINDOW):
+        day = (as_of - timedelta(days=age)).isoformat()
+        units = 10 if age % 2 else 30
+        # One product-day split over every payment method.
+        rows += [(day, 1, "Cash", units // 2), (day, 1, "Card", units // 4),
+                 (day, 1, "Mobile", units - units // 2 - units // 4)]
+    db.executemany("INSERT INTO sales_daily (day, product_id, payment_method, units) "
+                   "VALUES (?, ?, ?, ?)", rows)
+    db.commit()
+
+    stats = forecast.forecast(as_of)
+    milk = int(np.flatnonzero(stats["id"] == 1)[0])
+    assert stats["long_avg"][milk] == pytest.approx(20.0)
+    assert stats["spread"][milk] == pytest.approx(10.0)
@@ -0,0 +1,72 @@
+import pytest
+
+import database
+import ledger
+
+
+def live_stock(db):
+    return dict(db.execute("SELECT id, stock FROM products").fetchall())
+
+
+def ledger_stock(products):
+    return {product_id: ledger.stock_at(product_id) for product_id in products}
+
+
+@pytest.fixture
+def trading(db):
+    """Deliveries, sales and a return, with a snapshot taken part-way."""
+    database.link_supplier_product(1, 1, 2.0)
+    database.link_supplier_product(1, 4, 1.0)
+    order_id = database.create_purchase_order(
+        1, [{"product_id": 1, "quantity": 20}, {"product_id": 4, "quantity": 10}])
+    database.receive_goods(order_id, [{"barcode": "1001", "quantity": 8}])
+    sale_id = database.create_sale([{"product_id": 1, "quantity": 5},
+                                    {"product_id": 4, "quantity": 3}])
+    ledger.take_snapshot()
+    database.receive_goods(order_id, [{"product_id": 1, "quantity": 12},
+                                      {"product_id": 4, "quantity": 10}])
+    database.return_items(sale_id, [{"product_id": 4, "quantity": 2}])
+    database.create_sales([{"items": [{"product_id": 1, "quantity": 7}]},
+                           {"items": [{"product_id": 12, "quantity": 3}]}])
+    return db
+
+
+def test_stock_at_matches_live_stock(trading):
+    stock = live_stock(trading)
+    assert (stock[1], stock[4], stock[12]) == (45 + 20 - 12, 50 + 10 - 1, 0)
+    assert ledger_stock(stock) == stock
+
+    # Again from a snapshot taken after everything, and with no snapshot at all.
+    ledger.take_snapshot()
+    assert ledger_stock(stock) == stock
+    trading.execute("DELETE FROM stock_snapshots")
+    trading.commit()
+    assert ledger_stock(stock) == stock
+    # History starts when the ledger was created.
+    assert all(ledger.stock_at(product_id, "2000-01-01") == 0 for product_id in stock)
+
+
+def test_valuation_matches_live_stock(trading):
+    stock = live_stock(trading)
+    cost = dict(trading.execute("SELECT id, cost_price FROM products").fetchall())
+    value = ledger.valuation()
+    assert value["units"] == sum(stock.values())
+    assert value["skus"] == sum(1 for units in stock.values() if units)
+    assert value["value"] == pytest.approx(
+        round(sum(units * cost[product_id] for product_id, units in stock.items()), 2))
+
+
+def test_reconcile_finds_and_repairs_drift(trading):
+    assert ledger.reconcile() == []
+    assert ledger.reconcile(full=True) == []
+    # A movement with no matching stock change, e.g. a lost write.
+    trading.execute("INSERT INTO stock_movements (product_id, delta, reason) "
+                    "VALUES (4, 5, 'adjustment')")
+    trading.commit()
+    expected = [{"product_id": 4, "name": "White Bread Loaf", "stock": 59,
+                 "ledger_stock": 64}]
+    assert ledger.reconcile() == expected
+    assert ledger.reconcile(full=True) == expected
+    assert ledger.reconcile(repair=True) == expected
+    assert ledger.reconcile() == []
+    assert ledger.stock_at(4) == 59
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+import pricing
+
+
+def sync(client, *sales):
+    response = client.post("/api/sales/batch", json={"sales": [
+        {"client_ref": ref, "created_at": created_at.isoformat(),
+         "items": [{"product_id": 1, "quantity": 1}]}
+        for ref, created_at in sales]})
+    assert response.status_code == 200
+    return {r["client_ref"]: r for r in response.get_json()["results"]}
+
+
+def test_sales_are_accepted_up_to_the_late_sync_window(client):
+    now = datetime.utcnow()
+    window = timedelta(days=pricing.LATE_SYNC_DAYS)
+    results = sync(client, ("recent", now - timedelta(hours=1)),
+                   ("edge", now - window + timedelta(minutes=1)),
+                   ("backdated", now - window - timedelta(minutes=1)),
+                   ("future", now + timedelta(hours=1)))
+    assert results["recent"]["status"] == "created"
+    assert results["edge"]["status"] == "created"
+    assert results["backdated"] == {
+        "client_ref": "backdated", "status": "invalid",
+        "error": f"created_at is more than {pricing.LATE_SYNC_DAYS} days ago"}
+    assert results["future"]["status"] == "invalid"
+
+
+def test_replayed_sale_is_recorded_once(client):
+    rung_up = datetime.utcnow() - timedelta(minutes=10)
+    assert sync(client, ("till-1", rung_up))["till-1"]["status"] == "created"
+    assert sync(client, ("till-1", rung_up))["till-1"]["status"] == "duplicate"
+    assert client.get("/api/products/1").get_json()["stock"] == 44
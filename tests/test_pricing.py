@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import database
+import pricing
+
+
+def test_pricing_rules_for_offline_tills(client):
+    database.add_promotion("Milk 10% off", "percent", product_id=1, percent=10)
+    database.set_category_tax_rate(1, 0.0)
+    response = client.get("/api/pricing/rules")
+    assert response.status_code == 200
+    rules = response.get_json()
+    assert rules["tax_rate"] == pricing.TAX_RATE
+    assert rules["tax_rates"] == {"1": 0.0}
+    assert [(p["name"], p["product_id"], p["percent"]) for p in rules["promotions"]] == [
+        ("Milk 10% off", 1, 10.0)]
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/pricing/rules",
+                      headers={"If-None-Match": etag}).status_code == 304
+    database.add_promotion("Bread 2 for 4", "multibuy", product_id=4, quantity=2, price=4)
+    changed = client.get("/api/pricing/rules", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.get_json()["promotions"]) == 2
+
+
+def promotion(id, kind, product_id=None, category_id=None, percent=None, quantity=None,
+              price=None, starts_at=None, ends_at=None):
+    return {"id": id, "name": f"promo {id}", "kind": kind, "product_id": product_id,
+            "category_id": category_id, "percent": percent, "quantity": quantity,
+            "price": price, "starts_at": starts_at, "ends_at": ends_at}
+
+
+def price_line(promotions, quantity=1, price=10.0, at="2026-06-01 12:00:00", tax_rates=None):
+    rules = pricing.Rules(1, promotions, tax_rates or {})
+    lines, _ = pricing.price_basket([{"product_id": 1, "name": "Widget", "price": price,
+                                      "category_id": 7, "quantity": quantity}], rules, at)
+    return lines[0]
+
+
+def test_lowest_current_price_wins():
+    line = price_line([promotion(1, "price", product_id=1, price=8.0),
+                       promotion(2, "price", product_id=1, price=7.5),
+                       promotion(3, "price", product_id=1, price=12.0)], quantity=2)
+    assert line["unit_price"] == 7.5
+    assert line["subtotal"] == 15.0
+    assert line["discount"] == 0.0  # a lower price is not a deal
+
+
+def test_best_percent_off_the_lowest_price():
+    line = price_line([promotion(1, "price", product_id=1, price=8.0),
+                       promotion(2, "percent", product_id=1, percent=10),
+                       promotion(3, "percent", category_id=7, percent=25)])
+    assert line["promotion"] == "promo 3"
+    assert line["subtotal"] == 6.0
+    assert line["discount"] == 2.0
+
+
+def test_better_of_percent_and_multibuy_without_stacking():
+    rules = [promotion(1, "percent", product_id=1, percent=20),
+             promotion(2, "multibuy", product_id=1, quantity=3, price=22.0)]
+    # 3 for 22 beats 20% off 30.
+    line = price_line(rules, quantity=3)
+    assert (line["promotion"], line["subtotal"]) == ("promo 2", 22.0)
+    assert line["discount"] == 8.0
+    # 3 for 22 plus one at 10 only ties with 20% off 40, which keeps it.
+    line = price_line(rules, quantity=4)
+    assert (line["promotion"], line["subtotal"]) == ("promo 1", 32.0)
+    # Below the multi-buy quantity only the percent applies.
+    line = price_line(rules, quantity=2)
+    assert (line["promotion"], line["subtotal"]) == ("promo 1", 16.0)
+
+
+def test_promotion_window_is_start_inclusive_end_exclusive():
+    rules = [promotion(1, "percent", product_id=1, percent=50,
+                       starts_at="2026-06-01 00:00:00", ends_at="2026-06-08 00:00:00")]
+    assert price_line(rules, at="2026-05-31 23:59:59")["promotion"] is None
+    assert price_line(rules, at="2026-06-01 00:00:00")["promotion"] == "promo 1"
+    assert price_line(rules, at="2026-06-07 23:59:59")["promotion"] == "promo 1"
+    assert price_line(rules, at="2026-06-08 00:00:00")["promotion"] is None
+
+
+def test_tax_per_category_rate_on_discounted_amounts():
+    rules = pricing.Rules(1, [promotion(1, "percent", product_id=1, percent=50)], {7: 0.0})
+    _, totals = pricing.price_basket([
+        {"product_id": 1, "name": "Bread", "price": 4.0, "category_id": 7, "quantity": 1},
+        {"product_id": 2, "name": "Soap", "price": 10.0, "category_id": 8, "quantity": 1},
+    ], rules, "2026-06-01 12:00:00")
+    assert totals["taxes"] == [[0.0, 2.0, 0.0], [pricing.TAX_RATE, 10.0, 0.5]]
+    assert (totals["subtotal"], totals["discount"], totals["tax"], totals["total"]) == (
+        12.0, 2.0, 0.5, 12.5)
+
+
+def test_offline_sale_is_priced_when_it_was_rung_up(db):
+    # Milk (product 1) sells at 3.49; the deal ended before the till synced.
+    ended = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    database.add_promotion("Milk week", "price", product_id=1, price=2.0,
+                           starts_at=str(ended - timedelta(days=7)), ends_at=str(ended))
+    rung_up, synced = database.create_sales([
+        {"items": [{"product_id": 1, "quantity": 2}],
+         "created_at": str(ended - timedelta(seconds=1))},
+        {"items": [{"product_id": 1, "quantity": 2}], "created_at": str(ended)},
+    ])
+    first, second = database.get_receipt(rung_up), database.get_receipt(synced)
+    assert (first["items"][0]["unit_price"], first["subtotal"]) == (2.0, 4.0)
+    assert (second["items"][0]["unit_price"], second["subtotal"]) == (3.49, 6.98)
@@ -0,0 +1,36 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def order_id(db):
+    # Whole Milk 1L (product 1, barcode 1001) from Fresh Farms Co. (supplier 1).
+    database.link_supplier_product(1, 1, 2.0)
+    return database.create_purchase_order(1, [{"product_id": 1, "quantity": 12}])
+
+
+def test_deliveries_add_to_stock(client, order_id):
+    for scan in ({"barcode": "1001", "quantity": 5}, {"product_id": 1, "quantity": 7}):
+        response = client.post(f"/api/purchase-orders/{order_id}/receive",
+                               json={"lines": [scan]})
+        assert response.get_json()["success"], response.get_json()
+    assert database.get_product_by_id(1)["stock"] == 57
+    order = client.get(f"/api/purchase-orders/{order_id}").get_json()
+    assert order["status"] == "received"
+    assert [(line["ordered"], line["received"]) for line in order["lines"]] == [(12, 12)]
+
+
+@pytest.mark.parametrize("line", [{"quantity": 1}, 1, None])
+def test_create_rejects_malformed_lines(db, line):
+    database.link_supplier_product(1, 1, 2.0)
+    with pytest.raises(ValueError, match="Each item needs product_id and quantity"):
+        database.create_purchase_order(1, [line])
+
+
+@pytest.mark.parametrize("line", [1, "1001", None])
+def test_receive_rejects_malformed_lines(client, order_id, line):
+    response = client.post(f"/api/purchase-orders/{order_id}/receive", json={"lines": [line]})
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+    assert database.get_product_by_id(1)["stock"] == 45
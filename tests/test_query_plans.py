@@ -0,0 +1,26 @@
+import types
+
+import database
+import migrations
+
+
+def test_hot_paths_are_served_from_indexes(db):
+    # Enough rows for every hot path to issue all of its queries.
+    database.create_sale([{"product_id": 1, "quantity": 2}, {"product_id": 4, "quantity": 1}])
+    database.link_supplier_product(1, 1, 2.0)
+    database.create_purchase_order(1, [{"product_id": 1, "quantity": 12}])
+
+    failures = migrations.check_query_plans(database)
+    assert failures == [], "\n".join(f"{name}: {detail}\n    {sql}"
+                                     for name, sql, detail in failures)
+
+
+def test_full_scans_are_reported(db):
+    def unindexed_lookup():
+        return db.execute("SELECT * FROM products WHERE cost_price > 1").fetchall()
+
+    fake = types.SimpleNamespace(get_connection=database.get_connection,
+                                 unindexed_lookup=unindexed_lookup)
+    failures = migrations.check_query_plans(fake, [("unindexed_lookup", ())])
+    assert [(name, detail) for name, _, detail in failures] == [
+        ("unindexed_lookup", "SCAN products")]
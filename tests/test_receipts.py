@@ -0,0 +1,28 @@
+from app import RECEIPT_VERSION, _receipt_pages
+
+
+def checkout(client, product_id=1, quantity=1):
+    client.post("/api/cart/add", json={"product_id": product_id, "quantity": quantity})
+    return client.post("/api/checkout", json={"payment_method": "Cash"}).get_json()["sale_id"]
+
+
+def test_receipt_is_revalidated_by_etag(client):
+    sale_id = checkout(client)
+    response = client.get(f"/receipt/{sale_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    again = client.get(f"/receipt/{sale_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    # A process that has not rendered it yet checks the sale exists.
+    _receipt_pages.clear()
+    assert client.get(f"/receipt/{sale_id}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_receipt_etag_for_unknown_sale_is_not_honoured(client):
+    response = client.get("/receipt/9999",
+                          headers={"If-None-Match": f'"receipt-{RECEIPT_VERSION}--9999"'})
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/sales")
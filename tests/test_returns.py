@@ -0,0 +1,28 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def sale_id(db):
+    return database.create_sale([{"product_id": 1, "quantity": 3}])
+
+
+def test_return_puts_stock_back_once(client, sale_id):
+    response = client.post(f"/api/sales/{sale_id}/returns",
+                           json={"items": [{"product_id": 1, "quantity": 2}]})
+    assert response.get_json()["success"]
+    assert database.get_product_by_id(1)["stock"] == 44
+    again = client.post(f"/api/sales/{sale_id}/returns",
+                        json={"items": [{"product_id": 1, "quantity": 2}]})
+    assert again.status_code == 400
+    assert again.get_json()["error"] == f"Only 1 of product ID 1 can be returned from sale {sale_id}"
+
+
+@pytest.mark.parametrize("item", [{"quantity": 1}, 1, "1", None, [1, 1]])
+def test_return_rejects_malformed_items(client, sale_id, item):
+    response = client.post(f"/api/sales/{sale_id}/returns", json={"items": [item]})
+    assert response.status_code == 400
+    assert response.get_json() == {"success": False,
+                                   "error": "Each item needs product_id and quantity"}
+    assert database.get_product_by_id(1)["stock"] == 42
@@ -0,0 +1,52 @@
+import sqlite3
+
+import database
+import migrations
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_init_stores_command_migrates_every_store(stores):
+    from app import app
+    result = app.test_cli_runner().invoke(args=["init-stores"])
+    assert result.exit_code == 0, result.output
+    for path in stores.values():
+        assert user_version(path) == migrations.SCHEMA_VERSION
+
+
+def test_use_store_inside_app_context(stores):
+    from app import app
+    with app.app_context():
+        for store_id in stores:
+            with database.use_store(store_id):
+                database.init_db()
+                database.add_category(f"Only in {store_id}")
+        for store_id in stores:
+            with database.use_store(store_id):
+                names = {c["name"] for c in database.get_all_categories()}
+                assert f"Only in {store_id}" in names
+                assert len(names & {"Only in a", "Only in b"}) == 1
+
+
+def test_requests_are_routed_by_store_header(stores):
+    from app import app
+    for store_id in stores:
+        with database.use_store(store_id):
+            database.init_db()
+            database.seed_sample_data()
+    client = app.test_client()
+    headers = {"X-Store-ID": "b"}
+    client.post("/api/cart/add", json={"product_id": 1, "quantity": 3}, headers=headers)
+    response = client.post("/api/checkout", json={"payment_method": "Card"}, headers=headers)
+    assert response.get_json()["success"], response.get_json()
+
+    stock = {store_id: client.get("/api/products/1", headers={"X-Store-ID": store_id})
+             .get_json()["stock"] for store_id in stores}
+    assert stock == {"a": 45, "b": 42}
+    assert client.get("/api/products/1", headers={"X-Store-ID": "c"}).status_code == 404